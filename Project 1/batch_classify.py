@@ -0,0 +1,226 @@
+"""Пакетная классификация ссылок из файла.
+
+Файл читается лениво (TXT — ссылка на строку, CSV — колонка link/url или первая,
+JSONL — поле link/original_link/url), ссылки классифицируются N одновременными
+асинхронными запросами к GigaChat. Результаты пишутся в журнал в том же виде,
+что и у write_to_file: {"date", "subject", "link"}. Номера обработанных строк
+сохраняются в файл .checkpoint, поэтому прерванный запуск продолжается с места
+остановки.
+
+Кеш (SQLite) и индекс соседей (разбор страницы, периодическая пересборка
+индекса) работают синхронно, поэтому вызываются через asyncio.to_thread и не
+задерживают остальные запросы. Ответ модели кешируется, только если это
+предмет из списка.
+
+Запуск из консоли:
+    python batch_classify.py links.csv --concurrency 8
+    python batch_classify.py links.txt --output requests.jsonl --retries 2
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Iterator, Set, Tuple
+
+from langchain_core.messages import HumanMessage
+from langchain_gigachat import GigaChat
+
+from classification_cache import ClassificationCache, prompt_version
+from classifier_prompts import API_KEY, system_prompt
+from jsonl_store import DEFAULT_PATH, JsonlStore
+from knn_classifier import KnnIndex
+from link_index import DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF
+from subject_registry import OTHER_SUBJECT, SubjectRegistry, extract_url, normalize_subject
+from url_normalizer import canonicalize_url
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 2
+FLUSH_EVERY = 100  # записей в одной дозаписи журнала и чекпоинта
+LINK_FIELDS = ("link", "original_link", "url")
+
+llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False)
+registry = SubjectRegistry()
+# Тот же промпт, что у project01_task01.py, поэтому и кеш с ним общий
+cache = ClassificationCache(version=prompt_version(system_prompt.content))
+
+
+def iter_links(path: str) -> Iterator[Tuple[int, str]]:
+    """Лениво возвращает (номер строки, ссылка) из TXT, CSV или JSONL"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if extension == ".csv":
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return
+            lowered = [name.strip().lower() for name in header]
+            column = next((lowered.index(name) for name in LINK_FIELDS if name in lowered), None)
+            if column is None:  # заголовка нет, первая строка — уже ссылка
+                column = 0
+                if header and header[0].strip():
+                    yield 0, header[0].strip()
+            for line_no, row in enumerate(reader, start=1):
+                if len(row) > column and row[column].strip():
+                    yield line_no, row[column].strip()
+        elif extension == ".jsonl":
+            for line_no, line in enumerate(file):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                link = next((record[name] for name in LINK_FIELDS if record.get(name)), None) if isinstance(record, dict) else None
+                if link:
+                    yield line_no, link.strip()
+        else:
+            for line_no, line in enumerate(file):
+                link = line.strip()
+                if link and not link.startswith("#"):
+                    yield line_no, link
+
+
+def load_checkpoint(path: str) -> Set[int]:
+    """Номера строк, уже записанных в журнал прошлыми запусками"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return {int(line) for line in file if line.strip().isdigit()}
+    except FileNotFoundError:
+        return set()
+
+
+class BatchClassifier:
+    """Классификация потока ссылок с ограничением числа одновременных запросов"""
+
+    def __init__(self, store: JsonlStore, checkpoint_path: str,
+                 concurrency: int = DEFAULT_CONCURRENCY, retries: int = DEFAULT_RETRIES):
+        self.store = store
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.retries = retries
+        self.done = load_checkpoint(checkpoint_path)
+        self.knn = KnnIndex().build(store.iter_records())  # соседи из уже размеченного журнала
+        self.stats = {"classified": 0, "skipped": 0, "registry": 0, "cache": 0, "knn": 0, "llm": 0, "unknown": 0, "errors": 0}
+
+    async def classify(self, link: str) -> str:
+        """Предмет для ссылки: реестр, кеш, голосование соседей, затем GigaChat с повторами"""
+        subject = registry.lookup(link)
+        if subject:
+            self.stats["registry"] += 1
+            return subject
+        subject = await asyncio.to_thread(cache.get, link)
+        if subject:
+            self.stats["cache"] += 1
+            return subject
+        subject = await asyncio.to_thread(self.knn.predict, link)
+        if subject:
+            self.stats["knn"] += 1
+            return subject
+        for attempt in range(self.retries + 1):
+            try:
+                started = time.perf_counter()
+                response = await llm.ainvoke([system_prompt, HumanMessage(content=link)])
+                self.stats["llm"] += 1
+                subject = normalize_subject(response.content)
+                if subject is None:
+                    # Ответ не из списка предметов: в журнал — «Другой предмет», в кеш и индекс не попадает
+                    logging.warning(f"{link}: ответ модели не из списка предметов: {response.content!r}")
+                    self.stats["unknown"] += 1
+                    return OTHER_SUBJECT
+                await asyncio.to_thread(cache.put, link, subject, latency=time.perf_counter() - started)
+                await asyncio.to_thread(self.knn.add, {"link": link, "subject": subject})
+                return subject
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)  # экспоненциальная пауза перед повтором
+
+    async def _worker(self, links: asyncio.Queue, results: asyncio.Queue):
+        while True:
+            item = await links.get()
+            if item is None:
+                return
+            line_no, link = item
+            try:
+                subject = await self.classify(link)
+            except Exception as e:
+                # Строка не попадает в чекпоинт и будет обработана при следующем запуске
+                self.stats["errors"] += 1
+                logging.error(f"Строка {line_no}: {link}: {e}")
+                continue
+            today = datetime.now().strftime("%Y-%m-%d")
+            url = extract_url(link)
+            record = {"date": today, "subject": subject, "link": canonicalize_url(url) if url else link}
+            await results.put((line_no, record))
+
+    def _flush(self, batch):
+        # Сначала журнал, затем чекпоинт: после сбоя строка может повториться, но не потеряется
+        self.store.append_many([record for _, record in batch])
+        with open(self.checkpoint_path, "a", encoding="utf-8") as file:
+            file.write("".join(f"{line_no}\n" for line_no, _ in batch))
+        self.stats["classified"] += len(batch)
+
+    async def _writer(self, results: asyncio.Queue):
+        batch = []
+        while True:
+            item = await results.get()
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) >= FLUSH_EVERY or results.empty()):
+                await asyncio.to_thread(self._flush, batch)
+                batch = []
+            if item is None:
+                return
+
+    async def run(self, path: str) -> dict:
+        """Классифицирует все необработанные ссылки файла, возвращает статистику"""
+        links: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)  # не читаем файл далеко вперед
+        results: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(links, results)) for _ in range(self.concurrency)]
+        writer = asyncio.create_task(self._writer(results))
+
+        for line_no, link in iter_links(path):
+            if line_no in self.done:
+                self.stats["skipped"] += 1
+                continue
+            await links.put((line_no, link))
+        for _ in workers:
+            await links.put(None)
+        await asyncio.gather(*workers)
+        await results.put(None)
+        await writer
+
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["links_per_second"] = round(self.stats["classified"] / elapsed, 2) if elapsed else 0.0
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная классификация ссылок из файла")
+    parser.add_argument("input", help="файл со ссылками: .txt, .csv или .jsonl")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="журнал результатов")
+    parser.add_argument("--checkpoint", help="файл чекпоинта (по умолчанию <input>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="одновременных запросов к GigaChat")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="повторов при ошибке запроса")
+    parser.add_argument("--dedup", choices=[DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF], default=DEDUP_LINK,
+                        help="повтор ссылки: одна запись на ссылку, на ссылку в день или новая запись")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.input + ".checkpoint"
+    classifier = BatchClassifier(JsonlStore(args.output, dedup=args.dedup), checkpoint_path, args.concurrency, args.retries)
+    stats = asyncio.run(classifier.run(args.input))
+
+    print(f"Классифицировано: {stats['classified']} за {stats['seconds']} с ({stats['links_per_second']} ссылок/с)")
+    print(f"Из реестра: {stats['registry']}, из кеша: {stats['cache']}, по соседям: {stats['knn']}, "
+          f"запросов к GigaChat: {stats['llm']} (ответов не из списка: {stats['unknown']})")
+    print(f"Пропущено (уже в чекпоинте): {stats['skipped']}, ошибок: {stats['errors']}")
+    print(f"Статистика кеша: {cache.stats()}")
+    print(f"Статистика соседей из истории: {classifier.knn.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Замер пакетной классификации: токены и время на ссылку при разном размере пачки.
+
+Реестр и кеш не используются — каждая ссылка идет в GigaChat. По умолчанию
+классифицируются предопределенные ссылки, для них считается и точность.
+
+Запуск из консоли (нужен API-ключ в classifier_prompts.py):
+    python bench_packing.py --sizes 1 5 10 20
+    python bench_packing.py --links links.txt --sizes 1 10 25
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from subject_registry import PREDEFINED_LINKS
+from packed_classifier import PackedClassifier
+
+
+async def run_size(links: List[str], batch_size: int) -> Dict:
+    classifier = PackedClassifier(batch_size, concurrency=1)  # по одной пачке, чтобы задержки не смешивались
+    started = time.perf_counter()
+    subjects = []
+    for start in range(0, len(links), batch_size):
+        subjects.extend(await classifier.classify_chunk(links[start:start + batch_size]))
+    summary = classifier.summary()
+    summary["wall_seconds"] = round(time.perf_counter() - started, 2)
+    summary["subjects"] = subjects
+    return summary
+
+
+async def run_sizes(links: List[str], sizes: List[int]) -> List[Dict]:
+    # Все размеры в одном цикле событий: клиент GigaChat общий для модуля
+    return [await run_size(links, size) for size in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Токены и задержка на ссылку для разных размеров пачки")
+    parser.add_argument("--links", help="файл со ссылками, по одной на строку (по умолчанию — предопределенные)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    args = parser.parse_args()
+
+    if args.links:
+        with open(args.links, "r", encoding="utf-8") as file:
+            links = [line.strip() for line in file if line.strip()]
+        expected = {}
+    else:
+        expected = {link: subject for subject, urls in PREDEFINED_LINKS.items() for link in urls}
+        links = list(expected)
+
+    print(f"Ссылок: {len(links)}")
+    print(f"{'пачка':>6} {'запросов':>9} {'токенов/ссылку':>15} {'с/ссылку':>9} {'повторов':>9} {'точность':>9}")
+    for size, result in zip(args.sizes, asyncio.run(run_sizes(links, args.sizes))):
+        if expected:
+            correct = sum(expected[link] == subject for link, subject in zip(links, result["subjects"]))
+            accuracy = f"{correct / len(links):.2f}"
+        else:
+            accuracy = "-"
+        print(f"{size:>6} {result['calls']:>9} {result['tokens_per_link']:>15} "
+              f"{result['seconds_per_link']:>9} {result['retry_rate']:>9} {accuracy:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Постоянный кеш классификации ссылок.
+
+Ответы GigaChat хранятся в SQLite с ограниченным сроком жизни, горячие записи
+дублируются в LRU в памяти. Ключ содержит версию промпта, поэтому после
+изменения промпта или списка предметов старые записи больше не находятся.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from subject_registry import SUBJECTS, OTHER_SUBJECT, extract_url
+from url_normalizer import url_key
+
+DEFAULT_CACHE_PATH = "classification_cache.sqlite"
+DEFAULT_TTL = 30 * 24 * 3600  # секунды
+DEFAULT_MEMORY_ITEMS = 1024
+
+
+def prompt_version(prompt_text: str) -> str:
+    """Версия ключа кеша: хеш текста промпта и списка предметов"""
+    digest = hashlib.sha256(prompt_text.encode("utf-8"))
+    for subject in SUBJECTS + [OTHER_SUBJECT]:
+        digest.update(b"\0" + subject.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ClassificationCache:
+    """Кеш URL → предмет: LRU в памяти перед таблицей SQLite"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: str = "",
+                 ttl: float = DEFAULT_TTL, max_memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.version = version
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()  # ключ -> (предмет, истекает)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, subject TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def _key(self, text: str) -> Optional[str]:
+        url = extract_url(text)
+        if not url:
+            return None
+        return f"{self.version}:{url_key(url)}"
+
+    def _remember(self, key: str, subject: str, expires_at: float):
+        self.memory[key] = (subject, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[str]:
+        """Возвращает закешированный предмет для ссылки из текста"""
+        key = self._key(text)
+        if key is None:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                row = self.conn.execute(
+                    "SELECT subject, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._remember(key, *entry)
+            else:
+                self.memory.move_to_end(key)
+
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+
+            if entry:  # запись устарела
+                self.memory.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, text: str, subject: str, latency: Optional[float] = None):
+        """Сохраняет ответ LLM; latency — время запроса, для оценки экономии"""
+        key = self._key(text)
+        if key is None or not subject:
+            return
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, subject, expires_at)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, subject, expires_at) VALUES (?, ?, ?)",
+                (key, subject, expires_at)
+            )
+            self.conn.commit()
+            if latency is not None:
+                self.llm_calls += 1
+                self.llm_seconds += latency
+
+    def purge_expired(self) -> int:
+        """Удаляет устаревшие записи с диска, возвращает их количество"""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Доля попаданий и оценка сэкономленного времени на запросы к LLM"""
+        total = self.hits + self.misses
+        avg_latency = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "avg_llm_latency": round(avg_latency, 3),
+            "saved_seconds": round(self.hits * avg_latency, 2),
+        }
@@ -0,0 +1,267 @@
+"""HTTP-сервис классификации ссылок с динамической микропакетизацией.
+
+Запросы, пришедшие в пределах окна --window, объединяются в один вызов
+классификатора (packed_classifier: несколько ссылок в одном запросе к GigaChat),
+результаты раздаются обратно по запросам. Сервер на asyncio из стандартной
+библиотеки, HTTP/1.1 с keep-alive.
+
+    POST /classify            тело — ссылка или {"link": ...}; ответ — название предмета
+    POST /classify/response   то же, ответ в формате Response: {"date", "subject", "link"}
+    GET  /stats               глубина очереди и статистика пачек
+
+Запуск из консоли:
+    python classify_server.py --port 8080 --window 0.02 --max-batch 16
+    python classify_server.py --backend stub    # без GigaChat, для проверки
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from subject_registry import OTHER_SUBJECT, SubjectRegistry
+
+DEFAULT_WINDOW = 0.02  # секунды ожидания попутчиков для первой ссылки пачки
+DEFAULT_MAX_BATCH = 16
+DEFAULT_MAX_INFLIGHT = 4  # одновременных вызовов классификатора
+MAX_BODY = 64 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+Backend = Callable[[List[str]], Awaitable[List[str]]]
+
+
+class StubBackend:
+    """Классификатор без LLM: реестр предопределенных ссылок или «Другой предмет» после паузы"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.registry = SubjectRegistry()
+
+    async def __call__(self, links: List[str]) -> List[str]:
+        await asyncio.sleep(self.delay)  # одна «задержка модели» на пачку
+        return [self.registry.lookup(link) or OTHER_SUBJECT for link in links]
+
+
+def packed_backend(batch_size: int) -> Backend:
+    """Классификатор GigaChat из packed_classifier; импортируется только при выборе"""
+    from packed_classifier import PackedClassifier
+    return PackedClassifier(batch_size).classify_many
+
+
+class MicroBatcher:
+    """Собирает ссылки из одновременных запросов в пачки для одного вызова классификатора"""
+
+    def __init__(self, backend: Backend, window: float = DEFAULT_WINDOW,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_inflight: int = DEFAULT_MAX_INFLIGHT):
+        self.backend = backend
+        self.window = window
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.collecting = 0
+        self.inflight = 0
+        self.batches = 0
+        self.links = 0
+        self.errors = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def classify(self, link: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((link, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        self.collecting = 1
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.collecting = len(batch)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            await self.slots.acquire()  # пока все слоты заняты, очередь копится в следующую пачку
+            self.collecting = 0  # собранная пачка считается в очереди, пока ждет слота
+            self.inflight += len(batch)
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            subjects = await self.backend([link for link, _ in batch])
+            for (_, future), subject in zip(batch, subjects):
+                if not future.done():
+                    future.set_result(subject)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Ошибка классификации пачки из {len(batch)} ссылок: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.batches += 1
+            self.links += len(batch)
+            self.inflight -= len(batch)
+            self.slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() + self.collecting,
+            "inflight": self.inflight,
+            "batches": self.batches,
+            "links": self.links,
+            "avg_batch": round(self.links / self.batches, 2) if self.batches else 0.0,
+            "errors": self.errors,
+        }
+
+
+def parse_link(body: bytes) -> Optional[str]:
+    """Ссылка из тела запроса: JSON {"link": ...} или просто текст"""
+    text = body.decode("utf-8", errors="replace").strip()
+    if text.startswith("{"):
+        try:
+            link = json.loads(text).get("link")
+        except (json.JSONDecodeError, AttributeError):
+            return None
+        return link.strip() if isinstance(link, str) and link.strip() else None
+    return text or None
+
+
+def parse_length(value: Optional[str]) -> Optional[int]:
+    """Длина тела из Content-Length; None, если значение не число или отрицательное"""
+    if value is None or value == "":
+        return 0
+    if not (value.isascii() and value.isdigit()):  # отсекает "abc", "-5", "+5" и "²"
+        return None
+    return int(value)
+
+
+class ClassifyServer:
+    """HTTP/1.1 поверх asyncio.start_server с keep-alive"""
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+        self.requests = 0
+        self.connections = 0
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        if path == "/stats":
+            if method != "GET":
+                return 405, "text/plain", b"GET only"
+            stats = {**self.batcher.stats(), "requests": self.requests, "connections": self.connections}
+            return 200, "application/json", json.dumps(stats).encode("utf-8")
+        if path not in ("/classify", "/classify/response"):
+            return 404, "text/plain", b"Not found"
+        if method != "POST":
+            return 405, "text/plain", b"POST only"
+        link = parse_link(body)
+        if not link:
+            return 400, "text/plain; charset=utf-8", "Нужна ссылка в теле запроса".encode("utf-8")
+        subject = await self.batcher.classify(link)
+        if path == "/classify":
+            return 200, "text/plain; charset=utf-8", subject.encode("utf-8")
+        response = {"date": datetime.now().strftime("%Y-%m-%d"), "subject": subject, "link": link}
+        return 200, "application/json", json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, "text/plain", b"Bad request line", False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                length = parse_length(headers.get("content-length"))
+                if length is None:
+                    # Без правильной длины не найти конец тела — соединение закрывается
+                    await self._respond(writer, 400, "text/plain", b"Bad Content-Length", False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, "text/plain", b"Body too large", False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                try:
+                    status, content_type, payload = await self.handle(method, path.split("?", 1)[0], body)
+                except Exception as e:
+                    status, content_type, payload = 500, "text/plain; charset=utf-8", str(e).encode("utf-8")
+                await self._respond(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, content_type: str, payload: bytes, keep_alive: bool):
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, backend: Backend, window: float, max_batch: int, max_inflight: int):
+    batcher = MicroBatcher(backend, window, max_batch, max_inflight)
+    batcher.start()
+    server = ClassifyServer(batcher)
+    listener = await asyncio.start_server(server.serve_connection, host, port)
+    logging.info(f"Сервис классификации слушает http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-сервис классификации ссылок")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="окно объединения запросов, секунды")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="максимум ссылок в одном вызове")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT, help="одновременных вызовов классификатора")
+    parser.add_argument("--backend", choices=["packed", "stub"], default="packed")
+    parser.add_argument("--stub-delay", type=float, default=0.05, help="задержка заглушки на пачку, секунды")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    backend = StubBackend(args.stub_delay) if args.backend == "stub" else packed_backend(args.max_batch)
+    try:
+        asyncio.run(serve(args.host, args.port, backend, args.window, args.max_batch, args.max_inflight))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
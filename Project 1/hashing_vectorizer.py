@@ -0,0 +1,68 @@
+"""Хеширующий векторизатор текста на NumPy.
+
+Словарь не хранится: слово (обрезанное до STEM_LENGTH букв — грубая замена
+стемминга для русских окончаний) и пара соседних слов хешируются crc32 в
+одну из n_features колонок, знак берется из старшего бита, чтобы коллизии
+в среднем гасили друг друга. Документы — разреженные строки CSR
+(indptr, indices, data) с log(1 + tf) и L2-нормировкой.
+"""
+import re
+import zlib
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+DEFAULT_FEATURES = 2 ** 18
+STEM_LENGTH = 6
+WORD_PATTERN = re.compile(r"[a-zа-я0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова в нижнем регистре, обрезанные до STEM_LENGTH символов"""
+    text = text.lower().replace("ё", "е")
+    return [word[:STEM_LENGTH] for word in WORD_PATTERN.findall(text) if len(word) > 1]
+
+
+class HashingVectorizer:
+    """Текст → разреженный вектор фиксированной длины без словаря"""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES, bigrams: bool = True):
+        self.n_features = n_features
+        self.bigrams = bigrams
+
+    def _features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        words = tokenize(text)
+        terms = words + [a + " " + b for a, b in zip(words, words[1:])] if self.bigrams else words
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(term.encode("utf-8")) for term in terms), dtype=np.uint32, count=len(terms))
+        columns = (hashes & 0x7FFFFFFF).astype(np.int64) % self.n_features
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+
+        # Суммируем повторы одной колонки, затем log(1 + |tf|) с сохранением знака и L2-норма
+        columns, inverse = np.unique(columns, return_inverse=True)
+        values = np.zeros(len(columns), dtype=np.float32)
+        np.add.at(values, inverse, signs)
+        values = np.sign(values) * np.log1p(np.abs(values))
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        return columns, values
+
+    def transform(self, texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Матрица CSR: (indptr, indices, data)"""
+        indptr = [0]
+        indices, data = [], []
+        for text in texts:
+            columns, values = self._features(text)
+            indices.append(columns)
+            data.append(values)
+            indptr.append(indptr[-1] + len(columns))
+        return (np.array(indptr, dtype=np.int64),
+                np.concatenate(indices) if indices else np.empty(0, dtype=np.int64),
+                np.concatenate(data) if data else np.empty(0, dtype=np.float32))
+
+
+def row_ids(indptr: np.ndarray) -> np.ndarray:
+    """Номер документа для каждого ненулевого элемента CSR"""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
@@ -0,0 +1,137 @@
+"""Индекс ссылок для дедупликации истории.
+
+Повторная отправка той же ссылки не добавляет новую запись, а обновляет
+существующую: счетчик отправок count, первое (first_seen) и последнее
+(last_seen) время. Ключ — каноническая ссылка (url_normalizer), при
+DEDUP_LINK_DAY — ссылка и день.
+
+Новая ссылка — самый частый случай, поэтому перед точным индексом стоит фильтр
+Блума: отрицательный ответ гарантирует, что ссылки в истории нет, и поиск
+в индексе (или запрос к базе) не нужен.
+"""
+import hashlib
+import math
+from typing import Dict, Iterable, Optional
+
+from subject_registry import extract_url
+from url_normalizer import url_key
+
+DEDUP_OFF = ""
+DEDUP_LINK = "link"  # одна запись на ссылку
+DEDUP_LINK_DAY = "link_day"  # одна запись на ссылку в день
+
+DEFAULT_CAPACITY = 100_000
+DEFAULT_ERROR_RATE = 0.01
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray: ложные срабатывания возможны, пропуски — нет"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Двойное хеширование: k позиций из двух половин одного blake2b
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class LinkIndex:
+    """Фильтр Блума перед хеш-индексом ключ → положение записи в хранилище"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.bloom = BloomFilter(capacity)
+        self.positions: Dict[str, int] = {}
+        self.bloom_negatives = 0
+        self.bloom_false_positives = 0
+
+    def _grow(self):
+        # Фильтр переполнен — ошибка растет, пересобираем с запасом
+        self.bloom = BloomFilter(self.bloom.capacity * 2, self.bloom.error_rate)
+        for key in self.positions:
+            self.bloom.add(key)
+
+    def get(self, key: str) -> Optional[int]:
+        if key not in self.bloom:
+            self.bloom_negatives += 1
+            return None
+        position = self.positions.get(key)
+        if position is None:
+            self.bloom_false_positives += 1
+        return position
+
+    def put(self, key: str, position: int):
+        if key not in self.positions:
+            if self.bloom.count >= self.bloom.capacity:
+                self._grow()
+            self.bloom.add(key)
+        self.positions[key] = position
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.positions),
+            "bloom_negatives": self.bloom_negatives,
+            "bloom_false_positives": self.bloom_false_positives,
+        }
+
+
+def dedup_key(record: dict, mode: str) -> Optional[str]:
+    """Ключ дедупликации записи или None, если ссылки нет или дедупликация выключена"""
+    if not mode:
+        return None
+    url = extract_url(record.get("link") or record.get("original_link") or "")
+    if not url:
+        return None
+    key = url_key(url)
+    if mode == DEDUP_LINK_DAY:
+        key += "|" + (record.get("date") or (record.get("saved_at") or "")[:10])
+    return key
+
+
+def seen_at(record: dict) -> str:
+    return record.get("saved_at") or record.get("date") or ""
+
+
+def first_submission(record: dict) -> dict:
+    """Новая запись: одна отправка, первое и последнее время совпадают"""
+    record = dict(record)
+    record.setdefault("count", 1)
+    record.setdefault("first_seen", seen_at(record))
+    record.setdefault("last_seen", seen_at(record))
+    return record
+
+
+def merge_submission(previous: dict, record: dict) -> dict:
+    """Повторная отправка: предмет и поля из новой записи, счетчик и first_seen накапливаются"""
+    record = first_submission(record)
+    merged = dict(record)
+    merged["count"] = previous.get("count", 1) + record["count"]
+    merged["first_seen"] = min(filter(None, [previous.get("first_seen") or seen_at(previous), record["first_seen"]]), default="")
+    merged["last_seen"] = max(filter(None, [previous.get("last_seen") or seen_at(previous), record["last_seen"]]), default="")
+    if previous.get("saved_at") or record.get("saved_at"):
+        merged["saved_at"] = max(filter(None, [previous.get("saved_at"), record.get("saved_at")]))  # отчеты по периоду — по последней отправке
+    return merged
+
+
+def submissions(records: Iterable[dict]) -> int:
+    """Сколько раз отправлялись ссылки из выборки"""
+    return sum(record.get("count", 1) for record in records)
@@ -0,0 +1,217 @@
+"""Классификация нескольких ссылок одним запросом со структурированным ответом.
+
+В project01_task02.py каждый запрос — одна ссылка, и длинный системный промпт
+оплачивается заново для каждой. Здесь в запрос упаковываются до batch_size
+ссылок, модель возвращает список {link, subject}, ответы сопоставляются со
+ссылками по каноническому URL. Пропущенные или искаженные ответы (ссылки нет
+в списке, предмет не из перечня) переспрашиваются по одной; если и поштучный
+запрос не удался, ссылка получает OTHER_SUBJECT и не попадает в кеш, а
+остальные ссылки пачки сохраняют свои ответы.
+
+Клиент GigaChat создается один раз на модуль, поэтому все запросы идут в
+одном цикле событий: скрипты запускают asyncio.run один раз на всю работу.
+Предмет из ответа модели приводится к списку (normalize_subject); ответ не из
+списка при поштучном запросе считается ошибкой ссылки.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_gigachat import GigaChat
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+from classification_cache import ClassificationCache, prompt_version
+from classifier_prompts import API_KEY, Response
+from page_fetcher import PageFetcher
+from page_text import SUMMARY_TEXT
+from subject_registry import OTHER_SUBJECT, SubjectRegistry, extract_url, normalize_subject
+from url_normalizer import url_key
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_CONCURRENCY = 4
+PAGE_SUMMARY_TEXT = 200  # в пачке страница описывается короче, чем в одиночном запросе
+FETCH_PAGES = True  # скачивать начало незнакомых страниц, как в project01_task02.py
+
+registry = SubjectRegistry()
+# Тот же промпт, что у project01_task02.py, поэтому и кеш с ним общий
+cache = ClassificationCache(version=prompt_version(Response.__doc__))
+fetcher = PageFetcher()
+
+
+def page_summary(text: str, limit: int) -> str:
+    """Заголовок и начало текста страницы из запроса или пустая строка"""
+    url = extract_url(text)
+    return fetcher.summary(url, limit) if FETCH_PAGES and url else ""
+
+
+class LinkSubject(BaseModel):
+    link: str = Field(description="Ссылка из запроса без изменений")
+    subject: str = Field(description="Предмет")
+
+
+class BatchResponse(BaseModel):
+    """Результаты классификации всех ссылок из запроса: по одному элементу на каждую ссылку, в том же порядке"""
+    results: List[LinkSubject] = Field(description="Предмет для каждой ссылки из списка")
+
+
+BATCH_PROMPT = SystemMessage(content=Response.__doc__ + """
+Тебе приходит нумерованный список ссылок, под некоторыми — заголовок и начало текста страницы.
+Определи предмет для КАЖДОЙ ссылки по правилам выше
+и верни список results: для каждой ссылки — сама ссылка без изменений и предмет. Не пропускай ссылки.
+""")
+
+base_llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False)
+packed_llm = base_llm.with_structured_output(BatchResponse, include_raw=True)
+single_llm = base_llm.with_structured_output(Response, include_raw=True)
+
+
+def token_usage(raw) -> Dict[str, int]:
+    """Входные и выходные токены из ответа модели"""
+    usage = getattr(raw, "usage_metadata", None) or {}
+    if not usage:
+        metadata = (getattr(raw, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": metadata.get("prompt_tokens", 0),
+                 "output_tokens": metadata.get("completion_tokens", 0)}
+    return {"input_tokens": usage.get("input_tokens", 0) or 0, "output_tokens": usage.get("output_tokens", 0) or 0}
+
+
+class PackedClassifier:
+    """Классификатор пачками со статистикой токенов и задержек"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY):
+        self.batch_size = batch_size
+        self.slots = asyncio.Semaphore(concurrency)
+        self.stats = {"calls": 0, "links": 0, "retried": 0, "failed": 0,
+                      "input_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+
+    def _account(self, raw, elapsed: float):
+        usage = token_usage(raw)
+        self.stats["calls"] += 1
+        self.stats["input_tokens"] += usage["input_tokens"]
+        self.stats["output_tokens"] += usage["output_tokens"]
+        self.stats["seconds"] += elapsed
+
+    async def _packed_call(self, links: List[str]) -> Dict[int, str]:
+        """Один запрос на всю пачку; возвращает номер ссылки → предмет для распознанных ответов"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        pages = await asyncio.gather(*(asyncio.to_thread(page_summary, link, PAGE_SUMMARY_TEXT) for link in links))
+        listing = "\n".join(f"{number}. {link}" + ("\n   " + page.replace("\n", "\n   ") if page else "")
+                             for number, (link, page) in enumerate(zip(links, pages), start=1))
+        started = time.perf_counter()
+        output = await packed_llm.ainvoke([BATCH_PROMPT, HumanMessage(content=f"Дата: {today}. Ссылки:\n{listing}")])
+        self._account(output["raw"], time.perf_counter() - started)
+
+        parsed: Optional[BatchResponse] = output["parsed"]
+        if parsed is None:
+            return {}
+        pending: Dict[str, List[int]] = {}
+        for index, link in enumerate(links):
+            pending.setdefault(url_key(link), []).append(index)
+        matched = {}
+        for item in parsed.results:
+            indexes = pending.get(url_key(item.link))
+            subject = normalize_subject(item.subject)
+            if indexes and subject:
+                matched[indexes.pop(0)] = subject
+        return matched
+
+    async def _single_call(self, link: str) -> str:
+        today = datetime.now().strftime("%Y-%m-%d")
+        prompt = f"Ссылка: {link}. Дата: {today}. Определи предмет и сохрани результат."
+        page = await asyncio.to_thread(page_summary, link, SUMMARY_TEXT)
+        if page:
+            prompt += f"\nСодержимое страницы:\n{page}"
+        started = time.perf_counter()
+        output = await single_llm.ainvoke(prompt)
+        self._account(output["raw"], time.perf_counter() - started)
+        parsed: Optional[Response] = output["parsed"]
+        subject = normalize_subject(parsed.subject) if parsed else None
+        if subject is None:
+            # Ответ не разобран или предмет не из списка: ошибка ссылки, в кеш она не попадет
+            raise ValueError(f"ответ модели не из списка предметов: {parsed.subject if parsed else None!r}")
+        return subject
+
+    async def _classify_chunk(self, links: List[str]) -> Tuple[List[str], Set[int]]:
+        """(предметы, номера ссылок, для которых не удался и поштучный запрос)"""
+        async with self.slots:
+            try:
+                matched = await self._packed_call(links)
+            except Exception:
+                matched = {}  # ответ не разобран — все ссылки пачки переспрашиваем по одной
+        missing = [index for index in range(len(links)) if index not in matched]
+        self.stats["retried"] += len(missing)
+        failed = set()
+
+        async def retry(index: int) -> str:
+            async with self.slots:
+                return await self._single_call(links[index])
+
+        # Ошибка одной ссылки не должна отменять ответы остальных
+        results = await asyncio.gather(*(retry(index) for index in missing), return_exceptions=True)
+        for index, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Ссылка {links[index]} не классифицирована: {result}")
+                failed.add(index)
+                result = OTHER_SUBJECT
+            matched[index] = result
+        self.stats["links"] += len(links)
+        self.stats["failed"] += len(failed)
+        return [matched[index] for index in range(len(links))], failed
+
+    async def classify_chunk(self, links: List[str]) -> List[str]:
+        """Пачка одним запросом, затем поштучный повтор для пропущенных ссылок"""
+        subjects, _ = await self._classify_chunk(links)
+        return subjects
+
+    async def classify_many(self, links: List[str]) -> List[str]:
+        """Предметы для списка ссылок: реестр и кеш, остальное — пачками по batch_size"""
+        subjects: List[Optional[str]] = [registry.lookup(link) or cache.get(link) for link in links]
+        unknown = [index for index, subject in enumerate(subjects) if not subject]
+        chunks = [unknown[start:start + self.batch_size] for start in range(0, len(unknown), self.batch_size)]
+
+        async def run(chunk: List[int]):
+            started = time.perf_counter()
+            results, failed = await self._classify_chunk([links[index] for index in chunk])
+            latency = (time.perf_counter() - started) / len(chunk)
+            for position, (index, subject) in enumerate(zip(chunk, results)):
+                subjects[index] = subject
+                if position not in failed:  # запасной предмет после ошибки не кешируем
+                    cache.put(links[index], subject, latency=latency)
+
+        await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return subjects
+
+    def summary(self) -> dict:
+        """Токены и время на одну ссылку"""
+        links = self.stats["links"] or 1
+        return {
+            **self.stats,
+            "seconds": round(self.stats["seconds"], 2),
+            "tokens_per_link": round((self.stats["input_tokens"] + self.stats["output_tokens"]) / links, 1),
+            "seconds_per_link": round(self.stats["seconds"] / links, 3),
+            "retry_rate": round(self.stats["retried"] / links, 3),
+        }
+
+
+async def main():
+    """Консольный цикл целиком в одном цикле событий: ввод читается в потоке"""
+    classifier = PackedClassifier()
+    links = []
+    while True:
+        user_input = (await asyncio.to_thread(input, "Введите ссылку (пустая строка — классифицировать): ")).strip()
+        if user_input == "exit":
+            break
+        if user_input:
+            links.append(user_input)
+            continue
+        today = datetime.now().strftime("%Y-%m-%d")
+        for link, subject in zip(links, await classifier.classify_many(links)):
+            print(Response(date=today, subject=subject, link=link).model_dump_json())
+        links = []
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,353 @@
+"""Загрузка учебных страниц для классификации по содержимому.
+
+Соединения переиспользуются: на каждый хост держится пул keep-alive
+соединений http.client, а число одновременных запросов к одному хосту
+ограничено семафором. Читаются только первые max_bytes страницы (заголовок,
+meta и первые абзацы), остальное не скачивается.
+
+Страницы складываются сжатыми в каталог page_text.PAGES_DIR, рядом — ETag и
+Last-Modified ответа. Свежая страница берется с диска без сети, устаревшая
+перепроверяется условным запросом (If-None-Match / If-Modified-Since): ответ
+304 обходится без тела. Когда кеш превышает max_cache_bytes, удаляются
+давно не использованные страницы.
+
+Ссылки приходят от пользователей, поэтому загружаются только http и https на
+публичные адреса: хост разрешается до подключения, и если среди его адресов
+есть localhost, частная сеть, link-local (в том числе 169.254.169.254) или
+другой служебный диапазон, запрос не отправляется. Соединение открывается на
+проверенный адрес, так что повторное разрешение имени его не подменит.
+Перенаправления проверяются так же.
+
+Запуск из консоли:
+    python page_fetcher.py https://stepik.org/course/67/promo https://devpractice.ru/python/
+"""
+import argparse
+import http.client
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import defaultdict
+from email.utils import formatdate
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import page_text
+
+DEFAULT_MAX_BYTES = 64 * 1024  # начала страницы хватает для заголовка, meta и первых абзацев
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_PER_HOST = 2  # одновременных запросов к одному сайту
+DEFAULT_FRESH_TTL = 24 * 3600  # столько секунд страница считается свежей без перепроверки
+DEFAULT_MAX_CACHE_BYTES = 50 * 1024 * 1024
+MAX_REDIRECTS = 3
+USER_AGENT = "Mozilla/5.0 (compatible; StudyLinksBot/1.0)"
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+ALLOWED_SCHEMES = ("http", "https")
+
+
+class BlockedAddress(ValueError):
+    """Ссылка ведет не на публичный http(s)-адрес"""
+
+
+def check_address(address: str):
+    """Пропускает только публичные адреса; иначе BlockedAddress"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])  # у link-local IPv6 бывает суффикс %интерфейс
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped  # ::ffff:127.0.0.1 — тот же localhost
+    # is_global ложно для localhost, частных сетей, link-local и прочих служебных диапазонов
+    if ip.is_multicast or not ip.is_global:
+        raise BlockedAddress(f"адрес {address} не публичный")
+
+
+def public_addresses(host: str, port: int) -> List[str]:
+    """Адреса хоста; BlockedAddress, если хотя бы один из них не публичный"""
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        check_address(sockaddr[0])
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+def guarded_connect(address, timeout=None, source_address=None):
+    """Замена socket.create_connection для http.client: подключение только к проверенным адресам"""
+    host, port = address
+    error = None
+    for ip in public_addresses(host, port):
+        try:
+            return socket.create_connection((ip, port), timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error or OSError(f"нет адресов для {host}")
+
+
+class ConnectionPool:
+    """Keep-alive соединения по хостам и ограничение одновременных запросов к хосту"""
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST, timeout: float = DEFAULT_TIMEOUT,
+                 allow_private: bool = False):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.allow_private = allow_private  # только для проверок с локальным сервером
+        self.idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = defaultdict(list)
+        self.slots: Dict[Tuple[str, str, int], threading.BoundedSemaphore] = {}
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def slot(self, origin: Tuple[str, str, int]) -> threading.BoundedSemaphore:
+        with self.lock:
+            if origin not in self.slots:
+                self.slots[origin] = threading.BoundedSemaphore(self.per_host)
+            return self.slots[origin]
+
+    def acquire(self, origin: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """(соединение, взято ли из пула)"""
+        with self.lock:
+            if self.idle[origin]:
+                self.reused += 1
+                return self.idle[origin].pop(), True
+            self.opened += 1
+        scheme, host, port = origin
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.timeout)
+        if not self.allow_private:
+            connection._create_connection = guarded_connect  # TLS и Host по-прежнему по имени хоста
+        return connection, False
+
+    def release(self, origin: Tuple[str, str, int], connection: http.client.HTTPConnection, reusable: bool):
+        if not reusable:
+            connection.close()
+            return
+        with self.lock:
+            if len(self.idle[origin]) < self.per_host:
+                self.idle[origin].append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+
+class PageCache:
+    """Сжатые страницы в каталоге с метаданными ответа и вытеснением по размеру"""
+
+    def __init__(self, pages_dir: str = page_text.PAGES_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.pages_dir = pages_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.evicted = 0
+        os.makedirs(pages_dir, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(pages_dir) if entry.is_file())
+
+    def _meta_path(self, url: str) -> str:
+        return page_text.page_path(url, self.pages_dir)[:-len(".html.gz")] + ".json"
+
+    def get(self, url: str) -> Tuple[Optional[bytes], dict]:
+        """(байты страницы или None, метаданные ответа)"""
+        raw = page_text.load_raw(url, self.pages_dir)
+        if raw is None:
+            return None, {}
+        try:
+            with open(self._meta_path(url), encoding="utf-8") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            meta = {}
+        try:
+            os.utime(page_text.page_path(url, self.pages_dir))  # время использования для вытеснения
+        except OSError:
+            pass
+        return raw, meta
+
+    def put(self, url: str, raw: bytes, meta: dict):
+        path = page_text.page_path(url, self.pages_dir)
+        meta_path = self._meta_path(url)
+        with self.lock:
+            self.size -= sum(os.path.getsize(old) for old in (path, meta_path) if os.path.exists(old))
+            page_text.save_page(url, raw, self.pages_dir)
+            self._write_meta(meta_path, meta)
+            self.size += os.path.getsize(path) + os.path.getsize(meta_path)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def touch(self, url: str, meta: dict):
+        """Страница подтверждена ответом 304: обновляем только метаданные"""
+        with self.lock:
+            self._write_meta(self._meta_path(url), meta)
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: dict):
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _evict(self):
+        # Удаляем самые давно использованные страницы, пока кеш не станет на четверть меньше лимита
+        pages = sorted((entry.stat().st_mtime, entry.path) for entry in os.scandir(self.pages_dir)
+                       if entry.name.endswith(".html.gz"))
+        target = self.max_bytes * 3 // 4
+        for _, path in pages:
+            if self.size <= target:
+                break
+            for victim in (path, path[:-len(".html.gz")] + ".json"):
+                try:
+                    self.size -= os.path.getsize(victim)
+                    os.remove(victim)
+                except OSError:
+                    pass
+            self.evicted += 1
+
+
+class PageFetcher:
+    """Начало страницы по ссылке: из кеша, условным запросом или обычным GET"""
+
+    def __init__(self, pages_dir: str = page_text.PAGES_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 per_host: int = DEFAULT_PER_HOST, fresh_ttl: float = DEFAULT_FRESH_TTL,
+                 max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES, timeout: float = DEFAULT_TIMEOUT,
+                 allow_private: bool = False):
+        self.max_bytes = max_bytes
+        self.fresh_ttl = fresh_ttl
+        self.pool = ConnectionPool(per_host, timeout, allow_private)
+        self.cache = PageCache(pages_dir, max_cache_bytes)
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def _request(self, url: str, headers: dict) -> Tuple[int, dict, bytes]:
+        """GET через пул: (статус, заголовки, первые max_bytes тела)"""
+        # Адрес запроса берется из исходной ссылки: канонический вид без www. может вести на другой сервер
+        parts = urlsplit(url if "://" in url else "http://" + url)
+        scheme = parts.scheme.lower()
+        if scheme not in ALLOWED_SCHEMES:
+            raise BlockedAddress(f"схема {scheme} не поддерживается")
+        hostname = (parts.hostname or "").encode("idna").decode("ascii")
+        origin = (scheme, hostname, parts.port or (443 if scheme == "https" else 80))
+        target = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+        with self.pool.slot(origin):
+            for attempt in range(2):
+                connection, reused = self.pool.acquire(origin)
+                try:
+                    connection.request("GET", target, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read(self.max_bytes)
+                    # Тело дочитано — соединение можно вернуть в пул, иначе его придется закрыть
+                    complete = response.isclosed() or response.length == 0
+                    reusable = complete and not response.will_close
+                    self.pool.release(origin, connection, reusable)
+                    self._count("bytes_read", len(body))
+                    if not complete:
+                        self._count("truncated")
+                    response_headers = {key.lower(): value for key, value in response.getheaders()}
+                    if response_headers.get("content-encoding", "").lower() == "gzip":
+                        body = self._gunzip(body)
+                    return response.status, response_headers, body
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    connection.close()
+                    if not reused or attempt:
+                        raise  # сервер закрыл простаивавшее соединение — повторяем один раз на новом
+                except Exception:
+                    connection.close()
+                    raise
+
+    def _gunzip(self, body: bytes) -> bytes:
+        # Сжатое тело могло быть обрезано на max_bytes: распаковываем сколько есть, не больше max_bytes
+        try:
+            return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, self.max_bytes)
+        except zlib.error as error:
+            raise ValueError(f"поврежденный gzip: {error}")
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Первые max_bytes HTML-страницы или None, если страница недоступна и ее нет в кеше"""
+        self._count("requests")
+        cached, meta = self.cache.get(url)
+        if cached is not None and time.time() - meta.get("checked_at", 0) < self.fresh_ttl:
+            self._count("cache_hits")
+            return cached
+
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml",
+                   "Accept-Encoding": "gzip", "Range": f"bytes=0-{self.max_bytes - 1}"}
+        if cached is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            elif meta.get("checked_at"):
+                headers["If-Modified-Since"] = formatdate(meta["checked_at"], usegmt=True)
+
+        location = url
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, response_headers, body = self._request(location, headers)
+                if status in (301, 302, 303, 307, 308) and response_headers.get("location"):
+                    location = urljoin(location, response_headers["location"])
+                    continue
+                break
+        except BlockedAddress as error:
+            logging.warning(f"Страница {url} не загружена: {error}")
+            self._count("blocked")
+            return None
+        except (OSError, http.client.HTTPException, ValueError) as error:
+            logging.warning(f"Страница {url} не загружена: {error}")
+            self._count("errors")
+            return cached  # устаревшая копия лучше, чем ничего
+
+        meta = dict(meta, url=url, checked_at=time.time())
+        if status == 304 and cached is not None:
+            self._count("not_modified")
+            self.cache.touch(url, meta)
+            return cached
+        content_type = response_headers.get("content-type", "text/html").split(";")[0].strip().lower()
+        if status not in (200, 206) or content_type not in HTML_TYPES:
+            self._count("errors")
+            return cached
+        self._count("downloads")
+        meta.update(etag=response_headers.get("etag"), last_modified=response_headers.get("last-modified"),
+                    status=status)
+        self.cache.put(url, body, meta)
+        return body
+
+    def summary(self, url: str, limit: int = page_text.SUMMARY_TEXT) -> str:
+        """Заголовок и начало текста страницы для промпта; пустая строка, если страницы нет"""
+        raw = self.fetch(url)
+        return page_text.summary(page_text.decode_html(raw), limit) if raw else ""
+
+    def close(self):
+        self.pool.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.counters)
+        stats.update(connections_opened=self.pool.opened, connections_reused=self.pool.reused,
+                     cache_bytes=self.cache.size, evicted=self.cache.evicted)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка страниц в кеш для классификации по содержимому")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--pages", default=page_text.PAGES_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args()
+
+    fetcher = PageFetcher(args.pages, max_bytes=args.max_bytes)
+    for url in args.urls:
+        print(f"{url}\n{fetcher.summary(url) or '(страница недоступна)'}\n")
+    fetcher.close()
+    print(fetcher.stats())
+
+
+if __name__ == "__main__":
+    main()
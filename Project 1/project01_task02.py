@@ -1,72 +1,39 @@
 from langchain_gigachat import GigaChat
-from langchain_core.messages import SystemMessage, HumanMessage
-from pydantic import BaseModel, Field
 import json
+import time
 from datetime import datetime
 
-# BaseModel - базовый класс для всех моделей в pydantic.
-class Response(BaseModel):
-    # Строка ниже — это docstring для класса. Он описывает, что делает класс.
-    # В нашем случае эта строка будет промптом для LLM.
-    # Так что внимательно отнесись к тому, что ты в ней напишешь.
-    """Ты - помощник для классификации учебных материалов по предметам.
-Определи, для какого из следующих предметов материал будет наиболее полезен:
+from subject_registry import SubjectRegistry, extract_url
+from classification_cache import ClassificationCache, prompt_version
+from page_fetcher import PageFetcher
+from jsonl_store import JsonlStore
+from knn_classifier import KnnIndex
+from page_text import SUMMARY_TEXT
+from classifier_prompts import API_KEY, Response
 
-1. Численные методы
-2. Компьютерные сети
-3. Программирование на python
-4. Физика
+FETCH_PAGES = True  # скачивать начало незнакомых страниц и передавать его модели
 
-Проанализируй содержание материала и верни название подходящего предмета без дополнительных объяснений, комментариев или пунктуации.
-Если материал не подходит ни к одному предмету, верни "Другой предмет". Если данная ссылка находится в приведенном списке, выведи название раздела, под которым она находится:
-Численные методы
-https://books.altspu.ru/document/65
-https://openedu.ru/course/spbstu/NUMMETH/
-http://wiki.cs.hse.ru/%D0%A7%D0%B8%D1%81%D0%BB%D0%B5%D0%BD%D0%BD%D1%8B%D0%B5_%D0%9C%D0%B5%D1%82%D0%BE%D0%B4%D1%8B_2021
-https://www.hse.ru/edu/courses/339562855
-https://teach-in.ru/course/numerical-methods-part-1
-https://www.matburo.ru/st_subject.php?p=dr&rut=d992e77c9b77270bef82d706c585bfda4bdda23e35a9fb73a75809a9bc7c9608
-
-Компьютерные сети
-https://proglib.io/p/network-books
-https://asozykin.ru/courses/networks_online
-https://sites.google.com/view/malikov-m-v/%D1%81%D1%82%D1%83%D0%B4%D0%B5%D0%BD%D1%82%D0%B0%D0%BC/3-%D0%BA%D1%83%D1%80%D1%81/%D0%BA%D0%BE%D0%BC%D0%BF%D1%8C%D1%8E%D1%82%D0%B5%D1%80%D0%BD%D1%8B%D0%B5-%D1%81%D0%B5%D1%82%D0%B8
-https://www.journal-altspu.ru/document/129
-https://ru.hexlet.io/blog/posts/kompyuternaya-set-chto-eto-takoe-osnovnye-printsipy
-https://gb.ru/courses/3731
-
-
-Программирование на python
-
-https://www.knorus.ru/catalog/informatika/698633-programmnaya-inzheneriya-bakalavriat-magistratura-uchebnik/
-https://stepik.org/course/67/promo
-https://ru.pythontutor.ru/problem/old/1
-https://selectel.ru/blog/courses/course-python/
-https://devpractice.ru/python/
-
-Физика
-https://madi.ru/438-kafedra-fizika-uchebnye-posobiya-po-lekcionnomu-kursu.html
-https://znanierussia.ru/articles/%D0%9A%D0%BB%D0%B0%D1%81%D1%81%D0%B8%D1%87%D0%B5%D1%81%D0%BA%D0%B0%D1%8F_%D0%BC%D0%B5%D1%85%D0%B0%D0%BD%D0%B8%D0%BA%D0%B0
-https://bigenc.ru/l/nachala-termodinamiki-7415b1
-https://naked-science.ru/tags/elektrodinamika
-https://nonfiction.ru/stream/kvantovaya-fizika-za-5-minut-glavnyie-voprosyi-i-idei
+llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False).with_structured_output(Response)
 
-если ссылки в этом списке нет, открой ее и проанализируй содержимое самостоятельно
-если дата не определяется, выведи дату, когда был произведён этот запрос
+# Индекс предопределенных ссылок: известные ссылки классифицируются без LLM
+registry = SubjectRegistry()
 
-Пример правильного ответа:
-{"date":"10.20.2025","subject":"Физика","link":"https://bigenc.ru/l/nachala-termodinamiki-7415b1"}
+# Кеш ответов LLM; версия промпта входит в ключ, правка промпта сбрасывает кеш
+cache = ClassificationCache(version=prompt_version(Response.__doc__))
 
-    """
+# Загрузка страниц: пул соединений по хостам, условные запросы и сжатый кеш в pages/
+fetcher = PageFetcher()
 
-    # description - описание поля. Это тоже промпт для LLM!
-    date: str = Field(description="Дата получения ссылки")
-    subject: str = Field(description="Предмет")
-    link: str = Field(description ="Оригинальная ссылка")
+# Ближайшие размеченные ссылки истории: при согласии соседей LLM не вызывается.
+# Журнал requests.jsonl пишут project01_task03.py и batch_classify.py, здесь он только читается:
+# без open_store, чтобы не переносить requests.json и не переименовывать его в .bak
+knn = KnnIndex().build(JsonlStore().iter_records())
 
-API_KEY = "YOUR API KEY"
 
-llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False).with_structured_output(Response)
+def page_summary(text: str, limit: int = SUMMARY_TEXT) -> str:
+    """Заголовок и начало текста страницы из запроса или пустая строка"""
+    url = extract_url(text)
+    return fetcher.summary(url, limit) if FETCH_PAGES and url else ""
 
 
 
@@ -76,6 +43,21 @@ if __name__ == "__main__":
         user_input = input("Введите промпт: ")
         prompt = f"Ссылка: {user_input}. Дата: {today}. Определи предмет и сохрани результат."
         if user_input == "exit":
+            print(f"Статистика реестра ссылок: {registry.stats()}")
+            print(f"Статистика кеша: {cache.stats()}")
+            print(f"Статистика загрузки страниц: {fetcher.stats()}")
+            print(f"Статистика соседей из истории: {knn.stats()}")
+            fetcher.close()
             break
-        response = llm.invoke(prompt)
+        subject = registry.lookup(user_input) or cache.get(user_input) or knn.predict(user_input)
+        if subject:
+            response = Response(date=today, subject=subject, link=user_input)
+        else:
+            page = page_summary(user_input)
+            if page:
+                prompt += f"\nСодержимое страницы:\n{page}"
+            started = time.perf_counter()
+            response = llm.invoke(prompt)
+            cache.put(user_input, response.subject, latency=time.perf_counter() - started)
+            knn.add({"link": user_input, "subject": response.subject})  # страница уже в pages/ после загрузки
         print(response.model_dump_json())
@@ -2,8 +2,20 @@ from langchain_gigachat import GigaChat
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 import json
+import time
 from datetime import datetime
 
+from subject_registry import SubjectRegistry, extract_url
+from url_normalizer import canonicalize_url
+from classification_cache import ClassificationCache, prompt_version
+from jsonl_store import open_store
+from link_index import DEDUP_LINK
+from knn_classifier import KnnIndex
+
+# История запросов: журнал requests.jsonl, старый requests.json переносится при первом запуске.
+# Повторная ссылка не добавляет запись, а увеличивает count и обновляет last_seen
+store = open_store(dedup=DEDUP_LINK)
+
 class WriteToFile(BaseModel):
     date: str = Field(description="Дата получения ссылки")
     subject: str = Field(description="Предмет")
@@ -66,18 +78,11 @@ def write_to_file(date: str, subject: str, link: str):
     Другой предмет
         """
 
-    data = {"date": date, "subject": subject, "link": link}
-
-    try:
-        with open('requests.json', 'r', encoding='utf-8') as file:
-            existing_data = json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing_data = []
-
-    existing_data.append(data)
+    url = extract_url(link)
+    # Ссылка сохраняется в каноническом виде: варианты с метками и www. не дублируют друг друга
+    data = {"date": date, "subject": subject, "link": canonicalize_url(url) if url else link}
 
-    with open('requests.json', 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, indent = 2, ensure_ascii=False)
+    store.append(data)  # одна строка в конец журнала вместо перезаписи всего файла
     return("Данные записаны")
 
 # Твой ключ API GigaChat https://developers.sber.ru/docs/ru/gigachat/quickstart/ind-using-api
@@ -87,6 +92,15 @@ tools = [write_to_file]
 
 llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False).bind_tools(tools, tool_choice = "write_to_file")
 
+# Индекс предопределенных ссылок: известные ссылки классифицируются без LLM
+registry = SubjectRegistry()
+
+# Кеш ответов LLM; версия промпта входит в ключ, правка промпта сбрасывает кеш
+cache = ClassificationCache(version=prompt_version(write_to_file.description))
+
+# Ближайшие размеченные ссылки истории: при согласии соседей LLM не вызывается
+knn = KnnIndex().build(store.iter_records())
+
 
 
 if __name__ == "__main__":
@@ -95,7 +109,18 @@ if __name__ == "__main__":
         user_input = input("Введите промпт: ")
         prompt = f"Ссылка: {user_input}. Дата: {today}. Определи предмет и сохрани результат."
         if user_input == "exit":
+            print(f"Статистика реестра ссылок: {registry.stats()}")
+            print(f"Статистика кеша: {cache.stats()}")
+            print(f"Статистика соседей из истории: {knn.stats()}")
             break
+        subject = registry.lookup(user_input) or cache.get(user_input)
+        if subject or (subject := knn.predict(user_input)):
+            print(write_to_file.invoke({"date": today, "subject": subject, "link": user_input}))
+            continue
+        started = time.perf_counter()
         response = llm.invoke(prompt)
+        args = response.tool_calls[0]["args"]
+        cache.put(user_input, args.get("subject", ""), latency=time.perf_counter() - started)
+        knn.add({"link": user_input, "subject": args.get("subject", "")})
         result = write_to_file.invoke(response.tool_calls[0])
         print(result.content)
@@ -0,0 +1,201 @@
+"""Проверки classify_server без GigaChat: сервер со StubBackend на случайном порту.
+
+Запуск:
+    python -m pytest -q test_classify_server.py
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import List
+
+import pytest
+
+from classify_server import MAX_BODY, ClassifyServer, MicroBatcher, StubBackend, parse_length
+from subject_registry import OTHER_SUBJECT
+
+
+class CountingBackend(StubBackend):
+    """Заглушка, которая запоминает пачки и может ждать разрешения на ответ"""
+
+    def __init__(self, delay: float = 0):
+        super().__init__(delay)
+        self.calls: List[List[str]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, links: List[str]) -> List[str]:
+        self.calls.append(list(links))
+        await self.release.wait()
+        return await super().__call__(links)
+
+
+@asynccontextmanager
+async def running_server(backend=None, **options):
+    """Сервер на свободном порту; отдает (сервер, порт)"""
+    batcher = MicroBatcher(backend or StubBackend(delay=0), **{"window": 0.001, **options})
+    batcher.start()
+    server = ClassifyServer(batcher)
+    listener = await asyncio.start_server(server.serve_connection, "127.0.0.1", 0)
+    try:
+        yield server, listener.sockets[0].getsockname()[1]
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        batcher.task.cancel()
+
+
+async def exchange(raw: bytes) -> bytes:
+    """Поднимает сервер, отправляет сырой запрос и читает ответ до закрытия соединения"""
+    async with running_server() as (_, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple:
+    """(заголовки, тело) одного ответа по Content-Length, соединение остается открытым"""
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    length = int(head.lower().split("content-length:", 1)[1].split("\r\n", 1)[0])
+    return head, await reader.readexactly(length)
+
+
+async def post(port: int, link: str) -> bytes:
+    """Отдельное соединение на один запрос /classify, возвращает тело ответа"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request(link.encode("utf-8"), str(len(link.encode("utf-8")))))
+    await writer.drain()
+    _, body = await asyncio.wait_for(read_response(reader), 5)
+    writer.close()
+    return body
+
+
+async def get_stats(port: int) -> dict:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /stats HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    _, body = await asyncio.wait_for(read_response(reader), 5)
+    writer.close()
+    return json.loads(body)
+
+
+def request(body: bytes, length: str, path: str = "/classify", connection: str = "close") -> bytes:
+    return (f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n"
+            f"Connection: {connection}\r\n\r\n").encode("latin-1") + body
+
+
+def status(response: bytes) -> int:
+    return int(response.split(b" ", 2)[1])
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 0), ("", 0), ("0", 0), ("17", 17),
+    ("abc", None), ("-1", None), ("+5", None), ("1.5", None), ("²", None),
+])
+def test_parse_length(value, expected):
+    assert parse_length(value) == expected
+
+
+def test_classify_link():
+    body = b"https://example.com/article"
+    response = asyncio.run(exchange(request(body, str(len(body)))))
+    assert status(response) == 200
+    assert response.endswith(OTHER_SUBJECT.encode("utf-8"))
+
+
+def test_classify_response_format():
+    body = json.dumps({"link": "https://example.com/article"}).encode("utf-8")
+    response = asyncio.run(exchange(request(body, str(len(body)), "/classify/response")))
+    assert status(response) == 200
+    payload = json.loads(response.split(b"\r\n\r\n", 1)[1])
+    assert payload["link"] == "https://example.com/article"
+    assert payload["subject"] == OTHER_SUBJECT
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_bad_content_length(length):
+    response = asyncio.run(exchange(request(b"https://example.com", length)))
+    assert status(response) == 400
+    assert b"Connection: close" in response
+
+
+def test_body_too_large():
+    response = asyncio.run(exchange(request(b"", str(MAX_BODY + 1))))
+    assert status(response) == 413
+
+
+def test_empty_body():
+    response = asyncio.run(exchange(request(b"", "0")))
+    assert status(response) == 400
+
+
+def test_concurrent_requests_share_one_batch():
+    links = [f"https://example.com/article/{number}" for number in range(8)]
+
+    async def scenario():
+        backend = CountingBackend()
+        async with running_server(backend, window=0.2) as (server, port):
+            bodies = await asyncio.gather(*(post(port, link) for link in links))
+            return backend.calls, bodies, server.batcher.stats()
+
+    calls, bodies, stats = asyncio.run(scenario())
+    assert len(calls) == 1  # все запросы пришли в пределах окна
+    assert sorted(calls[0]) == sorted(links)
+    assert bodies == [OTHER_SUBJECT.encode("utf-8")] * len(links)
+    assert stats["batches"] == 1 and stats["avg_batch"] == len(links)
+
+
+def test_max_batch_splits_requests():
+    async def scenario():
+        backend = CountingBackend()
+        async with running_server(backend, window=0.2, max_batch=3) as (_, port):
+            await asyncio.gather(*(post(port, f"https://example.com/{number}") for number in range(7)))
+        return backend.calls
+
+    assert sorted(len(batch) for batch in asyncio.run(scenario())) == [1, 3, 3]
+
+
+def test_keep_alive_reuses_connection():
+    links = [f"https://example.com/keep/{number}" for number in range(3)]
+
+    async def scenario():
+        async with running_server() as (server, port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            replies = []
+            for link in links:
+                body = link.encode("utf-8")
+                writer.write(request(body, str(len(body)), connection="keep-alive"))
+                await writer.drain()
+                replies.append(await asyncio.wait_for(read_response(reader), 5))
+            writer.close()
+            return replies, server.connections, server.requests
+
+    replies, connections, requests = asyncio.run(scenario())
+    assert all("Connection: keep-alive" in head for head, _ in replies)
+    assert [body for _, body in replies] == [OTHER_SUBJECT.encode("utf-8")] * len(links)
+    assert connections == 1
+    assert requests == len(links)
+
+
+def test_stats_queue_depth():
+    async def scenario():
+        backend = CountingBackend()
+        backend.release.clear()  # модель «думает», пока ее не отпустят
+        async with running_server(backend, window=0.01, max_inflight=1) as (_, port):
+            first = asyncio.create_task(post(port, "https://example.com/first"))
+            while not backend.calls:
+                await asyncio.sleep(0.005)
+            waiting = [asyncio.create_task(post(port, f"https://example.com/wait/{number}")) for number in range(3)]
+            await asyncio.sleep(0.1)  # окно прошло, пачка ждет свободного слота
+            busy = await get_stats(port)
+            backend.release.set()
+            await asyncio.gather(first, *waiting)
+            return busy, await get_stats(port)
+
+    busy, idle = asyncio.run(scenario())
+    assert busy["inflight"] == 1
+    assert busy["queue_depth"] == 3
+    assert idle["queue_depth"] == 0 and idle["inflight"] == 0
+    assert idle["batches"] == 2 and idle["links"] == 4
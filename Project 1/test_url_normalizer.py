@@ -0,0 +1,64 @@
+"""Проверки url_normalizer на ссылках из промптов и примерах из истории.
+
+Запуск:
+    python -m pytest -q test_url_normalizer.py
+"""
+import pytest
+
+from subject_registry import PREDEFINED_LINKS
+from url_normalizer import canonicalize_url, is_tracking_param, url_key
+
+PROMPT_LINKS = [(subject, link) for subject, links in PREDEFINED_LINKS.items() for link in links]
+
+
+def test_prompt_links_stay_distinct():
+    keys = {}
+    for _, link in PROMPT_LINKS:
+        key = url_key(link)
+        assert key not in keys, f"{link} совпала с {keys[key]}"
+        keys[key] = link
+
+
+@pytest.mark.parametrize("subject, link", PROMPT_LINKS)
+def test_canonical_link_is_stable(subject, link):
+    # Повторная канонизация не меняет ключ
+    assert url_key(canonicalize_url(link)) == url_key(link)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    # Ссылка из requests.json: метки roistat и yclid не создают новую ссылку
+    ("https://www.hse.ru/edu/dpo/472490501?roistat=direct38_search_17340007103_---autotargeting"
+     "&roistat_referrer=none&roistat_pos=premium_3&yclid=7853765440819953663",
+     "https://hse.ru/edu/dpo/472490501"),
+    ("https://www.hse.ru/edu/courses/339562855", "https://hse.ru/edu/courses/339562855"),
+    ("HTTPS://Stepik.org/course/67/promo/?utm_source=tg&utm_medium=post#reviews", "https://stepik.org/course/67/promo"),
+    ("https://openedu.ru:443/course/spbstu/NUMMETH/", "https://openedu.ru/course/spbstu/NUMMETH"),
+    # Параметры страницы сохраняются, порядок не важен
+    ("https://www.matburo.ru/st_subject.php?rut=d992e77c9b77270bef82d706c585bfda4bdda23e35a9fb73a75809a9bc7c9608&p=dr",
+     "https://matburo.ru/st_subject.php?p=dr&rut=d992e77c9b77270bef82d706c585bfda4bdda23e35a9fb73a75809a9bc7c9608"),
+    # Регистр %-кодов и кириллица из адресной строки
+    ("http://wiki.cs.hse.ru/%d0%a7%d0%b8%d1%81%d0%bb%d0%b5%d0%bd%d0%bd%d1%8b%d0%b5_%d0%9c%d0%b5%d1%82%d0%be%d0%b4%d1%8b_2021",
+     "http://wiki.cs.hse.ru/%D0%A7%D0%B8%D1%81%D0%BB%D0%B5%D0%BD%D0%BD%D1%8B%D0%B5_%D0%9C%D0%B5%D1%82%D0%BE%D0%B4%D1%8B_2021"),
+    ("https://znanierussia.ru/articles/Классическая_механика",
+     "https://znanierussia.ru/articles/%D0%9A%D0%BB%D0%B0%D1%81%D1%81%D0%B8%D1%87%D0%B5%D1%81%D0%BA%D0%B0%D1%8F_%D0%BC%D0%B5%D1%85%D0%B0%D0%BD%D0%B8%D0%BA%D0%B0"),
+    ("www.python.org/", "http://python.org/"),
+    ("https://example.org/%7Euser/a%2Fb", "https://example.org/~user/a%2Fb"),
+])
+def test_canonicalize_url(raw, expected):
+    assert canonicalize_url(raw) == expected
+
+
+def test_http_and_https_share_key():
+    assert url_key("http://bigenc.ru/l/nachala-termodinamiki-7415b1") == url_key(PREDEFINED_LINKS["Физика"][2])
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("utm_source", True), ("UTM_Campaign", True), ("roistat_pos", True), ("yclid", True),
+    ("p", False), ("id", False), ("utm", False),
+])
+def test_is_tracking_param(name, expected):
+    assert is_tracking_param(name) == expected
+
+
+def test_empty_key():
+    assert url_key(None) == url_key("") == ""
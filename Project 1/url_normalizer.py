@@ -0,0 +1,114 @@
+"""Канонический вид ссылок.
+
+Одна и та же страница приходит в разных вариантах: http и https, с www. и без,
+со слэшем в конце, с разным регистром %-кодов, с метками рекламных систем
+(roistat, yclid, utm_*) и якорем. Для сопоставления, кеширования и
+дедупликации все варианты приводятся к одному виду.
+
+Проверка правил на реальных ссылках из промптов:
+    python -m pytest -q test_url_normalizer.py
+"""
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote, urlsplit, urlunsplit
+
+# Параметры запроса, которые не меняют содержимое страницы.
+# Точные имена сравниваются без учета регистра, префиксы — по началу имени.
+TRACKING_PARAMS = {
+    "yclid": "Яндекс Директ",
+    "ysclid": "Яндекс, переход из поиска",
+    "_openstat": "Openstat",
+    "gclid": "Google Ads",
+    "dclid": "Google Display",
+    "fbclid": "Facebook",
+    "msclkid": "Microsoft Ads",
+    "igshid": "Instagram",
+    "mc_cid": "Mailchimp",
+    "mc_eid": "Mailchimp",
+    "_ga": "Google Analytics, сквозная сессия",
+    "_gl": "Google Analytics, сквозная сессия",
+}
+TRACKING_PREFIXES = {
+    "utm_": "UTM-метки",
+    "roistat": "Roistat: roistat, roistat_referrer, roistat_pos",
+    "pk_": "Matomo/Piwik",
+    "mtm_": "Matomo",
+}
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+UNRESERVED = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+PERCENT_PATTERN = re.compile(r"%([0-9A-Fa-f]{2})")
+PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+QUERY_SAFE = PATH_SAFE + "?"
+
+
+def is_tracking_param(name: str) -> bool:
+    """Параметр из таблицы рекламных и аналитических меток"""
+    name = name.lower()
+    return name in TRACKING_PARAMS or any(name.startswith(prefix) for prefix in TRACKING_PREFIXES)
+
+
+def _normalize_percent(text: str, safe: str) -> str:
+    # %-коды незарезервированных символов раскрываются, остальные — в верхнем регистре;
+    # символы вне ASCII (кириллица, вставленная из адресной строки) кодируются
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED else "%" + match.group(1).upper()
+    return quote(PERCENT_PATTERN.sub(fix, text), safe=safe)
+
+
+def _normalize_host(netloc: str, scheme: str) -> str:
+    host = netloc.rsplit("@", 1)[-1].lower()  # логин и пароль в ссылке не нужны
+    port = ""
+    if ":" in host and not host.endswith("]"):
+        host, port = host.rsplit(":", 1)
+    host = host.rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        host = host.encode("idna").decode("ascii")  # кириллические домены — в punycode
+    except UnicodeError:
+        pass
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host += ":" + port
+    return host
+
+
+def _normalize_query(query: str) -> str:
+    parts = []
+    for part in query.split("&"):
+        if not part:
+            continue
+        name = part.split("=", 1)[0]
+        if is_tracking_param(PERCENT_PATTERN.sub(lambda m: chr(int(m.group(1), 16)), name)):
+            continue
+        parts.append(_normalize_percent(part, QUERY_SAFE))
+    return "&".join(sorted(parts))
+
+
+def split_url(url: str) -> Tuple[str, str, str, str]:
+    """Схема, хост, путь и запрос в каноническом виде"""
+    url = url.strip()
+    if not re.match(r"[a-z][a-z0-9+.-]*://", url, re.IGNORECASE):
+        url = "http://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = _normalize_host(parts.netloc, scheme)
+    path = _normalize_percent(parts.path, PATH_SAFE).rstrip("/")
+    query = _normalize_query(parts.query)
+    return scheme, host, path, query
+
+
+def canonicalize_url(url: str) -> str:
+    """Каноническая ссылка: без меток, якоря, www., порта по умолчанию и завершающего слэша"""
+    scheme, host, path, query = split_url(url)
+    return urlunsplit((scheme, host, path or "/", query, ""))
+
+
+def url_key(url: Optional[str]) -> str:
+    """Ключ для сопоставления и кеша: каноническая ссылка без схемы (http и https совпадают)"""
+    if not url:
+        return ""
+    _, host, path, query = split_url(url)
+    return host + path + ("?" + query if query else "")
+
@@ -0,0 +1,97 @@
+"""Сравнение filter_data с колоночным хранилищем.
+
+Запуск:
+    python bench_filter.py                      # 10k, 1M и 10M записей
+    python bench_filter.py --rows 10000 100000
+
+Для каждого объема генерируется синтетическая история, затем замеряется
+фильтр «предмет за 30 дней» в исходном виде (цикл по словарям с
+datetime.fromisoformat) и в колоночном (векторная маска NumPy).
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from columnar_store import ColumnarStore
+from subject_registry import SUBJECTS, OTHER_SUBJECT
+
+
+def legacy_filter(data: list, subject: str, days: int = 30) -> list:
+    """Тело инструмента filter_data из project02_task01.py"""
+    filtered = []
+    cutoff_date = datetime.now() - timedelta(days=days)
+
+    for item in data:
+        if item.get('subject') == subject:
+            saved_at = item.get('saved_at', '')
+            try:
+                item_date = datetime.fromisoformat(saved_at)
+                if item_date >= cutoff_date:
+                    filtered.append(item)
+            except ValueError:
+                filtered.append(item)
+
+    return filtered
+
+
+def generate(rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    subjects = SUBJECTS + [OTHER_SUBJECT]
+    now = datetime.now()
+    for i in range(rows):
+        saved_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        yield {
+            "date": saved_at.strftime("%Y-%m-%d"),
+            "subject": rng.choice(subjects),
+            "original_link": f"https://example.com/materials/{i}",
+            "saved_at": saved_at.isoformat(),
+        }
+
+
+def timed(func, repeat: int = 3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench(rows: int, subject: str, days: int):
+    directory = tempfile.mkdtemp(prefix="columns_")
+    try:
+        data = list(generate(rows))
+        store = ColumnarStore(directory)
+        for start in range(0, rows, 100_000):
+            store.append_many(data[start:start + 100_000])
+
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+        legacy_time, legacy_rows = timed(lambda: legacy_filter(data, subject, days))
+        mask_time, mask_rows = timed(lambda: store.filter_rows(subject, since))
+        query_time, _ = timed(lambda: store.query(subject, since))
+
+        print(f"{rows:>10}  filter_data {legacy_time:9.4f} с ({len(legacy_rows)} строк)  "
+              f"маска {mask_time:9.4f} с ({len(mask_rows)} строк, x{legacy_time / mask_time:,.0f})  "
+              f"маска + словари {query_time:9.4f} с")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--subject", default="Физика")
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        bench(rows, args.subject, args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Пропускная способность сохранений при конкурентной записи.
+
+Запуск:
+    python bench_group_commit.py --writers 32 --records 50
+
+Сравниваются три способа сохранить одни и те же записи из нескольких потоков:
+    rewrite  — прежний save_to_json: прочитать requests.json, дописать, переписать
+    append   — JsonlStore.append из каждого потока, fsync на каждую запись
+    group    — GroupCommitWriter поверх JsonlStore, fsync на пачку
+Для rewrite дополнительно считаются потерянные записи.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from jsonl_store import JsonlStore
+from write_queue import GroupCommitWriter
+
+
+def legacy_save(path: str, data: dict):
+    """Тело прежнего save_to_json: чтение и перезапись всего файла"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            existing_data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        existing_data = []
+    data['saved_at'] = datetime.now().isoformat()
+    existing_data.append(data)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(existing_data, f, indent=4, ensure_ascii=False)
+
+
+def run_threads(writers: int, records: int, save) -> float:
+    def worker(worker_id: int):
+        for i in range(records):
+            save({"subject": "Физика", "original_link": f"https://example.com/{worker_id}/{i}"})
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--records", type=int, default=50, help="записей на один поток")
+    parser.add_argument("--max-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    total = args.writers * args.records
+    directory = tempfile.mkdtemp(prefix="group_commit_")
+
+    try:
+        path = os.path.join(directory, "requests.json")
+        elapsed = run_threads(args.writers, args.records, lambda data: legacy_save(path, data))
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = len(json.load(f))
+        except json.JSONDecodeError:
+            saved = 0  # файл испорчен гонкой
+        print(f"rewrite: {total / elapsed:10.0f} зап/с, сохранено {saved} из {total}")
+
+        store = JsonlStore(os.path.join(directory, "append.jsonl"))
+        elapsed = run_threads(args.writers, args.records, store.append)
+        print(f"append:  {total / elapsed:10.0f} зап/с, сохранено {store.count()} из {total}")
+
+        store = JsonlStore(os.path.join(directory, "group.jsonl"))
+        writer = GroupCommitWriter(store, max_delay=args.max_delay)
+        elapsed = run_threads(args.writers, args.records, lambda data: writer.submit(data).result())
+        writer.close()
+        print(f"group:   {total / elapsed:10.0f} зап/с, сохранено {store.count()} из {total}, {writer.stats()}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Отчет через инструменты LangChain: вся история в аргументах против query_records.
+
+Запуск:
+    python bench_report_query.py                        # 10k, 100k и 1M записей
+    python bench_report_query.py --rows 10000 100000 --backend jsonl
+
+Для каждого объема синтетическая история записывается во временное
+хранилище, затем замеряется отчет «предмет за 30 дней» двумя способами:
+прежний — read_from_json.invoke({}) и filter_data.invoke({"data": ...}),
+когда каждая запись проходит проверку аргументов инструмента; новый —
+query_records.invoke({"subject": ..., "days": ...}) со скалярными
+аргументами, фильтр выполняет хранилище.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from langchain_core.tools import tool
+
+from bench_filter import generate, legacy_filter, timed
+from jsonl_store import JsonlStore
+from sqlite_store import SqliteStore
+
+BACKENDS = {
+    "sqlite": lambda directory: SqliteStore(os.path.join(directory, "requests.sqlite")),
+    "jsonl": lambda directory: JsonlStore(os.path.join(directory, "requests.jsonl"), fsync=False),
+}
+
+
+def make_tools(store):
+    """read_from_json и filter_data как в project02_task01.py, query_records — выборка хранилищем со скалярными аргументами"""
+
+    @tool
+    def read_from_json() -> list:
+        """Читает данные из истории запросов"""
+        return list(store.iter_records())
+
+    @tool
+    def filter_data(data: list, subject: str, days: int = 30) -> list:
+        """Фильтрует данные по предмету и дате"""
+        return legacy_filter(data, subject, days)
+
+    @tool
+    def query_records(subject: str, since: str = "", until: str = "", days: int = 30) -> list:
+        """Записи истории по предмету за период [since, until) (даты ISO); без since — за последние days дней"""
+        if not since:
+            since = (datetime.now() - timedelta(days=days)).isoformat()
+        return store.query(subject, since, until)
+
+    return read_from_json, filter_data, query_records
+
+
+def bench(rows: int, backend: str, subject: str, days: int, repeat: int):
+    directory = tempfile.mkdtemp(prefix="report_")
+    try:
+        store = BACKENDS[backend](directory)
+        data = list(generate(rows))
+        for start in range(0, rows, 100_000):
+            store.append_many(data[start:start + 100_000])
+        del data
+        read_from_json, filter_data, query_records = make_tools(store)
+
+        def before():
+            all_data = read_from_json.invoke({})
+            return filter_data.invoke({"data": all_data, "subject": subject, "days": days})
+
+        before_time, before_rows = timed(before, repeat)
+        after_time, after_rows = timed(lambda: query_records.invoke({"subject": subject, "days": days}), repeat)
+
+        print(f"{rows:>10}  {backend:<6}  read_from_json + filter_data {before_time:9.4f} с ({len(before_rows)} строк)  "
+              f"query_records {after_time:9.4f} с ({len(after_rows)} строк, x{before_time / after_time:,.1f})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=list(BACKENDS), default="sqlite")
+    parser.add_argument("--subject", default="Физика")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        bench(rows, args.backend, args.subject, args.days, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
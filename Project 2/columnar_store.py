@@ -0,0 +1,226 @@
+"""Колоночное хранилище истории для аналитики на больших объемах.
+
+Каждая колонка — отдельный файл, который отображается в память через NumPy:
+    saved_at.i8      время сохранения, микросекунды эпохи (int64)
+    subject.u1       код предмета (uint8), таблица кодов в subjects.json
+    link_ends.i8     конец каждой ссылки в links.bin (int64)
+    links.bin        ссылки подряд в UTF-8
+
+Фильтр по предмету и периоду — это векторная маска над массивами, без
+цикла по словарям. Словари собираются только для найденных строк.
+
+Строка считается записанной, когда дописан ее saved_at (он пишется последним).
+Сбой посреди записи оставляет в других колонках «хвост» без saved_at, а в
+saved_at — неполное значение; при открытии и перед каждой записью колонки
+обрезаются до числа записанных строк, а links.bin — до конца последней ссылки.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import jsonl_store
+import sqlite_store
+
+DEFAULT_DIR = "requests_columns"
+UNDATED = np.iinfo(np.int64).min  # запись без saved_at; в datetime64 это NaT
+READ_CHUNK = 100_000
+PAGE_SIZE = 10
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_us(value: str) -> int:
+    """ISO 8601 → микросекунды от 1970-01-01 по тем же «настенным» часам, что и saved_at"""
+    try:
+        return (datetime.fromisoformat(value) - EPOCH) // timedelta(microseconds=1)
+    except (TypeError, ValueError):
+        return int(UNDATED)
+
+
+class ColumnarStore:
+    """История запросов в виде отображаемых в память колонок"""
+
+    def __init__(self, directory: str = DEFAULT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.subjects_path = self._path("subjects.json")
+        try:
+            with open(self.subjects_path, "r", encoding="utf-8") as file:
+                self.subjects: List[str] = json.load(file)
+        except FileNotFoundError:
+            self.subjects = []
+        self.codes = {subject: code for code, subject in enumerate(self.subjects)}
+        self._maps = {}
+        with self.lock:
+            self._repair()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _code(self, subject: str) -> int:
+        code = self.codes.get(subject)
+        if code is None:
+            if len(self.subjects) > np.iinfo(np.uint8).max:
+                raise ValueError("Слишком много предметов для кода uint8")
+            code = len(self.subjects)
+            self.subjects.append(subject)
+            self.codes[subject] = code
+            tmp_path = self.subjects_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.subjects, file, ensure_ascii=False)
+            os.replace(tmp_path, self.subjects_path)
+        return code
+
+    def _column(self, name: str, dtype) -> np.ndarray:
+        # Пересоздаем отображение, только если файл вырос
+        path = self._path(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._maps.get(name)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        if size == 0:
+            array = np.empty(0, dtype=dtype)
+        else:
+            array = np.memmap(path, dtype=dtype, mode="r")
+        self._maps[name] = (size, array)
+        return array
+
+    def _size(self, name: str) -> int:
+        path = self._path(name)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _repair(self):
+        """Обрезает колонки до последней полностью записанной строки (остатки прерванной записи)"""
+        rows = min(self._size("saved_at.i8") // 8, self._size("link_ends.i8") // 8, self._size("subject.u1"))
+        end = 0
+        if rows:
+            with open(self._path("link_ends.i8"), "rb") as file:
+                file.seek((rows - 1) * 8)
+                end = int(np.frombuffer(file.read(8), dtype=np.int64)[0])
+        for name, size in (("saved_at.i8", rows * 8), ("link_ends.i8", rows * 8),
+                           ("subject.u1", rows), ("links.bin", end)):
+            if self._size(name) > size:
+                self._maps.pop(name, None)
+                os.truncate(self._path(name), size)
+
+    def _columns(self):
+        saved_at = self._column("saved_at.i8", np.int64)
+        rows = len(saved_at)  # saved_at пишется последним и задает число полных строк
+        return (saved_at[:rows], self._column("subject.u1", np.uint8)[:rows],
+                self._column("link_ends.i8", np.int64)[:rows], self._column("links.bin", np.uint8))
+
+    def append_many(self, records: Iterable[dict]) -> List[int]:
+        """Дописывает записи в колонки, возвращает номера строк"""
+        records = list(records)
+        if not records:
+            return []
+        with self.lock:
+            self._repair()  # новая запись не должна начаться после хвоста прерванной
+            saved_at, _, link_ends, _ = self._columns()
+            first_row = len(saved_at)
+            end = int(link_ends[-1]) if len(link_ends) else 0
+
+            blob = [(record.get("original_link") or record.get("link") or "").encode("utf-8") for record in records]
+            ends = np.cumsum([len(link) for link in blob], dtype=np.int64) + end
+            codes = np.array([self._code(record.get("subject") or "") for record in records], dtype=np.uint8)
+            times = np.array([to_epoch_us(record.get("saved_at")) for record in records], dtype=np.int64)
+
+            # saved_at пишется последним: до него строка не считается записанной, и _repair отбросит остатки
+            for name, data in (("links.bin", b"".join(blob)), ("link_ends.i8", ends.tobytes()),
+                               ("subject.u1", codes.tobytes()), ("saved_at.i8", times.tobytes())):
+                with open(self._path(name), "ab") as file:
+                    file.write(data)
+                    file.flush()
+                    os.fsync(file.fileno())
+        return list(range(first_row, first_row + len(records)))
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self._columns()[0])
+
+    def _records(self, rows: np.ndarray, columns) -> List[dict]:
+        # Даты и границы ссылок считаются сразу для всех строк, в цикле остается только сборка словарей
+        saved_at, subjects, link_ends, links = columns
+        ends = link_ends[rows]
+        starts = np.where(rows > 0, link_ends[rows - 1], 0)
+        stamps = np.datetime_as_string(saved_at[rows].astype("datetime64[us]"))
+        blob = memoryview(links)
+        records = []
+        for start, end, code, stamp in zip(starts.tolist(), ends.tolist(), subjects[rows].tolist(), stamps.tolist()):
+            saved = "" if stamp == "NaT" else stamp
+            records.append({
+                "date": saved[:10],
+                "subject": self.subjects[code],
+                "original_link": bytes(blob[start:end]).decode("utf-8"),
+                "saved_at": saved,
+            })
+        return records
+
+    def iter_records(self) -> Iterator[dict]:
+        with self.lock:
+            columns = self._columns()
+        for start in range(0, len(columns[0]), READ_CHUNK):
+            rows = np.arange(start, min(start + READ_CHUNK, len(columns[0])))
+            yield from self._records(rows, columns)
+
+    def filter_rows(self, subject: str, since: str = "", until: str = "") -> np.ndarray:
+        """Номера строк по предмету за период [since, until) — векторная маска"""
+        with self.lock:
+            saved_at, subjects, _, _ = self._columns()
+        code = self.codes.get(subject)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        mask = subjects == code
+        in_period = np.ones_like(mask)
+        if since:
+            in_period &= saved_at >= to_epoch_us(since)
+        if until:
+            in_period &= saved_at < to_epoch_us(until)
+        mask &= in_period | (saved_at == UNDATED)  # записи без даты попадают всегда, как в filter_data
+        return np.flatnonzero(mask)
+
+    def query(self, subject: str, since: str = "", until: str = "") -> List[dict]:
+        """Записи по предмету за период в том же виде, что и у остальных хранилищ"""
+        rows = self.filter_rows(subject, since, until)
+        with self.lock:
+            columns = self._columns()
+        return self._records(rows, columns)
+
+    def query_page(self, subject: str, since: str = "", until: str = "", after: Optional[list] = None,
+                   limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[list]]:
+        """Страница записей query по курсору (номер строки): (записи, курсор следующей страницы или None)"""
+        rows = self.filter_rows(subject, since, until)
+        if after:
+            rows = rows[np.searchsorted(rows, after[0]):]
+        cursor = [int(rows[limit])] if len(rows) > limit else None
+        with self.lock:
+            columns = self._columns()
+        return self._records(rows[:limit], columns), cursor
+
+
+def open_store(directory: str = DEFAULT_DIR) -> ColumnarStore:
+    """Открывает колонки; пустое хранилище заполняется из requests.sqlite, requests.jsonl
+    или старого requests.json"""
+    store = ColumnarStore(directory)
+    if store.count() == 0:
+        if os.path.exists(sqlite_store.DEFAULT_PATH):
+            source = sqlite_store.open_store()
+        else:
+            source = jsonl_store.open_store()  # старый requests.json сначала переносится в журнал
+        batch = []
+        for record in source.iter_records():
+            batch.append(record)
+            if len(batch) >= READ_CHUNK:
+                store.append_many(batch)
+                batch = []
+        store.append_many(batch)
+    return store
@@ -0,0 +1,199 @@
+"""Локальный классификатор по содержимому страницы.
+
+Документ — слова ссылки, заголовок и текст сохраненной страницы (page_text),
+признаки — хеширующий векторизатор, модель — мультиномиальная логистическая
+регрессия (softmax), все операции векторные на NumPy. Обучается на размеченной
+истории и предопределенных ссылках; ответы с вероятностью не ниже порога
+принимаются без GigaChat.
+
+Запуск из консоли:
+    python content_classifier.py train                 # история + сохраненные страницы → content_model.npz
+    python content_classifier.py predict https://stepik.org/course/67/promo
+"""
+import argparse
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import page_text
+from hashing_vectorizer import DEFAULT_FEATURES, HashingVectorizer, row_ids
+from storage import BACKENDS, DEFAULT_BACKEND, open_store
+from subject_registry import PREDEFINED_LINKS, SUBJECTS, OTHER_SUBJECT, extract_url
+
+MODEL_PATH = "content_model.npz"
+CLASSES = SUBJECTS + [OTHER_SUBJECT]
+DEFAULT_EPOCHS = 200
+DEFAULT_LEARNING_RATE = 0.5
+DEFAULT_L2 = 1e-4
+DEFAULT_CONFIDENCE = 0.8
+HOLDOUT = 0.2
+
+
+class ContentClassifier:
+    """Softmax-регрессия над хешированными признаками документа"""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES):
+        self.vectorizer = HashingVectorizer(n_features)
+        self.weights = np.zeros((n_features, len(CLASSES)), dtype=np.float32)
+        self.bias = np.zeros(len(CLASSES), dtype=np.float32)
+        self.trained_on = 0
+        self.fired = 0
+        self.abstained = 0
+
+    def _scores(self, matrix) -> np.ndarray:
+        # X @ W для CSR: строки весов по ненулевым колонкам, умноженные на значения и сложенные по документам
+        indptr, indices, data = matrix
+        scores = np.zeros((len(indptr) - 1, len(CLASSES)), dtype=np.float32)
+        np.add.at(scores, row_ids(indptr), self.weights[indices] * data[:, None])
+        return scores + self.bias
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(self, documents: Sequence[str], labels: Sequence[str], epochs: int = DEFAULT_EPOCHS,
+            learning_rate: float = DEFAULT_LEARNING_RATE, l2: float = DEFAULT_L2) -> "ContentClassifier":
+        """Полный градиентный спуск с AdaGrad: редкие признаки получают больший шаг"""
+        matrix = self.vectorizer.transform(documents)
+        indptr, indices, data = matrix
+        rows = row_ids(indptr)
+        targets = np.zeros((len(labels), len(CLASSES)), dtype=np.float32)
+        targets[np.arange(len(labels)), [CLASSES.index(label) for label in labels]] = 1.0
+
+        # Обучаем только задействованные колонки, остальные веса остаются нулями
+        used, local = np.unique(indices, return_inverse=True)
+        weights = self.weights[used].copy()
+        weight_history = np.full_like(weights, 1e-8)
+        bias_history = np.full_like(self.bias, 1e-8)
+        for _ in range(epochs):
+            scores = np.zeros_like(targets)
+            np.add.at(scores, rows, weights[local] * data[:, None])
+            errors = (self._softmax(scores + self.bias) - targets) / len(labels)
+
+            weight_grad = np.zeros_like(weights)
+            np.add.at(weight_grad, local, errors[rows] * data[:, None])
+            weight_grad += l2 * weights
+            bias_grad = errors.sum(axis=0)
+
+            weight_history += weight_grad ** 2
+            bias_history += bias_grad ** 2
+            weights -= learning_rate * weight_grad / np.sqrt(weight_history)
+            self.bias -= learning_rate * bias_grad / np.sqrt(bias_history)
+        self.weights[used] = weights
+        self.trained_on = len(labels)
+        return self
+
+    def predict_proba(self, documents: Sequence[str]) -> np.ndarray:
+        return self._softmax(self._scores(self.vectorizer.transform(documents)))
+
+    def predict(self, document: str) -> Tuple[str, float]:
+        """(предмет, вероятность) для одного документа"""
+        probabilities = self.predict_proba([document])[0]
+        best = int(probabilities.argmax())
+        return CLASSES[best], float(probabilities[best])
+
+    def classify_url(self, url: str, pages_dir: str = page_text.PAGES_DIR) -> Tuple[str, float]:
+        """Предмет ссылки по ее словам и сохраненной странице, если она есть"""
+        return self.predict(page_text.document(url, page_text.load_page(url, pages_dir)))
+
+    def confident(self, text: str, confidence: float = DEFAULT_CONFIDENCE,
+                  pages_dir: str = page_text.PAGES_DIR) -> Optional[str]:
+        """Предмет ссылки из сообщения, если модель уверена в нем не меньше чем на confidence"""
+        url = extract_url(text)
+        if not url:
+            return None
+        subject, probability = self.classify_url(url, pages_dir)
+        if probability >= confidence:
+            self.fired += 1
+            return subject
+        self.abstained += 1
+        return None
+
+    def stats(self) -> dict:
+        total = self.fired + self.abstained
+        return {
+            "trained_on": self.trained_on,
+            "fired": self.fired,
+            "fire_rate": round(self.fired / total, 3) if total else 0.0,
+        }
+
+    def save(self, path: str = MODEL_PATH):
+        # Хранятся только ненулевые строки весов: большинство хешей в обучении не встречается
+        used = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, n_features=self.vectorizer.n_features, used=used,
+                            weights=self.weights[used], bias=self.bias, trained_on=self.trained_on,
+                            classes=np.array(CLASSES))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional["ContentClassifier"]:
+        """Модель с диска или None, если она еще не обучена или обучена на другом списке предметов"""
+        try:
+            saved = np.load(path)
+        except FileNotFoundError:
+            return None
+        if list(saved["classes"]) != CLASSES:
+            return None
+        model = cls(int(saved["n_features"]))
+        model.weights[saved["used"]] = saved["weights"]
+        model.bias = saved["bias"]
+        model.trained_on = int(saved["trained_on"])
+        return model
+
+
+def training_set(records, pages_dir: str = page_text.PAGES_DIR) -> Tuple[List[str], List[str]]:
+    """Документы и метки: предопределенные ссылки и история (по одной записи на ссылку)"""
+    labeled = {}
+    for subject, links in PREDEFINED_LINKS.items():
+        for link in links:
+            labeled[link] = subject
+    for record in records:
+        url = extract_url(record.get("link") or record.get("original_link") or "")
+        if url and record.get("subject") in CLASSES:
+            labeled.setdefault(url, record["subject"])  # метка из списка надежнее ответа LLM
+    documents = [page_text.document(url, page_text.load_page(url, pages_dir)) for url in labeled]
+    return documents, list(labeled.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Классификатор ссылок по содержимому страницы")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--pages", default=page_text.PAGES_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="обучить модель на истории и сохраненных страницах")
+    train.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                       help="хранилище истории (по умолчанию — как у бота)")
+    train.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    predict = subparsers.add_parser("predict", help="классифицировать ссылку")
+    predict.add_argument("url")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        documents, labels = training_set(open_store(args.backend).iter_records(), args.pages)
+        # Оценка на отложенной части, затем обучение на всех данных
+        order = np.random.default_rng(0).permutation(len(labels))
+        cut = int(len(order) * (1 - HOLDOUT))
+        if 0 < cut < len(order):
+            model = ContentClassifier().fit([documents[i] for i in order[:cut]], [labels[i] for i in order[:cut]], args.epochs)
+            predicted = model.predict_proba([documents[i] for i in order[cut:]]).argmax(axis=1)
+            accuracy = np.mean([CLASSES[p] == labels[i] for p, i in zip(predicted, order[cut:])])
+            print(f"Точность на отложенных {len(order) - cut} ссылках: {accuracy:.2f}")
+        model = ContentClassifier().fit(documents, labels, args.epochs)
+        model.save(args.model)
+        with_pages = sum(1 for document in documents if "\n" in document)
+        print(f"Обучено на {len(labels)} ссылках (со страницей: {with_pages}), модель: {args.model}")
+    else:
+        model = ContentClassifier.load(args.model)
+        if model is None:
+            print("Модель не обучена: python content_classifier.py train")
+            return
+        subject, probability = model.classify_url(args.url, args.pages)
+        print(f"{subject} ({probability:.2f})")
+
+
+if __name__ == "__main__":
+    main()
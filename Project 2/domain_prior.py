@@ -0,0 +1,105 @@
+"""Априорный предмет по домену и началу пути.
+
+Ссылки одного сайта обычно относятся к одному предмету (stepik.org,
+pythontutor.ru, asozykin.ru). Индекс хранит распределение предметов для
+хоста и префиксов пути из истории и дополняется при каждом сохранении.
+Если для самого подробного префикса с достаточным числом ссылок доля одного
+предмета не ниже confidence, предмет определяется без обращения к LLM.
+
+Часть таких ответов (sample_rate) все равно проверяется LLM, чтобы видеть,
+насколько часто априорный предмет расходится с моделью.
+"""
+import random
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from subject_registry import extract_url
+from url_normalizer import split_url
+
+DEFAULT_CONFIDENCE = 0.9
+DEFAULT_MIN_COUNT = 3  # ссылок с префиксом, после которых ему можно доверять
+DEFAULT_SAMPLE_RATE = 0.05
+PREFIX_DEPTH = 2  # хост, хост/раздел, хост/раздел/подраздел
+
+
+def prefixes(url: str, depth: int = PREFIX_DEPTH) -> List[str]:
+    """Префиксы ссылки от самого подробного к хосту"""
+    _, host, path, _ = split_url(url)
+    segments = [segment for segment in path.split("/") if segment]
+    # Последний сегмент — сама страница, в префикс попадают только разделы над ней
+    sections = segments[:-1][:depth]
+    return ["/".join([host] + sections[:size]) for size in range(len(sections), -1, -1)]
+
+
+class DomainPrior:
+    """Распределение предметов по префиксам ссылок со счетчиками срабатываний"""
+
+    def __init__(self, confidence: float = DEFAULT_CONFIDENCE, min_count: int = DEFAULT_MIN_COUNT,
+                 sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self.confidence = confidence
+        self.min_count = min_count
+        self.sample_rate = sample_rate
+        self.counts: Dict[str, Counter] = defaultdict(Counter)
+        self.lock = threading.Lock()
+        self.fired = 0
+        self.abstained = 0
+        self.checked = 0
+        self.disagreed = 0
+
+    def add(self, record: dict):
+        """Учитывает сохраненную запись; повторные отправки (count) учитываются с весом"""
+        url = extract_url(record.get("link") or record.get("original_link") or "")
+        subject = record.get("subject")
+        if not url or not subject:
+            return
+        weight = record.get("count", 1)
+        with self.lock:
+            for prefix in prefixes(url):
+                self.counts[prefix][subject] += weight
+
+    def build(self, records: Iterable[dict]) -> "DomainPrior":
+        for record in records:
+            self.add(record)
+        return self
+
+    def predict(self, text: str) -> Optional[str]:
+        """Предмет по самому подробному префиксу с достаточной статистикой или None"""
+        url = extract_url(text)
+        if not url:
+            return None
+        with self.lock:
+            for prefix in prefixes(url):
+                counts = self.counts.get(prefix)
+                total = sum(counts.values()) if counts else 0
+                if total < self.min_count:
+                    continue
+                subject, top = counts.most_common(1)[0]
+                if top / total >= self.confidence:
+                    self.fired += 1
+                    return subject
+                break  # подробный префикс неоднозначен — хосту целиком тоже не доверяем
+            self.abstained += 1
+        return None
+
+    def should_check(self) -> bool:
+        """Нужно ли проверить этот ответ через LLM"""
+        return random.random() < self.sample_rate
+
+    def record_check(self, prior_subject: str, llm_subject: str):
+        with self.lock:
+            self.checked += 1
+            if prior_subject != llm_subject:
+                self.disagreed += 1
+
+    def stats(self) -> dict:
+        """Доля срабатываний и расхождений с LLM на проверенной выборке"""
+        total = self.fired + self.abstained
+        return {
+            "prefixes": len(self.counts),
+            "fired": self.fired,
+            "fire_rate": round(self.fired / total, 3) if total else 0.0,
+            "checked": self.checked,
+            "disagreed": self.disagreed,
+            "disagree_rate": round(self.disagreed / self.checked, 3) if self.checked else 0.0,
+        }
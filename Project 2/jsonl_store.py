@@ -0,0 +1,297 @@
+"""Хранилище записей в формате JSON Lines.
+
+Каждая запись — одна строка в конце файла: сохранение стоит O(1) и не
+переписывает историю, а оборванная при сбое запись теряется только она одна.
+
+С дедупликацией (dedup) журнал работает как лог версий: повторная ссылка
+дописывается новой версией записи со счетчиком count, индекс ссылок
+(link_index) указывает на последнюю версию, при чтении старые версии
+пропускаются, а compact удаляет их из файла.
+
+Запуск из консоли:
+    python jsonl_store.py migrate requests.json requests.jsonl
+    python jsonl_store.py compact requests.jsonl
+    python jsonl_store.py compact requests.jsonl --dedup link
+"""
+import argparse
+import json
+import os
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from link_index import DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF, LinkIndex, dedup_key, first_submission, merge_submission
+
+DEFAULT_PATH = "requests.jsonl"
+LEGACY_PATH = "requests.json"
+PAGE_SIZE = 10
+
+
+class JsonlStore:
+    """Журнал записей: дозапись строк и ленивое чтение"""
+
+    def __init__(self, path: str = DEFAULT_PATH, fsync: bool = True, dedup: str = DEDUP_OFF):
+        self.path = path
+        self.fsync = fsync
+        self.dedup = dedup
+        self.lock = threading.RLock()  # compact читает записи, уже удерживая блокировку
+        self._count: Optional[int] = None
+        self._tail_checked = False
+        self.index: Optional[LinkIndex] = None
+
+    def _scan(self, start: int = 0) -> Iterator[Tuple[int, dict]]:
+        # Все версии записей со смещениями строк, начиная с байта start (начала строки)
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            file.seek(start)
+            offset = start
+            for line in file:
+                start, offset = offset, offset + len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+
+    def _load_index(self) -> LinkIndex:
+        # Индекс строится одним проходом при первом обращении, дальше ведется при записи
+        if self.index is None:
+            index = LinkIndex()
+            count = 0
+            for offset, record in self._scan():
+                key = dedup_key(record, self.dedup)
+                if key is None or index.get(key) is None:
+                    count += 1
+                if key is not None:
+                    index.put(key, offset)
+            self.index = index
+            self._count = count
+        return self.index
+
+    def _read_at(self, offset: int) -> dict:
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+
+    def _versions(self, records: List[dict]) -> Tuple[List[dict], List[Optional[dict]], List[Optional[str]], int]:
+        # Для повторных ссылок — новая версия записи поверх последней сохраненной
+        index = self._load_index()
+        pending = {}
+        versions, previous_versions, keys, added = [], [], [], 0
+        for record in records:
+            key = dedup_key(record, self.dedup)
+            previous = None
+            if key is not None:
+                previous = pending.get(key)
+                if previous is None:
+                    offset = index.get(key)
+                    if offset is not None:
+                        previous = self._read_at(offset)
+            if previous is None:
+                record = first_submission(record) if key is not None else record
+                added += 1
+            else:
+                record = merge_submission(previous, record)
+            if key is not None:
+                pending[key] = record
+            versions.append(record)
+            previous_versions.append(previous)
+            keys.append(key)
+        return versions, previous_versions, keys, added
+
+    def _check_tail(self, file):
+        # Если прошлая запись оборвалась на середине, начинаем с новой строки
+        if self._tail_checked:
+            return
+        self._tail_checked = True
+        if file.tell() == 0:
+            return
+        with open(self.path, "rb") as reader:
+            reader.seek(-1, os.SEEK_END)
+            if reader.read(1) != b"\n":
+                file.write(b"\n")
+
+    def append_many(self, records: Iterable[dict],
+                    on_version: Optional[Callable[[Optional[dict], dict], None]] = None) -> List[int]:
+        """Дописывает записи одной операцией записи, возвращает их смещения.
+
+        При дедупликации повторная ссылка дописывается новой версией записи.
+        on_version(прежняя версия или None, новая версия) вызывается для каждой
+        записи после записи в файл — по нему ведут счетчики.
+        """
+        records = list(records)
+        offsets = []
+        if not records:
+            return offsets
+        with self.lock:
+            keys: List[Optional[str]] = [None] * len(records)
+            previous_versions: List[Optional[dict]] = [None] * len(records)
+            added = len(records)
+            if self.dedup:
+                records, previous_versions, keys, added = self._versions(records)
+            lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+            with open(self.path, "ab") as file:
+                self._check_tail(file)
+                offset = file.tell()
+                for line in lines:
+                    offsets.append(offset)
+                    offset += len(line)
+                file.write(b"".join(lines))
+                file.flush()
+                if self.fsync:
+                    os.fsync(file.fileno())
+            if self._count is not None:
+                self._count += added
+            if self.index is not None:
+                for key, offset in zip(keys, offsets):
+                    if key is not None:
+                        self.index.put(key, offset)
+            if on_version is not None:
+                for previous, record in zip(previous_versions, records):
+                    on_version(previous, record)
+        return offsets
+
+    def append(self, record: dict) -> int:
+        """Дописывает одну запись, возвращает ее смещение в файле"""
+        return self.append_many([record])[0]
+
+    def iter_records(self) -> Iterator[dict]:
+        """Лениво читает записи, пропуская поврежденные строки и устаревшие версии"""
+        if not self.dedup:
+            for _, record in self._scan():
+                yield record
+            return
+        with self.lock:
+            positions = dict(self._load_index().positions)
+        for offset, record in self._scan():
+            key = dedup_key(record, self.dedup)
+            if key is None or positions.get(key) == offset:
+                yield record
+
+    def count(self) -> int:
+        """Количество записей; файл читается один раз, дальше счетчик ведется при записи"""
+        with self.lock:
+            if self._count is None:
+                if self.dedup:
+                    self._load_index()
+                else:
+                    self._count = sum(1 for _ in self._scan())
+            return self._count
+
+    def query(self, subject: str, since: str = "", until: str = "") -> List[dict]:
+        """Записи по предмету за период [since, until) одним проходом по журналу.
+
+        Даты сравниваются как строки ISO 8601, без разбора каждой записи.
+        Записи без saved_at попадают в выборку, как и в filter_data.
+        """
+        result = []
+        for record in self.iter_records():
+            if record.get("subject") != subject:
+                continue
+            saved_at = record.get("saved_at") or ""
+            if not saved_at or (saved_at >= since and (not until or saved_at < until)):
+                result.append(record)
+        return result
+
+    def query_page(self, subject: str, since: str = "", until: str = "", after: Optional[list] = None,
+                   limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[list]]:
+        """Страница записей query по курсору: (записи, курсор следующей страницы или None).
+
+        Курсор — смещение строки, следующей за последней записью страницы: чтение
+        продолжается с него, а не с начала журнала. Порядок — порядок записи.
+        """
+        start = after[0] if after else 0
+        positions = None
+        if self.dedup:
+            with self.lock:
+                positions = dict(self._load_index().positions)
+        page, cursor = [], None
+        for offset, record in self._scan(start):
+            if positions is not None:
+                key = dedup_key(record, self.dedup)
+                if key is not None and positions.get(key) != offset:
+                    continue  # устаревшая версия
+            if record.get("subject") != subject:
+                continue
+            saved_at = record.get("saved_at") or ""
+            if saved_at and (saved_at < since or (until and saved_at >= until)):
+                continue
+            if len(page) == limit:
+                cursor = [offset]
+                break
+            page.append(record)
+        return page, cursor
+
+    def compact(self) -> int:
+        """Переписывает файл без поврежденных строк и устаревших версий, возвращает число записей"""
+        tmp_path = self.path + ".tmp"
+        with self.lock:
+            count = 0
+            with open(tmp_path, "wb") as file:
+                for record in self.iter_records():
+                    file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    count += 1
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+            self._count = count
+            self._tail_checked = False
+            self.index = None  # смещения изменились
+        return count
+
+
+def migrate_json_array(json_path: str, store: JsonlStore) -> int:
+    """Переносит записи из старого JSON-массива в журнал, старый файл переименовывается в .bak"""
+    try:
+        with open(json_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return 0
+    except json.JSONDecodeError:
+        data = []
+
+    if not isinstance(data, list):  # в файле могла лежать одна запись
+        data = [data]
+
+    store.append_many(data)
+    os.replace(json_path, json_path + ".bak")
+    return len(data)
+
+
+def open_store(path: str = DEFAULT_PATH, legacy_path: str = LEGACY_PATH, dedup: str = DEDUP_OFF) -> JsonlStore:
+    """Открывает журнал; при первом запуске переносит в него старый requests.json"""
+    store = JsonlStore(path, dedup=dedup)
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        migrate_json_array(legacy_path, store)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание журнала requests.jsonl")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="перенести записи из JSON-массива")
+    migrate.add_argument("json_path", nargs="?", default=LEGACY_PATH)
+    migrate.add_argument("jsonl_path", nargs="?", default=DEFAULT_PATH)
+
+    compact = subparsers.add_parser("compact", help="переписать журнал без поврежденных строк и старых версий")
+    compact.add_argument("jsonl_path", nargs="?", default=DEFAULT_PATH)
+
+    for command in (migrate, compact):
+        command.add_argument("--dedup", choices=[DEDUP_LINK, DEDUP_LINK_DAY], default=DEDUP_OFF,
+                             help="схлопнуть повторы ссылки (за все время или за день)")
+
+    args = parser.parse_args()
+    store = JsonlStore(args.jsonl_path, dedup=args.dedup)
+    if args.command == "migrate":
+        print(f"Перенесено записей: {migrate_json_array(args.json_path, store)}")
+    else:
+        print(f"Записей после сжатия: {store.compact()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Классификация по ближайшим размеченным ссылкам из истории.
+
+Каждая ссылка истории — разреженный вектор хеширующего векторизатора по
+словам ссылки, заголовку и тексту сохраненной страницы (page_text.document).
+Новая ссылка получает голосование k ближайших соседей по косинусной близости
+(векторы нормированы, поэтому это скалярное произведение). Поиск идет по
+инвертированному индексу (колонка → документы): просматриваются только
+документы, у которых есть общие с запросом признаки.
+
+Пока история небольшая, поиск точный. После approximate_after документов
+индекс переходит в приближенный режим: в запросе остаются только самые
+весомые признаки, а слишком частые (есть у большой доли документов, вроде
+«https» или «ru») пропускаются.
+
+Запуск из консоли:
+    python knn_classifier.py evaluate                # время построения, задержка, согласие с метками истории
+    python knn_classifier.py predict https://stepik.org/course/67/promo
+"""
+import argparse
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import page_text
+from hashing_vectorizer import DEFAULT_FEATURES, HashingVectorizer
+from subject_registry import SUBJECTS, OTHER_SUBJECT, extract_url
+from url_normalizer import url_key
+
+CLASSES = SUBJECTS + [OTHER_SUBJECT]
+DEFAULT_K = 7
+DEFAULT_VOTE = 0.8  # доля веса соседей за один предмет, при которой ответ принимается без LLM
+DEFAULT_MIN_SIMILARITY = 0.3  # соседи с меньшей близостью не голосуют
+MIN_NEIGHBOURS = 2
+APPROXIMATE_AFTER = 50_000
+APPROXIMATE_TERMS = 32  # признаков запроса в приближенном режиме
+APPROXIMATE_MAX_DF = 0.1  # признаки, встречающиеся у большей доли документов, пропускаются
+MERGE_EVERY = 256  # новых документов, после которых они вливаются в инвертированный индекс
+
+
+class KnnIndex:
+    """Инвертированный индекс размеченных документов и голосование ближайших соседей"""
+
+    def __init__(self, k: int = DEFAULT_K, vote: float = DEFAULT_VOTE,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY, n_features: int = DEFAULT_FEATURES,
+                 pages_dir: str = page_text.PAGES_DIR, approximate_after: int = APPROXIMATE_AFTER):
+        self.k = k
+        self.vote = vote
+        self.min_similarity = min_similarity
+        self.pages_dir = pages_dir
+        self.approximate_after = approximate_after
+        self.vectorizer = HashingVectorizer(n_features)
+        self.lock = threading.Lock()
+
+        self.rows: Dict[str, int] = {}  # ключ ссылки → номер документа
+        self.columns: List[np.ndarray] = []
+        self.values: List[np.ndarray] = []
+        self.labels: List[int] = []
+        # Инвертированный индекс (CSC) по первым indexed документам, остальные — хвост
+        self.indexed = 0
+        self.column_ptr = np.zeros(n_features + 1, dtype=np.int64)
+        self.posting_rows = np.empty(0, dtype=np.int64)
+        self.posting_values = np.empty(0, dtype=np.float32)
+
+        self.build_seconds = 0.0
+        self.latencies = deque(maxlen=1000)
+        self.fired = 0
+        self.abstained = 0
+
+    def _document(self, url: str) -> str:
+        return page_text.document(url, page_text.load_page(url, self.pages_dir))
+
+    def add(self, record: dict, merge: bool = True):
+        """Добавляет размеченную ссылку; повторная ссылка только меняет метку"""
+        url = extract_url(record.get("link") or record.get("original_link") or "")
+        subject = record.get("subject")
+        if not url or subject not in CLASSES:
+            return
+        key = url_key(url)
+        columns, values = self.vectorizer.transform([self._document(url)])[1:]
+        with self.lock:
+            row = self.rows.get(key)
+            if row is not None:
+                self.labels[row] = CLASSES.index(subject)
+                return
+            self.rows[key] = len(self.labels)
+            self.columns.append(columns)
+            self.values.append(values)
+            self.labels.append(CLASSES.index(subject))
+            if merge and len(self.labels) - self.indexed >= MERGE_EVERY:
+                self._merge()
+
+    def build(self, records: Iterable[dict]) -> "KnnIndex":
+        started = time.perf_counter()
+        for record in records:
+            self.add(record, merge=False)  # индекс собирается один раз в конце
+        with self.lock:
+            self._merge()
+        self.build_seconds = time.perf_counter() - started
+        return self
+
+    def _merge(self):
+        # Пересборка CSC по всем документам: сортировка ненулевых элементов по колонке
+        if self.indexed == len(self.labels):
+            return
+        lengths = np.array([len(columns) for columns in self.columns], dtype=np.int64)
+        columns = np.concatenate(self.columns) if self.columns else np.empty(0, dtype=np.int64)
+        values = np.concatenate(self.values) if self.values else np.empty(0, dtype=np.float32)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        order = np.argsort(columns, kind="stable")
+        self.posting_rows = rows[order]
+        self.posting_values = values[order]
+        self.column_ptr = np.zeros(self.vectorizer.n_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columns, minlength=self.vectorizer.n_features), out=self.column_ptr[1:])
+        self.indexed = len(self.labels)
+
+    def _similarities(self, columns: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Косинусная близость запроса ко всем документам"""
+        scores = np.zeros(len(self.labels), dtype=np.float32)
+        if self.indexed:
+            starts = self.column_ptr[columns]
+            lengths = self.column_ptr[columns + 1] - starts
+            if self.indexed > self.approximate_after and len(values):
+                keep = lengths <= APPROXIMATE_MAX_DF * self.indexed
+                keep &= np.abs(values) >= np.sort(np.abs(values))[-min(APPROXIMATE_TERMS, len(values))]
+                starts, lengths, values = starts[keep], lengths[keep], values[keep]
+            # Позиции всех списков документов подряд без цикла по признакам
+            total = int(lengths.sum())
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            positions = np.arange(total) + offsets
+            contributions = self.posting_values[positions] * np.repeat(values, lengths)
+            scores[:self.indexed] = np.bincount(self.posting_rows[positions], weights=contributions,
+                                                minlength=self.indexed)
+        # Хвост из недавно добавленных документов — прямым сопоставлением колонок
+        for row in range(self.indexed, len(self.labels)):
+            _, query_at, row_at = np.intersect1d(columns, self.columns[row], assume_unique=True,
+                                                 return_indices=True)
+            scores[row] = float(values[query_at] @ self.values[row][row_at])
+        return scores
+
+    def _vote(self, columns: np.ndarray, values: np.ndarray, exclude: int = -1) -> Optional[Tuple[str, float]]:
+        """(предмет, доля голосов) или None, если соседей мало или голоса разделились"""
+        if not self.labels or not len(columns):
+            return None
+        scores = self._similarities(columns, values)
+        if 0 <= exclude < len(scores):
+            scores[exclude] = 0.0
+        k = min(self.k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] >= self.min_similarity]
+        if len(top) < MIN_NEIGHBOURS:
+            return None
+        weights = np.bincount(np.asarray(self.labels)[top], weights=scores[top], minlength=len(CLASSES))
+        best = int(weights.argmax())
+        share = float(weights[best] / weights.sum())
+        return CLASSES[best], share
+
+    def neighbours(self, text: str) -> List[Tuple[str, float]]:
+        """Ближайшие размеченные ссылки: (ключ, близость), для отладки"""
+        url = extract_url(text)
+        if not url:
+            return []
+        columns, values = self.vectorizer.transform([self._document(url)])[1:]
+        with self.lock:
+            scores = self._similarities(columns, values)
+            keys = {row: key for key, row in self.rows.items()}
+        top = np.argsort(-scores)[:self.k]
+        return [(keys[int(row)], float(scores[row])) for row in top if scores[row] > 0]
+
+    def predict(self, text: str) -> Optional[str]:
+        """Предмет ссылки из сообщения, если соседи согласны не меньше чем на vote"""
+        url = extract_url(text)
+        if not url:
+            return None
+        started = time.perf_counter()
+        columns, values = self.vectorizer.transform([self._document(url)])[1:]
+        with self.lock:
+            result = self._vote(columns, values)
+            self.latencies.append(time.perf_counter() - started)
+            if result and result[1] >= self.vote:
+                self.fired += 1
+                return result[0]
+            self.abstained += 1
+        return None
+
+    def evaluate(self, sample: int = 1000, seed: int = 0) -> dict:
+        """Согласие голосования с метками истории: каждая ссылка ищется без самой себя"""
+        with self.lock:
+            self._merge()
+            count = len(self.labels)
+            rows = np.random.default_rng(seed).permutation(count)[:sample]
+            voted = agreed = 0
+            started = time.perf_counter()
+            for row in rows:
+                result = self._vote(self.columns[row], self.values[row], exclude=int(row))
+                if result and result[1] >= self.vote:
+                    voted += 1
+                    agreed += result[0] == CLASSES[self.labels[row]]
+            elapsed = time.perf_counter() - started
+        return {
+            "documents": count,
+            "sampled": len(rows),
+            "coverage": round(voted / len(rows), 3) if len(rows) else 0.0,
+            "agreement": round(agreed / voted, 3) if voted else 0.0,
+            "query_ms": round(elapsed / len(rows) * 1000, 3) if len(rows) else 0.0,
+        }
+
+    def stats(self) -> dict:
+        total = self.fired + self.abstained
+        latencies = sorted(self.latencies)
+        return {
+            "documents": len(self.labels),
+            "approximate": self.indexed > self.approximate_after,
+            "build_seconds": round(self.build_seconds, 3),
+            "fired": self.fired,
+            "fire_rate": round(self.fired / total, 3) if total else 0.0,
+            "query_ms_p50": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else 0.0,
+            "query_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 3) if latencies else 0.0,
+        }
+
+
+def history_backends() -> Tuple[List[str], str]:
+    """(хранилища истории, хранилище по умолчанию): в Project 2 — как у бота, в Project 1 — только журнал"""
+    try:
+        from storage import BACKENDS, DEFAULT_BACKEND
+    except ImportError:
+        return ["jsonl"], "jsonl"
+    return list(BACKENDS), DEFAULT_BACKEND
+
+
+def open_history(backend: str):
+    """Хранилище истории: в Project 2 — выбранный бэкенд, в Project 1 — журнал requests.jsonl"""
+    try:
+        from storage import open_store
+    except ImportError:
+        from jsonl_store import JsonlStore
+        return JsonlStore()  # только чтение, без переноса requests.json
+    return open_store(backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Классификация по ближайшим ссылкам из истории")
+    backends, default_backend = history_backends()
+    parser.add_argument("--backend", choices=backends, default=default_backend,
+                        help="хранилище истории (по умолчанию — как у бота)")
+    parser.add_argument("--pages", default=page_text.PAGES_DIR)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--vote", type=float, default=DEFAULT_VOTE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    evaluate = subparsers.add_parser("evaluate", help="замер построения и поиска, согласие с метками истории")
+    evaluate.add_argument("--sample", type=int, default=1000)
+    predict = subparsers.add_parser("predict", help="классифицировать ссылку и показать соседей")
+    predict.add_argument("url")
+    args = parser.parse_args()
+
+    index = KnnIndex(args.k, args.vote, pages_dir=args.pages).build(open_history(args.backend).iter_records())
+    print(f"Индекс: {len(index.labels)} ссылок за {index.build_seconds:.2f} с")
+    if args.command == "evaluate":
+        for name, value in index.evaluate(args.sample).items():
+            print(f"{name}: {value}")
+    else:
+        for key, similarity in index.neighbours(args.url):
+            print(f"{similarity:.3f}  {CLASSES[index.labels[index.rows[key]]]}  {key}")
+        print(f"Предмет: {index.predict(args.url) or 'соседи не согласны, нужен LLM'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Заголовок и текст учебной страницы из сохраненного HTML.
+
+Страницы лежат в каталоге PAGES_DIR под именем-хешем канонической ссылки
+(сжатые gzip), поэтому классификатор по содержимому работает без сети.
+Страницы скачивает page_fetcher.py; сохранить страницу вручную (например,
+скачанную браузером):
+    python page_text.py save https://stepik.org/course/67/promo page.html
+    python page_text.py show https://stepik.org/course/67/promo
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import re
+from html.parser import HTMLParser
+from typing import Optional, Tuple
+from urllib.parse import unquote
+
+from url_normalizer import split_url, url_key
+
+PAGES_DIR = "pages"
+MAX_TEXT = 20_000  # символов текста страницы, дальше обычно меню и подвал
+SUMMARY_TEXT = 600  # символов текста в кратком описании страницы для промпта
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head"}
+CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class _TextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.description = ""
+        self.chunks = []
+        self.size = 0
+        self.skip = 0
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self.in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            if (attrs.get("name") or attrs.get("property") or "").lower() in ("description", "og:description"):
+                self.description = self.description or (attrs.get("content") or "")
+        elif tag == "body":
+            self.skip = 0  # незакрытый head не должен скрыть всю страницу
+        elif tag in SKIP_TAGS:
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        elif tag in SKIP_TAGS and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif not self.skip and self.size < MAX_TEXT:
+            data = data.strip()
+            if data:
+                self.chunks.append(data)
+                self.size += len(data)
+
+
+def decode_html(raw: bytes) -> str:
+    """Кодировка из meta charset, иначе UTF-8 с откатом на windows-1251"""
+    match = CHARSET_PATTERN.search(raw[:4096])
+    if match:
+        try:
+            return raw.decode(match.group(1).decode("ascii"), errors="replace")
+        except LookupError:
+            pass
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as error:
+        if error.start >= len(raw) - 3:
+            return raw[:error.start].decode("utf-8")  # страница обрезана посреди символа
+        return raw.decode("cp1251", errors="replace")
+
+
+def extract_page(html: str) -> Tuple[str, str]:
+    """(заголовок, текст) страницы; описание из meta добавляется в начало текста"""
+    parser = _TextParser()
+    parser.feed(html)
+    parser.close()
+    title = " ".join(" ".join(parser.title).split())
+    text = " ".join(([parser.description] if parser.description else []) + parser.chunks)[:MAX_TEXT]
+    return title, text
+
+
+def url_words(url: str) -> str:
+    """Слова из хоста и пути ссылки: «stepik course python»; домен верхнего уровня общий у разных сайтов и не нужен"""
+    _, host, path, _ = split_url(url)
+    host = host.split(":")[0].rsplit(".", 1)[0]
+    return re.sub(r"[^\w]+", " ", host + " " + unquote(path)).strip()
+
+
+def page_path(url: str, pages_dir: str = PAGES_DIR) -> str:
+    name = hashlib.sha1(url_key(url).encode("utf-8")).hexdigest()[:20]
+    return os.path.join(pages_dir, name + ".html.gz")
+
+
+def load_raw(url: str, pages_dir: str = PAGES_DIR) -> Optional[bytes]:
+    """Байты сохраненной страницы или None"""
+    try:
+        with gzip.open(page_path(url, pages_dir), "rb") as file:
+            return file.read()
+    except (OSError, EOFError):
+        return None  # файла нет или он поврежден
+
+
+def load_page(url: str, pages_dir: str = PAGES_DIR) -> Optional[str]:
+    """HTML сохраненной страницы или None"""
+    raw = load_raw(url, pages_dir)
+    return decode_html(raw) if raw is not None else None
+
+
+def save_page(url: str, raw: bytes, pages_dir: str = PAGES_DIR) -> str:
+    os.makedirs(pages_dir, exist_ok=True)
+    path = page_path(url, pages_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(gzip.compress(raw, compresslevel=6))
+    os.replace(tmp_path, path)
+    return path
+
+
+def document(url: str, html: Optional[str] = None) -> str:
+    """Текст для классификатора: слова ссылки, заголовок (дважды — он информативнее) и текст страницы"""
+    parts = [url_words(url)]
+    if html:
+        title, text = extract_page(html)
+        parts += [title, title, text]
+    return "\n".join(part for part in parts if part)
+
+
+def summary(html: str, limit: int = SUMMARY_TEXT) -> str:
+    """Краткое описание страницы для промпта: заголовок и начало текста"""
+    title, text = extract_page(html)
+    if len(text) > limit:
+        text = text[:limit].rsplit(" ", 1)[0] + "…"
+    lines = []
+    if title:
+        lines.append(f"Заголовок: {title}")
+    if text:
+        lines.append(f"Текст: {text}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сохраненные страницы для классификации по содержимому")
+    parser.add_argument("--pages", default=PAGES_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    save = subparsers.add_parser("save", help="сохранить HTML-файл как страницу ссылки")
+    save.add_argument("url")
+    save.add_argument("html_path")
+    show = subparsers.add_parser("show", help="показать заголовок и начало текста сохраненной страницы")
+    show.add_argument("url")
+    args = parser.parse_args()
+
+    if args.command == "save":
+        with open(args.html_path, "rb") as file:
+            print(save_page(args.url, file.read(), args.pages))
+    else:
+        html = load_page(args.url, args.pages)
+        if html is None:
+            print("Страница не сохранена")
+            return
+        title, text = extract_page(html)
+        print(f"{title}\n\n{text[:1000]}")
+
+
+if __name__ == "__main__":
+    main()
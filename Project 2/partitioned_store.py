@@ -0,0 +1,475 @@
+"""История, разбитая по чатам и месяцам.
+
+    requests_partitions/<чат>/2026-10.jsonl       текущие сегменты (JsonlStore)
+    requests_partitions/<чат>/2026-08.jsonl.gz    старые месяцы, сжатые и только для чтения
+    requests_partitions/<чат>/manifest.json       по сегменту: записей, min/max saved_at, предметы
+                                                  и счетчики по дням и доменам (как в rollups.py)
+
+Запрос сначала смотрит манифест и открывает только сегменты, чей диапазон
+saved_at пересекается с периодом и в которых встречается предмет. Сводка
+(days, summary, top_domains) записи не читает вовсе: счетчики сегментов
+ведутся в манифесте при каждой записи.
+
+Записи без chat_id (консольная версия, перенос старой истории из
+requests.sqlite, requests.jsonl или requests.json) лежат в каталоге common.
+Это общая история, которую бот вел до разбиения по чатам, поэтому отчет
+чата (view) читает каталог своего чата и common, но не чужие каталоги.
+
+Дедупликация (dedup) работает внутри сегмента: повтор ссылки в новом месяце
+— новая запись нового месяца. Запись в уже сжатый месяц (перенос старой
+истории) сначала распаковывает его обратно.
+
+Запуск из консоли:
+    python partitioned_store.py archive            # сжать месяцы старше текущего и прошлого
+    python partitioned_store.py manifest           # пересобрать манифесты по сегментам
+    python partitioned_store.py show               # чаты и сегменты из манифестов
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import jsonl_store
+import sqlite_store
+from jsonl_store import JsonlStore
+from link_index import DEDUP_OFF
+from rollups import DEFAULT_TOP_DOMAINS, Rollups, changes, day_bounds
+
+DEFAULT_DIR = "requests_partitions"
+COMMON_CHAT = "common"  # записи без chat_id
+UNDATED = "undated"  # сегмент записей без saved_at, входит в любой период
+KEEP_ACTIVE_MONTHS = 2  # текущий и прошлый месяц не сжимаются
+PAGE_SIZE = 10
+MANIFEST = "manifest.json"
+
+
+def chat_key(chat_id) -> str:
+    """Имя каталога чата"""
+    if chat_id in (None, ""):
+        return COMMON_CHAT
+    return re.sub(r"[^0-9A-Za-z_-]", "_", str(chat_id))
+
+
+def month_of(record: dict) -> str:
+    saved_at = record.get("saved_at") or ""
+    return saved_at[:7] if re.match(r"\d{4}-\d{2}", saved_at) else UNDATED
+
+
+def _order(month: str) -> Tuple[bool, str]:
+    # Сегмент без дат первым, как записи без saved_at в остальных хранилищах
+    return month != UNDATED, month
+
+
+def _new_entry(archived: bool = False) -> dict:
+    # daily: предмет -> день -> [ссылок, отправок]; domains: домен -> предмет -> [ссылок, отправок]
+    return {"records": 0, "min_saved_at": "", "max_saved_at": "", "subjects": [], "archived": archived,
+            "daily": {}, "domains": {}}
+
+
+def _count(entry: dict, previous: Optional[dict], record: dict):
+    """Переносит счетчики сегмента с прежней версии записи на новую"""
+    daily, domains = changes(previous, record)
+    for (subject, day), links, sent in daily:
+        cell = entry["daily"].setdefault(subject, {}).setdefault(day, [0, 0])
+        cell[0] += links
+        cell[1] += sent
+    for (domain, subject), links, sent in domains:
+        cell = entry["domains"].setdefault(domain, {}).setdefault(subject, [0, 0])
+        cell[0] += links
+        cell[1] += sent
+
+
+def _matches(record: dict, subject: Optional[str], since: str, until: str) -> bool:
+    if subject is not None and record.get("subject") != subject:
+        return False
+    saved_at = record.get("saved_at") or ""
+    return not saved_at or (saved_at >= since and (not until or saved_at < until))
+
+
+class Summaries(ABC):
+    """Сводка из счетчиков сегментов в манифестах: O(сегментов периода), а не O(записей).
+
+    Подклассы задают _rollups(subject, since, until) — счетчики нужных сегментов.
+    """
+
+    @abstractmethod
+    def _rollups(self, subject: Optional[str] = None, since: str = "", until: str = "") -> Rollups:
+        """Счетчики сегментов, которые могут содержать записи предмета за период"""
+
+    def days(self, subject: str, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        return self._rollups(subject, since, until).days(subject, since, until)
+
+    def summary(self, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        return self._rollups(None, since, until).summary(since, until)
+
+    def top_domains(self, limit: int = DEFAULT_TOP_DOMAINS, subject: str = "") -> List[Tuple[str, int, int]]:
+        return self._rollups(subject or None).top_domains(limit, subject)
+
+
+class ChatHistory(Summaries):
+    """Сегменты одного чата по месяцам и их манифест"""
+
+    def __init__(self, directory: str, dedup: str = DEDUP_OFF):
+        self.directory = directory
+        self.dedup = dedup
+        self.lock = threading.RLock()
+        self.active: Dict[str, JsonlStore] = {}
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding="utf-8") as file:
+                self.manifest: Dict[str, dict] = json.load(file)
+        except (OSError, ValueError):
+            self.manifest = {}
+            self.rebuild_manifest()
+        if any("daily" not in entry for entry in self.manifest.values()):
+            self.rebuild_manifest()  # манифест без счетчиков: собираем их один раз
+
+    def _path(self, month: str, archived: bool) -> str:
+        return os.path.join(self.directory, f"{month}.jsonl" + (".gz" if archived else ""))
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    def _segment(self, month: str) -> JsonlStore:
+        """Текущий сегмент месяца; сжатый месяц распаковывается обратно"""
+        if month not in self.active:
+            entry = self.manifest.get(month)
+            if entry and entry.get("archived"):
+                with gzip.open(self._path(month, True), "rb") as source, open(self._path(month, False), "wb") as target:
+                    target.write(source.read())
+                os.remove(self._path(month, True))
+                entry["archived"] = False
+            self.active[month] = JsonlStore(self._path(month, False), dedup=self.dedup)
+        return self.active[month]
+
+    def _archived(self, month: str) -> bool:
+        return self.manifest.get(month, {}).get("archived", False)
+
+    def _read_archive(self, month: str, start: int = 0) -> Iterator[Tuple[int, dict]]:
+        """(номер строки, запись) сжатого сегмента"""
+        with gzip.open(self._path(month, True), "rt", encoding="utf-8") as file:
+            for number, line in enumerate(file):
+                if number >= start and line.strip():
+                    yield number, json.loads(line)
+
+    def _read(self, month: str) -> List[dict]:
+        if self._archived(month):
+            return [record for _, record in self._read_archive(month)]
+        return list(self._segment(month).iter_records())  # без устаревших версий
+
+    def _entry(self, month: str, records: List[dict]) -> dict:
+        entry = self.manifest.setdefault(month, _new_entry())
+        dates = [record["saved_at"] for record in records if record.get("saved_at")]
+        if dates:
+            known = [entry["min_saved_at"]] if entry["min_saved_at"] else []
+            entry["min_saved_at"] = min(known + dates)
+            entry["max_saved_at"] = max([entry["max_saved_at"]] + dates)
+        entry["subjects"] = sorted(set(entry["subjects"]) | {record.get("subject") or "" for record in records})
+        return entry
+
+    def append_many(self, records: Iterable[dict]) -> List[int]:
+        by_month: Dict[str, List[dict]] = {}
+        for record in records:
+            by_month.setdefault(month_of(record), []).append(record)
+        ids = []
+        with self.lock:
+            for month, batch in by_month.items():
+                store = self._segment(month)
+                entry = self._entry(month, batch)
+                ids += store.append_many(batch, on_version=lambda previous, record: _count(entry, previous, record))
+                entry["records"] = store.count()
+            if by_month:
+                self._save_manifest()
+        return ids
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def months(self, subject: Optional[str] = None, since: str = "", until: str = "") -> List[str]:
+        """Сегменты, которые могут содержать записи предмета за период, по данным манифеста"""
+        with self.lock:
+            manifest = dict(self.manifest)
+        selected = []
+        for month, entry in manifest.items():
+            if subject is not None and subject not in entry["subjects"]:
+                continue
+            if month != UNDATED and ((since and entry["max_saved_at"] < since) or
+                                     (until and entry["min_saved_at"] >= until)):
+                continue
+            selected.append(month)
+        return sorted(selected, key=_order)
+
+    def records(self, subject: Optional[str] = None, since: str = "", until: str = "") -> Iterator[dict]:
+        """Записи за период из подходящих сегментов; subject=None — все предметы"""
+        for month in self.months(subject, since, until):
+            with self.lock:
+                segment = self._read(month)
+            for record in segment:
+                if _matches(record, subject, since, until):
+                    yield record
+
+    def iter_records(self) -> Iterator[dict]:
+        return self.records()
+
+    def count(self) -> int:
+        with self.lock:
+            return sum(entry["records"] for entry in self.manifest.values())
+
+    def query(self, subject: str, since: str = "", until: str = "") -> List[dict]:
+        return list(self.records(subject, since, until))
+
+    def query_page(self, subject: str, since: str = "", until: str = "", after: Optional[list] = None,
+                   limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[list]]:
+        """Страница записей по курсору [месяц, позиция в сегменте]; limit=0 только ищет начало следующей"""
+        months = self.months(subject, since, until)
+        if after:
+            months = [month for month in months if _order(month) >= _order(after[0])]
+        page = []
+        for month in months:
+            start = after[1] if after and month == after[0] else 0
+            with self.lock:
+                if not self._archived(month):
+                    # Текущий сегмент — JsonlStore: курсор внутри него — смещение строки
+                    records, cursor = self._segment(month).query_page(subject, since, until, [start],
+                                                                      limit - len(page))
+                    page += records
+                    if cursor is not None:
+                        return page, [month] + cursor
+                    continue
+                for position, record in self._read_archive(month, start):
+                    if not _matches(record, subject, since, until):
+                        continue
+                    if len(page) == limit:
+                        return page, [month, position]
+                    page.append(record)
+        return page, None
+
+    def archive(self, before: str) -> List[str]:
+        """Сжимает текущие сегменты месяцев раньше before («2026-09»), возвращает их список"""
+        archived = []
+        with self.lock:
+            for month, entry in sorted(self.manifest.items()):
+                if entry["archived"] or month == UNDATED or month >= before:
+                    continue
+                records = self._read(month)  # без устаревших версий
+                tmp_path = self._path(month, True) + ".tmp"
+                with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+                    for record in records:
+                        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self._path(month, True))
+                os.remove(self._path(month, False))
+                self.active.pop(month, None)
+                entry.update(archived=True, records=len(records))
+                archived.append(month)
+            if archived:
+                self._save_manifest()
+        return archived
+
+    def rebuild_manifest(self) -> int:
+        """Пересобирает манифест по файлам сегментов, возвращает число сегментов"""
+        with self.lock:
+            self.manifest = {}
+            self.active = {}
+            for name in sorted(os.listdir(self.directory)):
+                match = re.fullmatch(r"(\d{4}-\d{2}|%s)\.jsonl(\.gz)?" % UNDATED, name)
+                if not match:
+                    continue
+                month, archived = match.group(1), bool(match.group(2))
+                self.manifest[month] = _new_entry(archived)
+                records = self._read(month)
+                entry = self._entry(month, records)
+                entry["records"] = len(records)
+                for record in records:
+                    _count(entry, None, record)
+            self._save_manifest()
+            return len(self.manifest)
+
+    def add_rollups(self, rollups: Rollups, subject: Optional[str] = None, since: str = "", until: str = ""):
+        """Добавляет в rollups счетчики сегментов периода из манифеста, записи не читаются"""
+        with self.lock:
+            # Счетчики ведутся по дням, поэтому и сегменты отбираются по границам дней
+            for month in self.months(subject, *day_bounds(since, until)):
+                entry = self.manifest[month]
+                for name, days in entry["daily"].items():
+                    for day, (links, sent) in days.items():
+                        rollups.daily[name, day][0] += links
+                        rollups.daily[name, day][1] += sent
+                for domain, subjects in entry["domains"].items():
+                    for name, (links, sent) in subjects.items():
+                        rollups.domains[domain, name][0] += links
+                        rollups.domains[domain, name][1] += sent
+
+    def _rollups(self, subject: Optional[str] = None, since: str = "", until: str = "") -> Rollups:
+        rollups = Rollups()
+        self.add_rollups(rollups, subject, since, until)
+        return rollups
+
+    def rebuild_rollups(self) -> int:
+        return self.rebuild_manifest()
+
+
+class Histories(Summaries):
+    """Чтение и сводка по нескольким историям чатов как по одной.
+
+    Подклассы задают _chats(): список (каталог, ChatHistory) в порядке каталогов.
+    """
+
+    @abstractmethod
+    def _chats(self) -> List[Tuple[str, ChatHistory]]:
+        """(каталог, история чата) в порядке каталогов"""
+
+    def records(self, subject: Optional[str] = None, since: str = "", until: str = "") -> Iterator[dict]:
+        for _, history in self._chats():
+            yield from history.records(subject, since, until)
+
+    def iter_records(self) -> Iterator[dict]:
+        return self.records()
+
+    def count(self) -> int:
+        return sum(history.count() for _, history in self._chats())
+
+    def query(self, subject: str, since: str = "", until: str = "") -> List[dict]:
+        return list(self.records(subject, since, until))
+
+    def query_page(self, subject: str, since: str = "", until: str = "", after: Optional[list] = None,
+                   limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[list]]:
+        """Страница записей по курсору [чат, месяц, позиция]"""
+        page = []
+        for key, history in self._chats():
+            if after and key < after[0]:
+                continue
+            records, cursor = history.query_page(subject, since, until,
+                                                 after[1:] if after and key == after[0] else None,
+                                                 limit - len(page))
+            page += records
+            if cursor is not None:
+                return page, [key] + cursor
+        return page, None
+
+    def _rollups(self, subject: Optional[str] = None, since: str = "", until: str = "") -> Rollups:
+        rollups = Rollups()
+        for _, history in self._chats():
+            history.add_rollups(rollups, subject, since, until)
+        return rollups
+
+
+class ChatView(Histories):
+    """История, видимая в чате: каталог чата и общая история common"""
+
+    def __init__(self, chats: List[Tuple[str, ChatHistory]]):
+        self.chats = sorted(chats)
+
+    def _chats(self) -> List[Tuple[str, ChatHistory]]:
+        return self.chats
+
+
+class PartitionedStore(Histories):
+    """Каталоги чатов с сегментами по месяцам; тот же интерфейс, что у остальных хранилищ"""
+
+    def __init__(self, directory: str = DEFAULT_DIR, dedup: str = DEDUP_OFF):
+        self.directory = directory
+        self.dedup = dedup
+        self.lock = threading.Lock()
+        self.chats: Dict[str, ChatHistory] = {}
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, name)):
+                self.chat(name)
+
+    def chat(self, chat_id) -> ChatHistory:
+        """История одного чата; отчеты чата открывают только его каталог"""
+        key = chat_key(chat_id)
+        with self.lock:
+            if key not in self.chats:
+                self.chats[key] = ChatHistory(os.path.join(self.directory, key), self.dedup)
+            return self.chats[key]
+
+    def view(self, chat_id) -> ChatView:
+        """История для отчетов чата: его каталог и common, чужие каталоги не читаются"""
+        keys = {chat_key(chat_id), COMMON_CHAT}
+        return ChatView([(key, self.chat(key)) for key in keys])
+
+    def _chats(self) -> List[Tuple[str, ChatHistory]]:
+        with self.lock:
+            return sorted(self.chats.items())
+
+    def append_many(self, records: Iterable[dict]) -> List[int]:
+        by_chat: Dict[str, List[dict]] = {}
+        for record in records:
+            by_chat.setdefault(chat_key(record.get("chat_id")), []).append(record)
+        ids = []
+        for key, batch in by_chat.items():
+            ids += self.chat(key).append_many(batch)
+        return ids
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def archive(self, keep_months: int = KEEP_ACTIVE_MONTHS, now: Optional[datetime] = None) -> int:
+        """Сжимает во всех чатах месяцы старше keep_months последних, возвращает число сегментов"""
+        now = now or datetime.now()
+        year, month = divmod(now.year * 12 + now.month - 1 - (keep_months - 1), 12)
+        before = f"{year:04d}-{month + 1:02d}"
+        return sum(len(history.archive(before)) for _, history in self._chats())
+
+    def rebuild_rollups(self) -> int:
+        return sum(history.rebuild_manifest() for _, history in self._chats())
+
+
+def open_store(directory: str = DEFAULT_DIR, dedup: str = DEDUP_OFF) -> PartitionedStore:
+    """Открывает каталоги чатов и сжимает старые месяцы; пустое хранилище заполняется из
+    requests.sqlite, requests.jsonl или старого requests.json (записи без chat_id попадают в common)"""
+    is_new = not os.path.isdir(directory) or not os.listdir(directory)
+    store = PartitionedStore(directory, dedup)
+    source = None
+    if is_new and os.path.exists(sqlite_store.DEFAULT_PATH):
+        source = sqlite_store.open_store()
+    elif is_new and (os.path.exists(jsonl_store.DEFAULT_PATH) or os.path.exists(jsonl_store.LEGACY_PATH)):
+        source = jsonl_store.open_store()  # старый requests.json сначала переносится в журнал
+    if source is not None:
+        batch = []
+        for record in source.iter_records():
+            batch.append(record)
+            if len(batch) >= sqlite_store.READ_CHUNK:
+                store.append_many(batch)
+                batch = []
+        store.append_many(batch)
+    store.archive()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="История по чатам и месяцам со сжатыми архивами")
+    parser.add_argument("--directory", default=DEFAULT_DIR)
+    parser.add_argument("--dedup", default=DEDUP_OFF, help="режим дедупликации: link, link_day или пусто")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    archive = subparsers.add_parser("archive", help="сжать старые месяцы")
+    archive.add_argument("--keep", type=int, default=KEEP_ACTIVE_MONTHS, help="сколько последних месяцев не сжимать")
+    subparsers.add_parser("manifest", help="пересобрать манифесты по файлам сегментов")
+    subparsers.add_parser("show", help="чаты и сегменты из манифестов")
+    args = parser.parse_args()
+
+    store = PartitionedStore(args.directory, args.dedup)
+    if args.command == "archive":
+        print(f"Сжато сегментов: {store.archive(args.keep)}")
+    elif args.command == "manifest":
+        print(f"Сегментов в манифестах: {store.rebuild_rollups()}")
+    else:
+        for key, history in store._chats():
+            print(f"{key}: {history.count()} записей")
+            for month in history.months():
+                entry = history.manifest[month]
+                print(f"  {month}  {entry['records']:>6}  {entry['min_saved_at'][:10]} … {entry['max_saved_at'][:10]}"
+                      f"{'  (архив)' if entry['archived'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
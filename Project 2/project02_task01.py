@@ -6,9 +6,32 @@ from typing_extensions import Annotated
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 import json
+import logging
+import time
 from datetime import datetime, timedelta
+from subject_registry import OTHER_SUBJECT, SubjectRegistry, extract_url, normalize_subject
+from url_normalizer import canonicalize_url
+from classification_cache import ClassificationCache, prompt_version
+from storage import chat_history, open_store
+from domain_prior import DomainPrior
+from report_query import is_summary, parse_report_query
+from rollups import format_stats
+from report_pages import ReportPager
+from content_classifier import ContentClassifier
+from knn_classifier import KnnIndex
+from page_fetcher import PageFetcher
 
 API_KEY = "YOUR API KEY"
+CACHE_TTL = 30 * 24 * 3600  # срок жизни закешированной классификации, секунды
+STORAGE_BACKEND = "sqlite"  # "sqlite" (индекс по предмету и дате), "jsonl", "columnar" (NumPy) или "partitioned" (по чатам и месяцам)
+PRIOR_CONFIDENCE = 0.9  # доля предмета среди ссылок сайта, при которой LLM не нужен
+PRIOR_MIN_COUNT = 3  # сколько ссылок с сайта нужно, чтобы доверять его статистике
+PRIOR_SAMPLE_RATE = 0.05  # доля априорных ответов, которые все равно проверяются LLM
+CONTENT_CONFIDENCE = 0.8  # вероятность предмета по тексту страницы, при которой LLM не нужен
+FETCH_PAGES = True  # скачивать начало незнакомых страниц для локальной модели и промпта
+KNN_K = 7  # соседей из истории, голосующих за предмет
+KNN_VOTE = 0.8  # доля голосов соседей за предмет, при которой LLM не нужен
+DEDUP_MODE = "link"  # повтор ссылки: "link" — одна запись на ссылку, "link_day" — на ссылку в день, "" — новая запись
 
 
 # Определяем состояние агента
@@ -16,45 +39,52 @@ class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
     current_action: Optional[str]
     result_data: Optional[dict]
+    report: Optional[dict]  # постраничный отчет: pager, номер страницы, есть ли следующая
+    chat_id: Optional[str]  # чат Telegram: запись и отчеты идут в его раздел истории
 
 
 # Инициализация модели
 llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False, model="GigaChat-2")
 
+# Индекс предопределенных ссылок: известные ссылки классифицируются без LLM
+registry = SubjectRegistry()
+
+# История запросов; старые requests.jsonl/requests.json переносятся при первом запуске
+store = open_store(STORAGE_BACKEND, dedup=DEDUP_MODE)
+
+# Распределение предметов по сайтам и разделам: строится по истории, дополняется при сохранении
+prior = DomainPrior(PRIOR_CONFIDENCE, PRIOR_MIN_COUNT, PRIOR_SAMPLE_RATE).build(store.iter_records())
+
+# Классификатор по содержимому сохраненных страниц (content_classifier.py train); None, пока не обучен
+content_model = ContentClassifier.load()
+
+# Ближайшие размеченные ссылки истории по словам ссылки и тексту страницы
+knn = KnnIndex(KNN_K, KNN_VOTE).build(store.iter_records())
+
+# Загрузка страниц: пул соединений по хостам, условные запросы и сжатый кеш в pages/
+fetcher = PageFetcher()
+
 
 # Инструменты агента
 @tool
-def save_to_json(data: dict) -> str:  # Сохраняет данные в файл requests.json
-    """Сохраняет данные в файл requests.json"""
+def save_to_json(data: dict) -> str:  # Сохраняет данные в историю запросов
+    """Сохраняет данные в историю запросов"""
     try:
-        try:
-            with open('requests.json', 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)  # чтение JSON данных из файла
-        except FileNotFoundError:
-            existing_data = []
-
-        if not isinstance(existing_data, list):  # проверка чтобы в файле всегда был список
-            existing_data = [existing_data]
-
         data['saved_at'] = datetime.now().isoformat()
-        existing_data.append(data)  # добавили метку когда произведены сохранения
-
-        with open('requests.json', 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, indent=4, ensure_ascii=False)  # записали изменения в файлик
+        url = extract_url(data.get("original_link") or "")
+        if url:
+            data["link"] = canonicalize_url(url)  # один вид ссылки для поиска и дедупликации
+        store.append(data)  # дописали одну запись, без перезаписи всей истории
 
-        return f"Сохранено. Всего записей: {len(existing_data)}"
+        return f"Сохранено. Всего записей: {store.count()}"
     except Exception as e:
         return f"Ошибка: {str(e)}"
 
 
 @tool
-def read_from_json() -> list:  # Читает данные из файла requests.json
-    """Читает данные из файла requests.json"""
-    try:
-        with open('requests.json', 'r', encoding='utf-8') as f:
-            return json.load(f)  # вернули прочитанный файл
-    except FileNotFoundError:
-        return []
+def read_from_json() -> list:  # Читает данные из истории запросов
+    """Читает данные из истории запросов"""
+    return list(store.iter_records())
 
 
 @tool
@@ -122,11 +152,15 @@ https://bigenc.ru/l/nachala-termodinamiki-7415b1
 https://naked-science.ru/tags/elektrodinamika
 https://nonfiction.ru/stream/kvantovaya-fizika-za-5-minut-glavnyie-voprosyi-i-idei
 
-Если ссылки в этом списке нет, открой ее и проанализируй содержимое самостоятельно.
+Если ссылки в этом списке нет, определи предмет по содержимому страницы: ее заголовок и начало текста
+приводятся после ссылки. Если содержимого нет, определи предмет по самой ссылке.
 
 Верни ТОЛЬКО название предмета без лишних слов.
 """)
 
+# Кеш ответов LLM; версия промпта входит в ключ, правка промпта сбрасывает кеш
+cache = ClassificationCache(version=prompt_version(CLASSIFY_PROMPT.content), ttl=CACHE_TTL)
+
 REPORT_PROMPT = SystemMessage(content="""
 Ты - помощник для генерации отчетов по учебным материалам.
 Пользователь запрашивает отчет по определенному предмету за период времени.
@@ -148,25 +182,70 @@ def router(state: AgentState) -> AgentState:  # узел решает что д
 
     if any(protocol in last_msg for protocol in ['http://', 'https://', 'www.']):
         return {"current_action": "classify"}
-    elif any(keyword in last_msg for keyword in ['отчет', 'report', 'материалы', 'список']):
+    elif any(keyword in last_msg for keyword in ['отчет', 'report', 'материалы', 'список', 'сводк', 'статистик']):
         return {"current_action": "report"}
     else:
         return {"current_action": "chat"}
 
 
+def local_subject(text: str) -> Optional[str]:
+    """Предмет от локальных моделей: голосование соседей из истории, затем классификатор по содержимому"""
+    subject = knn.predict(text)
+    if not subject and content_model:
+        subject = content_model.confident(text, CONTENT_CONFIDENCE)
+    return subject
+
+
+def page_summary(text: str) -> str:
+    """Заголовок и начало текста страницы из сообщения или пустая строка"""
+    url = extract_url(text)
+    return fetcher.summary(url) if FETCH_PAGES and url else ""
+
+
 def classify_node(state: AgentState) -> AgentState:  # кЛАССИФИКАТОР ССЫЛКИ
     user_msg = state["messages"][-1].content
 
-    response = llm.invoke([CLASSIFY_PROMPT, HumanMessage(content=user_msg)])
-    subject = response.content.strip()
+    subject = registry.lookup(user_msg) or cache.get(user_msg)
+    learn = True  # учитывать ли ответ в статистике сайтов и индексе соседей
+    if not subject:
+        prior_subject = prior.predict(user_msg)
+        check = prior_subject is not None and prior.should_check()
+        if prior_subject and not check:
+            subject = prior_subject
+            learn = False  # собственный ответ индекса не должен его подкреплять
+        else:
+            # Начало страницы сохраняется в pages/: по нему работают и локальная модель, и промпт
+            page = page_summary(user_msg)
+            guess = local_subject(user_msg) if not prior_subject else None
+            if guess:
+                subject = guess
+                learn = False  # догадки локальных моделей не подкрепляют статистику сайтов и соседей
+            else:
+                started = time.perf_counter()
+                content = f"{user_msg}\n\nСодержимое страницы:\n{page}" if page else user_msg
+                response = llm.invoke([CLASSIFY_PROMPT, HumanMessage(content=content)])
+                subject = normalize_subject(response.content)
+                if subject is None:
+                    # Ответ не из списка предметов не кешируется и не попадает в статистику
+                    logging.warning(f"Ответ модели не из списка предметов: {response.content!r}")
+                    subject, learn = OTHER_SUBJECT, False
+                else:
+                    cache.put(user_msg, subject, latency=time.perf_counter() - started)
+                    if check:
+                        prior.record_check(prior_subject, subject)
 
     result = {
         "date": datetime.now().strftime("%Y-%m-%d"),
         "subject": subject,
         "original_link": user_msg
     }
+    if state.get("chat_id"):
+        result["chat_id"] = state["chat_id"]
 
     save_result = save_to_json.invoke({"data": result})
+    if learn:
+        prior.add(result)
+        knn.add(result)
 
     return {
         "result_data": result,
@@ -177,17 +256,18 @@ def classify_node(state: AgentState) -> AgentState:  # кЛАССИФИКАТО
 def report_node(state: AgentState) -> AgentState:  # создает отчет, по умолчанию предмет - прога на питоне
     user_query = state["messages"][-1].content
 
-    # Определяем предмет
-    subjects = ["Численные методы", "Компьютерные сети", "Программирование на python", "Физика"]
-    subject = None
+    # Предмет (по основам слов и синонимам) и период разбираются локально
+    subject, since, until, period = parse_report_query(user_query)
+    bounds = {"since": since.isoformat(), "until": until.isoformat() if until else ""}
+    history = chat_history(store, state.get("chat_id"))  # в разбитом по чатам хранилище — только раздел чата
 
-    for subj in subjects:
-        if subj.lower() in user_query.lower():
-            subject = subj
-            break
+    if is_summary(user_query):
+        # Сводка — из счетчиков по дням (O(дней) строк), без чтения записей и без LLM
+        text = format_stats(history, subject, period=period, **bounds)
+        return {"result_data": None, "messages": [HumanMessage(content=text)]}
 
     if not subject:
-        # Если предмет не найден, используем LLM для определения
+        # Если предмет не распознан, используем LLM для определения
         subject_prompt = f"""
         Пользователь запрашивает: {user_query}
 
@@ -202,24 +282,13 @@ def report_node(state: AgentState) -> AgentState:  # создает отчет,
         subject_response = llm.invoke([HumanMessage(content=subject_prompt)])
         subject = subject_response.content.strip()
 
-    # Определяем период
-    days = 30
-    if "недел" in user_query:
-        days = 7
-    elif "месяц" in user_query:
-        days = 30
-    elif "квартал" in user_query:
-        days = 90
-    elif "год" in user_query:
-        days = 365
-
-    # Получаем данные
-    all_data = read_from_json.invoke({})
-    filtered_data = filter_data.invoke({"data": all_data, "subject": subject, "days": days})
+    # Заголовок из счетчиков, записи — только первая страница по курсору
+    pager = ReportPager(history, subject, period=period, **bounds)
+    number, records, has_next = pager.page(0)
 
     return {
-        "result_data": filtered_data,
-        "messages": [HumanMessage(content=f"Отчет: {subject} за {days} дней - {len(filtered_data)} записей")]
+        "report": {"pager": pager, "page": number, "has_next": has_next},
+        "messages": [HumanMessage(content=pager.render(number, records))]
     }
 
 
@@ -267,17 +336,40 @@ def create_agent():
 agent = create_agent()
 
 
+current_report = None  # последний отчет, который листается командами «дальше» и «назад»
+
+
 def process_input(user_input: str):  # обрабатывает запрос пользователя
+    global current_report
     print(f"\nтвоё соо: {user_input}")
 
     result = agent.invoke({
         "messages": [HumanMessage(content=user_input)],
         "current_action": None,
-        "result_data": None
+        "result_data": None,
+        "report": None,
+        "chat_id": None
     })
 
     response = result["messages"][-1].content
     print(f"соо агента: {response}")
+    if result.get("report"):
+        current_report = result["report"]
+        if current_report["has_next"]:
+            print("(дальше — следующая страница)")
+
+
+def turn_page(step: int):  # листает последний отчет без повторного запроса к агенту
+    if not current_report:
+        print("Нет открытого отчета")
+        return
+    pager = current_report["pager"]
+    number, records, has_next = pager.page(current_report["page"] + step)
+    current_report.update(page=number, has_next=has_next)
+    print(pager.render(number, records))
+    hints = [word for word, show in (("назад", number > 0), ("дальше", has_next)) if show]
+    if hints:
+        print(f"({' / '.join(hints)})")
 
 
 if __name__ == "__main__":
@@ -292,6 +384,8 @@ if __name__ == "__main__":
     print("- https://example.com (классификация ссылки)")
     print("- отчет по физике за неделю")
     print("- материалы по python за месяц")
+    print("- дальше / назад (страницы последнего отчета)")
+    print("- сводка за неделю (числа по предметам и доменам)")
     print("- выход (для завершения)")
     print("=" * 50)
 
@@ -299,8 +393,20 @@ if __name__ == "__main__":
         user_input = input("\nвведите соо  ").strip()
 
         if user_input.lower() in ['exit', 'выход']:
+            print(f"Статистика реестра ссылок: {registry.stats()}")
+            print(f"Статистика кеша: {cache.stats()}")
+            print(f"Статистика по сайтам: {prior.stats()}")
+            print(f"Статистика соседей из истории: {knn.stats()}")
+            if content_model:
+                print(f"Статистика классификатора по содержимому: {content_model.stats()}")
+            print(f"Статистика загрузки страниц: {fetcher.stats()}")
+            fetcher.close()
             break
 
+        if user_input.lower() in ['дальше', 'назад']:
+            turn_page(1 if user_input.lower() == 'дальше' else -1)
+            continue
+
         if user_input:
             try:
                 process_input(user_input)
@@ -5,11 +5,27 @@ from typing import TypedDict, Optional
 from typing_extensions import Annotated
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
+import asyncio
 import json
+import time
 from datetime import datetime, timedelta
 import logging
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from collections import OrderedDict
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes
+
+from subject_registry import OTHER_SUBJECT, SubjectRegistry, extract_url, normalize_subject
+from url_normalizer import canonicalize_url
+from classification_cache import ClassificationCache, prompt_version
+from storage import DEFAULT_BACKEND, DEFAULT_DEDUP, chat_history, open_store
+from domain_prior import DomainPrior
+from report_query import is_summary, parse_report_query
+from rollups import format_stats
+from report_pages import ReportPager
+from content_classifier import ContentClassifier
+from knn_classifier import KnnIndex
+from page_fetcher import PageFetcher
+from write_queue import GroupCommitWriter
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,6 +35,23 @@ logging.basicConfig(
 
 API_KEY = "YOUR API KEY"
 TELEGRAM_TOKEN = "YOUR TG TOKEN"  # Замените на ваш токен
+CACHE_TTL = 30 * 24 * 3600  # срок жизни закешированной классификации, секунды
+# "partitioned" — по чатам и месяцам со сжатыми архивами: отчет чата читает только свои сегменты периода;
+# "sqlite" (индекс по предмету и дате), "jsonl" или "columnar" (NumPy) — общая история всех чатов.
+# Меняется в storage.py, чтобы консольные команды читали то же хранилище
+STORAGE_BACKEND = DEFAULT_BACKEND
+PRIOR_CONFIDENCE = 0.9  # доля предмета среди ссылок сайта, при которой LLM не нужен
+PRIOR_MIN_COUNT = 3  # сколько ссылок с сайта нужно, чтобы доверять его статистике
+PRIOR_SAMPLE_RATE = 0.05  # доля априорных ответов, которые все равно проверяются LLM
+CONTENT_CONFIDENCE = 0.8  # вероятность предмета по тексту страницы, при которой LLM не нужен
+FETCH_PAGES = True  # скачивать начало незнакомых страниц для локальной модели и промпта
+KNN_K = 7  # соседей из истории, голосующих за предмет
+KNN_VOTE = 0.8  # доля голосов соседей за предмет, при которой LLM не нужен
+DEDUP_MODE = DEFAULT_DEDUP  # повтор ссылки: "link" — одна запись на ссылку, "link_day" — на ссылку в день, "" — новая запись
+WRITE_BATCH_SIZE = 256  # максимум записей в одной групповой фиксации
+WRITE_MAX_DELAY = 0.0  # сколько запись может ждать попутчиков перед фиксацией, секунды (0 — не ждать)
+AGENT_CONCURRENCY = 8  # сколько запросов агент обрабатывает одновременно
+MAX_OPEN_REPORTS = 20  # сколько последних отчетов чата можно листать кнопками
 
 
 # Определяем состояние агента
@@ -26,45 +59,55 @@ class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
     current_action: Optional[str]
     result_data: Optional[dict]
+    report: Optional[dict]  # постраничный отчет: pager, номер страницы, есть ли следующая
+    chat_id: Optional[str]  # чат Telegram: запись и отчеты идут в его раздел истории
 
 
 # Инициализация модели
 llm = GigaChat(credentials=API_KEY, verify_ssl_certs=False, model="GigaChat-2")
 
+# Индекс предопределенных ссылок: известные ссылки классифицируются без LLM
+registry = SubjectRegistry()
+
+# История запросов; старые requests.jsonl/requests.json переносятся при первом запуске
+store = open_store(STORAGE_BACKEND, dedup=DEDUP_MODE)
+
+# Распределение предметов по сайтам и разделам: строится по истории, дополняется при сохранении
+prior = DomainPrior(PRIOR_CONFIDENCE, PRIOR_MIN_COUNT, PRIOR_SAMPLE_RATE).build(store.iter_records())
+
+# Классификатор по содержимому сохраненных страниц (content_classifier.py train); None, пока не обучен
+content_model = ContentClassifier.load()
+
+# Ближайшие размеченные ссылки истории по словам ссылки и тексту страницы
+knn = KnnIndex(KNN_K, KNN_VOTE).build(store.iter_records())
+
+# Загрузка страниц: пул соединений по хостам, условные запросы и сжатый кеш в pages/
+fetcher = PageFetcher()
+
+# Единственный писатель: сохранения из разных чатов фиксируются пачками
+writer = GroupCommitWriter(store, max_batch=WRITE_BATCH_SIZE, max_delay=WRITE_MAX_DELAY)
+
 
 # Инструменты агента
 @tool
-def save_to_json(data: dict) -> str:
-    """Сохраняет данные в файл requests.json"""
+async def save_to_json(data: dict) -> str:
+    """Сохраняет данные в историю запросов"""
     try:
-        try:
-            with open('requests.json', 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-        except FileNotFoundError:
-            existing_data = []
-
-        if not isinstance(existing_data, list):
-            existing_data = [existing_data]
-
         data['saved_at'] = datetime.now().isoformat()
-        existing_data.append(data)
+        url = extract_url(data.get("original_link") or "")
+        if url:
+            data["link"] = canonicalize_url(url)  # один вид ссылки для поиска и дедупликации
+        total = await writer.save(data)  # ждем фиксации пачки, не занимая поток и цикл событий
 
-        with open('requests.json', 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, indent=4, ensure_ascii=False)
-
-        return f"Сохранено. Всего записей: {len(existing_data)}"
+        return f"Сохранено. Всего записей: {total}"
     except Exception as e:
         return f"Ошибка: {str(e)}"
 
 
 @tool
 def read_from_json() -> list:
-    """Читает данные из файла requests.json"""
-    try:
-        with open('requests.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+    """Читает данные из истории запросов"""
+    return list(store.iter_records())
 
 
 @tool
@@ -132,11 +175,15 @@ https://bigenc.ru/l/nachala-termodinamiki-7415b1
 https://naked-science.ru/tags/elektrodinamika
 https://nonfiction.ru/stream/kvantovaya-fizika-za-5-minut-glavnyie-voprosyi-i-idei
 
-Если ссылки в этом списке нет, открой ее и проанализируй содержимое самостоятельно.
+Если ссылки в этом списке нет, определи предмет по содержимому страницы: ее заголовок и начало текста
+приводятся после ссылки. Если содержимого нет, определи предмет по самой ссылке.
 
 Верни ТОЛЬКО название предмета без лишних слов.
 """)
 
+# Кеш ответов LLM; версия промпта входит в ключ, правка промпта сбрасывает кеш
+cache = ClassificationCache(version=prompt_version(CLASSIFY_PROMPT.content), ttl=CACHE_TTL)
+
 REPORT_PROMPT = SystemMessage(content="""
 Ты - помощник для генерации отчетов по учебным материалам.
 Пользователь запрашивает отчет по определенному предмету за период времени.
@@ -158,25 +205,74 @@ def router(state: AgentState) -> AgentState:
 
     if any(protocol in last_msg for protocol in ['http://', 'https://', 'www.']):
         return {"current_action": "classify"}
-    elif any(keyword in last_msg for keyword in ['отчет', 'report', 'материалы', 'список']):
+    elif any(keyword in last_msg for keyword in ['отчет', 'report', 'материалы', 'список', 'сводк', 'статистик']):
         return {"current_action": "report"}
     else:
         return {"current_action": "chat"}
 
 
-def classify_node(state: AgentState) -> AgentState:
+def local_subject(text: str) -> Optional[str]:
+    """Предмет от локальных моделей: голосование соседей из истории, затем классификатор по содержимому"""
+    subject = knn.predict(text)
+    if not subject and content_model:
+        subject = content_model.confident(text, CONTENT_CONFIDENCE)
+    return subject
+
+
+def page_summary(text: str) -> str:
+    """Заголовок и начало текста страницы из сообщения или пустая строка"""
+    url = extract_url(text)
+    return fetcher.summary(url) if FETCH_PAGES and url else ""
+
+
+async def classify_node(state: AgentState) -> AgentState:
     user_msg = state["messages"][-1].content
 
-    response = llm.invoke([CLASSIFY_PROMPT, HumanMessage(content=user_msg)])
-    subject = response.content.strip()
+    # Кеш читает и пишет SQLite: запросы к нему идут в потоке, чтобы не держать цикл событий
+    subject = registry.lookup(user_msg) or await asyncio.to_thread(cache.get, user_msg)
+    learn = True  # учитывать ли ответ в статистике сайтов и индексе соседей
+    if not subject:
+        prior_subject = prior.predict(user_msg)
+        check = prior_subject is not None and prior.should_check()
+        if prior_subject and not check:
+            subject = prior_subject
+            learn = False  # собственный ответ индекса не должен его подкреплять
+        else:
+            # Начало страницы сохраняется в pages/: по нему работают и локальная модель, и промпт
+            page = await asyncio.to_thread(page_summary, user_msg)
+            guess = await asyncio.to_thread(local_subject, user_msg) if not prior_subject else None
+            if guess:
+                subject = guess
+                learn = False  # догадки локальных моделей не подкрепляют статистику сайтов и соседей
+            else:
+                started = time.perf_counter()
+                content = f"{user_msg}\n\nСодержимое страницы:\n{page}" if page else user_msg
+                response = await llm.ainvoke([CLASSIFY_PROMPT, HumanMessage(content=content)])
+                subject = normalize_subject(response.content)
+                if subject is None:
+                    # Ответ не из списка предметов не кешируется и не попадает в статистику
+                    logging.warning(f"Ответ модели не из списка предметов: {response.content!r}")
+                    subject, learn = OTHER_SUBJECT, False
+                else:
+                    await asyncio.to_thread(cache.put, user_msg, subject, time.perf_counter() - started)
+                    if check:
+                        prior.record_check(prior_subject, subject)
+    logging.info(f"Реестр ссылок: {registry.stats()}, кеш: {cache.stats()}, сайты: {prior.stats()}, "
+                 f"соседи: {knn.stats()}, "
+                 f"содержимое: {content_model.stats() if content_model else 'нет модели'}, страницы: {fetcher.stats()}")
 
     result = {
         "date": datetime.now().strftime("%Y-%m-%d"),
         "subject": subject,
         "original_link": user_msg
     }
+    if state.get("chat_id"):
+        result["chat_id"] = state["chat_id"]
 
-    save_result = save_to_json.invoke({"data": result})
+    save_result = await save_to_json.ainvoke({"data": result})
+    if learn:
+        prior.add(result)
+        await asyncio.to_thread(knn.add, result)
 
     return {
         "result_data": result,
@@ -184,16 +280,18 @@ def classify_node(state: AgentState) -> AgentState:
     }
 
 
-def report_node(state: AgentState) -> AgentState:
+async def report_node(state: AgentState) -> AgentState:
     user_query = state["messages"][-1].content
 
-    subjects = ["Численные методы", "Компьютерные сети", "Программирование на python", "Физика"]
-    subject = None
+    # Предмет (по основам слов и синонимам) и период разбираются локально, LLM — если предмет не распознан
+    subject, since, until, period = parse_report_query(user_query)
+    bounds = {"since": since.isoformat(), "until": until.isoformat() if until else ""}
+    history = chat_history(store, state.get("chat_id"))  # в разбитом по чатам хранилище — только раздел чата
 
-    for subj in subjects:
-        if subj.lower() in user_query.lower():
-            subject = subj
-            break
+    if is_summary(user_query):
+        # Сводка — из счетчиков по дням (O(дней) строк), без чтения записей и без LLM
+        text = await asyncio.to_thread(format_stats, history, subject, period=period, **bounds)
+        return {"result_data": None, "messages": [HumanMessage(content=text)]}
 
     if not subject:
         subject_prompt = f"""
@@ -207,30 +305,21 @@ def report_node(state: AgentState) -> AgentState:
 
         Верни ТОЛЬКО название предмета.
         """
-        subject_response = llm.invoke([HumanMessage(content=subject_prompt)])
+        subject_response = await llm.ainvoke([HumanMessage(content=subject_prompt)])
         subject = subject_response.content.strip()
 
-    days = 30
-    if "недел" in user_query:
-        days = 7
-    elif "месяц" in user_query:
-        days = 30
-    elif "квартал" in user_query:
-        days = 90
-    elif "год" in user_query:
-        days = 365
-
-    all_data = read_from_json.invoke({})
-    filtered_data = filter_data.invoke({"data": all_data, "subject": subject, "days": days})
+    # Заголовок из счетчиков, записи — только первая страница по курсору; остальные подгружаются кнопками
+    pager = await asyncio.to_thread(ReportPager, history, subject, period=period, **bounds)
+    number, records, has_next = await asyncio.to_thread(pager.page, 0)
 
     return {
-        "result_data": filtered_data,
-        "messages": [HumanMessage(content=f"Отчет: {subject} за {days} дней - {len(filtered_data)} записей")]
+        "report": {"pager": pager, "page": number, "has_next": has_next},
+        "messages": [HumanMessage(content=pager.render(number, records))]
     }
 
 
-def chat_node(state: AgentState) -> AgentState:
-    response = llm.invoke([MAIN_PROMPT] + state["messages"])
+async def chat_node(state: AgentState) -> AgentState:
+    response = await llm.ainvoke([MAIN_PROMPT] + state["messages"])
     return {"messages": [response]}
 
 
@@ -271,23 +360,54 @@ def create_agent():
 # Запуск агента
 agent = create_agent()
 
+# Ограничение одновременных запусков агента: медленная генерация не занимает все ресурсы
+agent_slots = asyncio.Semaphore(AGENT_CONCURRENCY)
+
 
 # Функция обработки ввода (для Telegram)
-async def process_input(user_input: str) -> str:
-    """Обрабатывает запрос пользователя и возвращает ответ"""
-    try:
-        result = agent.invoke({
+async def run_agent(user_input: str, chat_id: Optional[str] = None) -> dict:
+    """Запускает граф и возвращает итоговое состояние"""
+    async with agent_slots:
+        return await agent.ainvoke({
             "messages": [HumanMessage(content=user_input)],
             "current_action": None,
-            "result_data": None
+            "result_data": None,
+            "report": None,
+            "chat_id": chat_id
         })
 
+
+async def process_input(user_input: str, chat_id: Optional[str] = None) -> str:
+    """Обрабатывает запрос пользователя и возвращает ответ"""
+    try:
+        result = await run_agent(user_input, chat_id)
         response = result["messages"][-1].content
         return response
     except Exception as e:
         return f"Произошла ошибка при обработке запроса: {str(e)}"
 
 
+def remember_report(chat_data: dict, pager: ReportPager) -> int:
+    """Сохраняет отчет в данных чата для кнопок; старые отчеты вытесняются"""
+    reports = chat_data.setdefault("reports", OrderedDict())
+    report_id = chat_data.get("next_report", 0)
+    chat_data["next_report"] = report_id + 1
+    reports[report_id] = pager
+    while len(reports) > MAX_OPEN_REPORTS:
+        reports.popitem(last=False)
+    return report_id
+
+
+def page_keyboard(report_id: int, number: int, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Кнопки «назад»/«далее» для страницы отчета или None, если листать некуда"""
+    buttons = []
+    if number > 0:
+        buttons.append(InlineKeyboardButton("◀ Назад", callback_data=f"report:{report_id}:{number - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Далее ▶", callback_data=f"report:{report_id}:{number + 1}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
 # Telegram Bot Handlers
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
@@ -316,12 +436,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 /start - начать работу
 /help - показать эту справку
+/stats - сводка по предметам и доменам (можно указать предмет и период: /stats физика за неделю)
 
 📖 Примеры использования:
 • Просто отправьте ссылку для классификации
 • "отчет по программированию за месяц"
 • "материалы по физике за неделю"
 • "список по компьютерным сетям"
+• "сводка по физике за месяц" (только числа по дням)
 
 📊 Предметы:
 • Численные методы
@@ -332,6 +454,15 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(help_text)
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /stats: сводка из счетчиков без обращения к агенту"""
+    subject, since, until, period = parse_report_query(" ".join(context.args or []))
+    history = chat_history(store, str(update.effective_chat.id))
+    text = await asyncio.to_thread(format_stats, history, subject, since.isoformat(),
+                                   until.isoformat() if until else "", period)
+    await update.message.reply_text(text)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик текстовых сообщений"""
     user_input = update.message.text
@@ -340,7 +471,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.chat.send_action(action="typing")
 
     # Обрабатываем запрос
-    response = await process_input(user_input)
+    try:
+        result = await run_agent(user_input, str(update.effective_chat.id))
+    except Exception as e:
+        await update.message.reply_text(f"Произошла ошибка при обработке запроса: {str(e)}")
+        return
+    response = result["messages"][-1].content
+
+    # Отчет приходит одной страницей, следующие подгружаются кнопками по курсору
+    report = result.get("report")
+    if report:
+        report_id = remember_report(context.chat_data, report["pager"])
+        await update.message.reply_text(response, reply_markup=page_keyboard(report_id, report["page"],
+                                                                             report["has_next"]))
+        return
 
     # Отправляем ответ (разбиваем если слишком длинный)
     if len(response) > 4096:
@@ -350,6 +494,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(response)
 
 
+async def report_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик кнопок отчета: читает одну страницу и заменяет ею текст сообщения"""
+    query = update.callback_query
+    _, report_id, number = query.data.split(":")
+    pager = context.chat_data.get("reports", {}).get(int(report_id))
+    if pager is None:
+        await query.answer("Отчет устарел, запросите его заново")
+        return
+    await query.answer()
+    number, records, has_next = await asyncio.to_thread(pager.page, int(number))
+    await query.edit_message_text(pager.render(number, records),
+                                  reply_markup=page_keyboard(int(report_id), number, has_next))
+
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ошибок"""
     logging.error(f"Ошибка: {context.error}")
@@ -360,11 +518,14 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 def main():
     """Запуск бота"""
     # Создаем приложение
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    # concurrent_updates: сообщения разных чатов обрабатываются параллельно, а не по очереди
+    application = Application.builder().token(TELEGRAM_TOKEN).concurrent_updates(True).build()
 
     # Добавляем обработчики
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CallbackQueryHandler(report_page_callback, pattern=r"^report:"))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
     # Обработчик ошибок
@@ -0,0 +1,64 @@
+"""Постраничная выдача отчета.
+
+Отчет не собирается целиком: заголовок (число ссылок и отправок) берется из
+сводных счетчиков (rollups.py), а записи читаются по одной странице через
+store.query_page по курсору. Каждая страница — одна небольшая выборка и одно
+сообщение в компактном виде «номер. дата ссылка ×отправок».
+
+Курсоры просмотренных страниц запоминаются, поэтому переход назад не
+требует повторного чтения с начала.
+"""
+from typing import List, Optional, Tuple
+
+from rollups import day_bounds, totals
+
+PAGE_SIZE = 10
+LINK_WIDTH = 200  # длинные ссылки обрезаются, чтобы страница оставалась короткой
+
+
+def compact_line(number: int, record: dict) -> str:
+    """«3. 18.10 https://stepik.org/course/67 ×2»"""
+    saved_at = record.get("saved_at") or record.get("date") or ""
+    day = f"{saved_at[8:10]}.{saved_at[5:7]}" if len(saved_at) >= 10 else "--.--"
+    link = record.get("link") or record.get("original_link") or ""
+    if len(link) > LINK_WIDTH:
+        link = link[:LINK_WIDTH - 1] + "…"
+    count = record.get("count", 1)
+    return f"{number}. {day} {link}" + (f" ×{count}" if count > 1 else "")
+
+
+class ReportPager:
+    """Отчет по предмету за период, читаемый по страницам"""
+
+    def __init__(self, store, subject: str, since: str = "", until: str = "", period: str = "",
+                 page_size: int = PAGE_SIZE):
+        self.store = store
+        self.subject = subject
+        # Границы округляются до дня, как в счетчиках: заголовок и страницы считают одно и то же
+        self.since, self.until = day_bounds(since, until)
+        self.period = period
+        self.page_size = page_size
+        self.links, self.submissions = totals(store.days(subject, self.since, self.until))
+        self.cursors: List[Optional[list]] = [None]  # курсор начала каждой известной страницы
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.links // self.page_size))
+
+    def page(self, number: int) -> Tuple[int, List[dict], bool]:
+        """(номер, записи страницы, есть ли следующая); номер ограничивается уже известными страницами"""
+        number = min(max(number, 0), len(self.cursors) - 1)
+        records, cursor = self.store.query_page(self.subject, self.since, self.until,
+                                                self.cursors[number], self.page_size)
+        if cursor is not None and number + 1 == len(self.cursors):
+            self.cursors.append(cursor)
+        return number, records, cursor is not None
+
+    def render(self, number: int, records: List[dict]) -> str:
+        period = f" {self.period}" if self.period else ""
+        header = f"Отчет: {self.subject}{period} - {self.links} ссылок, {self.submissions} отправок"
+        if not records:
+            return header
+        lines = [header, f"Страница {number + 1} из {self.pages}"]
+        lines += [compact_line(number * self.page_size + i + 1, record) for i, record in enumerate(records)]
+        return "\n".join(lines)
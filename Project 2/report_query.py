@@ -0,0 +1,226 @@
+"""Предмет и период отчета из текста запроса без обращения к LLM.
+
+Предмет ищется по основам слов (грубый стеммер для русских окончаний) и
+синонимам: «отчет по физике», «материалы по питону», «что было по сетям».
+Период понимает «за неделю/месяц/квартал/год», «за последние 10 дней»,
+«сегодня», «вчера», «на этой/прошлой неделе», «в сентябре»,
+«с 1 по 15 октября», «с 01.10 по 15.10.2025». Период — полуинтервал
+[since, until), until = None означает «по текущий момент».
+
+«Сводка»/«статистика» вместо «отчета» просит только числа по дням, без
+списка ссылок: такой ответ строится по счетчикам (rollups.py).
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from subject_registry import SUBJECTS
+
+DEFAULT_DAYS = 30
+SUMMARY_WORDS = ("сводк", "статистик", "итог")
+
+# Окончания от длинных к коротким; основа не короче трех букв
+ENDINGS = sorted("""ами ями ого его ому ему ыми ими ой ей ий ый ая яя ое ее ые ие ую юю ах ях ам ям ом ем ов ев
+ых их ым им а я о е и ы у ю ь""".split(), key=len, reverse=True)
+
+# Основы синонимов; многословные — последовательность основ подряд.
+# Основы короче четырех букв сравниваются целиком, длинные — как префикс основы слова
+SUBJECT_SYNONYMS: Dict[str, List[str]] = {
+    "Численные методы": ["численн", "числ метод", "вычислительн математик", "вычмат", "числак", "nummeth",
+                         "numerical", "интерполяц", "аппроксимац"],
+    "Компьютерные сети": ["сет", "сетев", "компьютерн сет", "network", "networks", "tcp", "маршрутизац",
+                          "протокол"],
+    "Программирование на python": ["python", "питон", "пайтон", "программирован", "py", "джанг", "django"],
+    "Физика": ["физик", "physics", "механик", "термодинамик", "электродинамик", "оптик", "квантов"],
+}
+
+MONTH_NAMES = ["январь", "февраль", "март", "апрель", "май", "июнь", "июль", "август", "сентябрь", "октябрь",
+               "ноябрь", "декабрь"]
+MONTHS = ["январ", "феврал", "март", "апрел", "ма", "июн", "июл", "август", "сентябр", "октябр", "ноябр", "декабр"]
+MONTH_PATTERN = r"(январ[ьяе]|феврал[ьяе]|март[ае]?|апрел[ьяе]|ма[йяе]|июн[ьяе]|июл[ьяе]|август[ае]?|сентябр[ьяе]|октябр[ьяе]|ноябр[ьяе]|декабр[ьяе])"
+UNIT_DAYS = {"дн": 1, "ден": 1, "сут": 1, "недел": 7, "месяц": 30, "квартал": 90, "год": 365, "лет": 365}
+UNIT_PATTERN = r"(дн[еяи]й?|день|сут(?:ок|ки)|недел[юиья]|месяц(?:а|ев)?|квартал(?:а|ов)?|год(?:а)?|лет)"
+
+
+def stem(word: str) -> str:
+    """Основа слова: самое длинное подходящее окончание отрезается, если остается три буквы и больше"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def stems(text: str) -> List[str]:
+    return [stem(word) for word in re.findall(r"[a-zа-я0-9]+", text.lower().replace("ё", "е"))]
+
+
+def _matches(words: List[str], synonym: List[str]) -> bool:
+    for start in range(len(words) - len(synonym) + 1):
+        if all(word == part if len(part) < 4 else word.startswith(part)
+               for word, part in zip(words[start:], synonym)):
+            return True
+    return False
+
+
+def parse_subject(text: str) -> Optional[str]:
+    """Предмет с наибольшим числом совпавших синонимов или None, если совпадений нет или ничья"""
+    words = stems(text)
+    scores = {}
+    for subject in SUBJECTS:
+        synonyms = {tuple(stems(subject))} | {tuple(synonym.split()) for synonym in SUBJECT_SYNONYMS.get(subject, [])}
+        scores[subject] = sum(len(synonym) for synonym in synonyms if _matches(words, list(synonym)))
+    best = max(scores.values())
+    winners = [subject for subject, score in scores.items() if score == best]
+    return winners[0] if best and len(winners) == 1 else None
+
+
+def _month(name: str) -> int:
+    """Номер месяца по форме слова: «сентябре» → 9, «мая» → 5"""
+    for number, prefix in enumerate(MONTHS, start=1):
+        if name.startswith(prefix) and (prefix != "ма" or name[:3] in ("май", "мая", "мае")):
+            return number
+    raise ValueError(name)
+
+
+def _past_date(year: Optional[int], month: int, day: int, now: datetime) -> datetime:
+    """Дата без года — ближайшая не из будущего"""
+    if year is not None:
+        return datetime(year if year > 100 else 2000 + year, month, day)
+    date = datetime(now.year, month, day)
+    return date if date <= now else datetime(now.year - 1, month, day)
+
+
+def _month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _format(date: datetime) -> str:
+    return date.strftime("%d.%m.%Y")
+
+
+def _month_label(date: datetime) -> str:
+    return f"за {MONTH_NAMES[date.month - 1]} {date.year}"
+
+
+def days_label(days: int) -> str:
+    """«за 1 день», «за 3 дня», «за 10 дней»"""
+    if days % 10 == 1 and days % 100 != 11:
+        word = "день"
+    elif 2 <= days % 10 <= 4 and not 12 <= days % 100 <= 14:
+        word = "дня"
+    else:
+        word = "дней"
+    return f"за {days} {word}"
+
+
+def _range(since: datetime, until: datetime) -> Tuple[datetime, Optional[datetime], str]:
+    """Включительный диапазон дат; перепутанные границы меняются местами"""
+    since, until = min(since, until), max(since, until)
+    return since, until + timedelta(days=1), f"с {_format(since)} по {_format(until)}"
+
+
+def _parse_period(text: str, now: datetime) -> Tuple[datetime, Optional[datetime], str]:
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    text = text.lower().replace("ё", "е")
+
+    # «с 1 по 15 октября», «с 28 сентября по 3 октября 2025»
+    match = re.search(r"\bс\s+(\d{1,2})(?:\s+" + MONTH_PATTERN + r")?\s+по\s+(\d{1,2})\s+" + MONTH_PATTERN
+                      + r"(?:\s+(\d{4}))?", text)
+    if match:
+        first_day, first_month, last_day, last_month, year = match.groups()
+        last_month = _month(last_month)
+        first_month = _month(first_month) if first_month else last_month
+        until = _past_date(int(year) if year else None, last_month, int(last_day), now)
+        since = datetime(until.year - (first_month > last_month), first_month, int(first_day))
+        return _range(since, until)
+
+    # «с 01.10 по 15.10», «с 01.10.2025 по 15.10.2025»
+    match = re.search(r"\bс\s+(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?\s+по\s+(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?", text)
+    if match:
+        first_day, first_month, first_year, last_day, last_month, last_year = match.groups()
+        until = _past_date(int(last_year) if last_year else None, int(last_month), int(last_day), now)
+        if first_year:
+            since = _past_date(int(first_year), int(first_month), int(first_day), now)
+        else:
+            since = datetime(until.year - (int(first_month) > until.month), int(first_month), int(first_day))
+        return _range(since, until)
+
+    # «за последние 10 дней», «за 2 недели», «за последний месяц»
+    match = re.search(r"\b(?:за|в течение)\s+(?:(?:последн|прошедш)\w*\s+)?(\d+)?\s*" + UNIT_PATTERN, text)
+    if match:
+        count = int(match.group(1) or 1)
+        unit = next(days for prefix, days in UNIT_DAYS.items() if match.group(2).startswith(prefix))
+        days = count * unit
+        return now - timedelta(days=days), None, days_label(days)
+
+    if re.search(r"\bсегодня\b", text):
+        return today, None, "за сегодня"
+    if re.search(r"\bвчера\b", text):
+        return today - timedelta(days=1), today, "за вчера"
+
+    # «на этой неделе», «в прошлом месяце», «в этом году»
+    match = re.search(r"\b(эт\w*|текущ\w*|прошл\w*)\s+(недел|месяц|год)", text)
+    if match:
+        previous = match.group(1).startswith("прошл")
+        if match.group(2) == "недел":
+            start = today - timedelta(days=today.weekday())
+            since, until = (start - timedelta(days=7), start) if previous else (start, None)
+            label = "за прошлую неделю" if previous else "за эту неделю"
+        elif match.group(2) == "месяц":
+            start = today.replace(day=1)
+            if previous:
+                since, until = _month_range(start.year - (start.month == 1), (start.month - 2) % 12 + 1)
+            else:
+                since, until = start, None
+            label = _month_label(since)
+        else:
+            year = today.year - previous
+            since, until = datetime(year, 1, 1), (datetime(year + 1, 1, 1) if previous else None)
+            label = f"за {year} год"
+        return since, until, label
+
+    # «в сентябре», «за октябрь 2025»
+    match = re.search(r"\b" + MONTH_PATTERN + r"\w*(?:\s+(\d{4}))?", text)
+    if match:
+        month = _month(match.group(1))
+        year = int(match.group(2)) if match.group(2) else (now.year if month <= now.month else now.year - 1)
+        since, until = _month_range(year, month)
+        return since, until, _month_label(since)
+
+    # «в 2025 году»
+    match = re.search(r"\b(20\d{2})\s*(?:год|г\b)", text)
+    if match:
+        year = int(match.group(1))
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1), f"за {year} год"
+
+    # Единица периода без предлога: «отчет по физике, неделя»
+    for prefix, days in (("недел", 7), ("месяц", 30), ("квартал", 90), ("год", 365)):
+        if prefix in text:
+            return now - timedelta(days=days), None, days_label(days)
+
+    return now - timedelta(days=DEFAULT_DAYS), None, days_label(DEFAULT_DAYS)
+
+
+def parse_period(text: str, now: Optional[datetime] = None) -> Tuple[datetime, Optional[datetime], str]:
+    """(since, until, подпись для ответа); по умолчанию — последние DEFAULT_DAYS дней"""
+    now = now or datetime.now()
+    try:
+        return _parse_period(text, now)
+    except ValueError:
+        # Несуществующая дата («с 30 по 31 февраля») — период по умолчанию
+        return now - timedelta(days=DEFAULT_DAYS), None, days_label(DEFAULT_DAYS)
+
+
+def is_summary(text: str) -> bool:
+    """Нужна ли только сводка по счетчикам, а не список записей"""
+    text = text.lower()
+    return any(word in text for word in SUMMARY_WORDS)
+
+
+def parse_report_query(text: str, now: Optional[datetime] = None) -> Tuple[Optional[str], datetime, Optional[datetime], str]:
+    """(предмет или None, since, until, подпись периода)"""
+    since, until, label = parse_period(text, now)
+    return parse_subject(text), since, until, label
+
@@ -0,0 +1,247 @@
+"""Сводные счетчики истории для кратких отчетов и команды /stats.
+
+Для каждой пары (предмет, день) и (домен, предмет) хранится число ссылок и
+отправок. Ссылка учитывается в дне последней отправки, отправки — ее count,
+как в store.query и submissions. Повторная отправка при дедупликации
+переносит ссылку: счетчики прежней версии уменьшаются, новой — растут,
+поэтому пересборка по записям дает те же числа, что и накопление.
+
+Сводка за период читает O(дней) строк вместо всех записей; границы периода
+округляются до дня. SqliteStore ведет таблицы счетчиков в той же транзакции,
+что и записи. Для jsonl и columnar счетчики держит в памяти RollupStore:
+они собираются по истории при первом запросе и дальше дополняются при записи.
+
+Запуск из консоли:
+    python rollups.py rebuild                     # пересобрать таблицы счетчиков по записям
+    python rollups.py show --days 30              # сводка по предметам и доменам
+"""
+import argparse
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from link_index import DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF, dedup_key, first_submission, merge_submission
+from subject_registry import extract_url
+from url_normalizer import split_url
+
+DEFAULT_TOP_DOMAINS = 10
+
+# (ключ, ссылок, отправок): ключ — (предмет, день) или (домен, предмет)
+Changes = List[Tuple[Tuple[str, str], int, int]]
+
+
+def day_of(record: dict) -> str:
+    return (record.get("saved_at") or "")[:10]
+
+
+def domain_of(record: dict) -> str:
+    url = extract_url(record.get("link") or record.get("original_link") or "")
+    return split_url(url)[1] if url else ""
+
+
+def changes(previous: Optional[dict], record: dict) -> Tuple[Changes, Changes]:
+    """Изменения счетчиков (по дням, по доменам), когда версия previous заменяется на record"""
+    daily: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+    domains: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for sign, version in ((-1, previous), (1, record)):
+        if version is None:
+            continue
+        subject = version.get("subject") or ""
+        count = version.get("count", 1)
+        daily[subject, day_of(version)][0] += sign
+        daily[subject, day_of(version)][1] += sign * count
+        domain = domain_of(version)
+        if domain:
+            domains[domain, subject][0] += sign
+            domains[domain, subject][1] += sign * count
+    return ([(key, links, sent) for key, (links, sent) in daily.items() if links or sent],
+            [(key, links, sent) for key, (links, sent) in domains.items() if links or sent])
+
+
+def day_bounds(since: str = "", until: str = "") -> Tuple[str, str]:
+    """Границы периода в днях: [since_day, until_day), неполный последний день входит целиком"""
+    until_day = until[:10]
+    if until_day and until[10:].strip("T0:.") != "":
+        until_day = (date.fromisoformat(until_day) + timedelta(days=1)).isoformat()
+    return since[:10], until_day
+
+
+class Rollups:
+    """Счетчики в памяти с тем же интерфейсом чтения, что у таблиц SqliteStore"""
+
+    def __init__(self):
+        self.daily: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+        self.domains: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+
+    def apply(self, previous: Optional[dict], record: dict):
+        daily, domains = changes(previous, record)
+        for counters, items in ((self.daily, daily), (self.domains, domains)):
+            for key, links, sent in items:
+                counters[key][0] += links
+                counters[key][1] += sent
+
+    def build(self, records: Iterable[dict]) -> "Rollups":
+        for record in records:
+            self.apply(None, record)
+        return self
+
+    def days(self, subject: str, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        """(день, ссылок, отправок) по предмету; записи без даты входят в любой период, как в query"""
+        since_day, until_day = day_bounds(since, until)
+        rows = []
+        for (name, day), (links, sent) in self.daily.items():
+            in_period = not day or (since_day <= day and (not until_day or day < until_day))
+            if name == subject and links and in_period:
+                rows.append((day, links, sent))
+        return sorted(rows)
+
+    def summary(self, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        """(предмет, ссылок, отправок) за период, по убыванию числа ссылок"""
+        rows = []
+        for subject in {subject for subject, _ in self.daily}:
+            links, sent = totals(self.days(subject, since, until))
+            if links:
+                rows.append((subject, links, sent))
+        return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+    def top_domains(self, limit: int = DEFAULT_TOP_DOMAINS, subject: str = "") -> List[Tuple[str, int, int]]:
+        """(домен, ссылок, отправок) за все время, по убыванию числа ссылок"""
+        by_domain: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for (domain, name), (links, sent) in self.domains.items():
+            if not subject or name == subject:
+                by_domain[domain][0] += links
+                by_domain[domain][1] += sent
+        rows = sorted(((domain, links, sent) for domain, (links, sent) in by_domain.items() if links),
+                      key=lambda row: (-row[1], row[0]))
+        return rows[:limit]
+
+
+def totals(rows: List[Tuple[str, int, int]]) -> Tuple[int, int]:
+    """Сумма ссылок и отправок по строкам сводки"""
+    return sum(row[1] for row in rows), sum(row[2] for row in rows)
+
+
+def _brief(record: dict) -> dict:
+    # Для счетчиков и слияния версий достаточно этих полей, запись целиком в памяти не держим
+    return {"subject": record.get("subject"), "saved_at": record.get("saved_at"),
+            "count": record.get("count", 1), "link": record.get("link") or record.get("original_link")}
+
+
+class RollupStore:
+    """Хранилище без таблиц счетчиков (jsonl, columnar) со сводкой в памяти.
+
+    Остальные методы и атрибуты берутся у обернутого хранилища.
+    """
+
+    def __init__(self, store, dedup: str = DEDUP_OFF):
+        self.store = store
+        self.dedup = dedup
+        self.lock = threading.Lock()
+        self.rollups: Optional[Rollups] = None
+        self.latest: Dict[str, dict] = {}  # ключ ссылки → последняя версия, чтобы перенести ее счетчики
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def _build(self) -> Rollups:
+        rollups = Rollups()
+        latest = {}
+        for record in self.store.iter_records():
+            rollups.apply(None, record)
+            key = dedup_key(record, self.dedup)
+            if key is not None:
+                latest[key] = _brief(record)
+        self.rollups, self.latest = rollups, latest
+        return rollups
+
+    def rebuild_rollups(self) -> int:
+        with self.lock:
+            rollups = self._build()
+        return len(rollups.daily) + len(rollups.domains)
+
+    def _ready(self) -> Rollups:
+        with self.lock:
+            return self.rollups or self._build()
+
+    def append_many(self, records: Iterable[dict]) -> List[int]:
+        records = list(records)
+        with self.lock:
+            ids = self.store.append_many(records)
+            if self.rollups is None:
+                return ids  # счетчики еще не собраны: при сборке запись прочитается из истории
+            for record in records:
+                key = dedup_key(record, self.dedup)
+                previous = self.latest.get(key) if key is not None else None
+                version = _brief(merge_submission(previous, record) if previous else first_submission(record))
+                self.rollups.apply(previous, version)
+                if key is not None:
+                    self.latest[key] = version
+        return ids
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def days(self, subject: str, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        rollups = self._ready()
+        with self.lock:
+            return rollups.days(subject, since, until)
+
+    def summary(self, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        rollups = self._ready()
+        with self.lock:
+            return rollups.summary(since, until)
+
+    def top_domains(self, limit: int = DEFAULT_TOP_DOMAINS, subject: str = "") -> List[Tuple[str, int, int]]:
+        rollups = self._ready()
+        with self.lock:
+            return rollups.top_domains(limit, subject)
+
+
+def format_stats(store, subject: Optional[str] = None, since: str = "", until: str = "", period: str = "",
+                 limit: int = DEFAULT_TOP_DOMAINS) -> str:
+    """Текст сводки: по дням для предмета или по всем предметам, и самые частые домены"""
+    period = f" {period}" if period else ""
+    if subject:
+        rows = store.days(subject, since, until)
+        links, sent = totals(rows)
+        lines = [f"Сводка: {subject}{period} - {links} ссылок, {sent} отправок"]
+        lines += [f"• {day or 'без даты'}: {links} ссылок, {sent} отправок" for day, links, sent in rows]
+    else:
+        rows = store.summary(since, until)
+        links, sent = totals(rows)
+        lines = [f"Сводка{period}: {links} ссылок, {sent} отправок"]
+        lines += [f"• {name or 'без предмета'}: {links} ссылок, {sent} отправок" for name, links, sent in rows]
+    domains = store.top_domains(limit, subject or "")
+    if domains:
+        lines += ["", "Домены (за все время):"]
+        lines += [f"• {domain}: {links} ссылок, {sent} отправок" for domain, links, sent in domains]
+    return "\n".join(lines)
+
+
+def main():
+    from report_query import days_label
+    from storage import BACKENDS, DEFAULT_BACKEND, DEFAULT_DEDUP, open_store
+
+    parser = argparse.ArgumentParser(description="Сводные счетчики истории по дням и доменам")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND,
+                        help="хранилище истории (по умолчанию — как у бота)")
+    parser.add_argument("--dedup", choices=[DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF], default=DEFAULT_DEDUP,
+                        help="режим дедупликации хранилища: link, link_day или пустая строка")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="пересобрать счетчики по всем записям истории")
+    show = subparsers.add_parser("show", help="сводка по предметам и доменам")
+    show.add_argument("--subject", help="сводка по дням для одного предмета")
+    show.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    store = open_store(args.backend, dedup=args.dedup)
+    if args.command == "rebuild":
+        print(f"Пересобрано строк счетчиков: {store.rebuild_rollups()}")
+    else:
+        since = (datetime.now() - timedelta(days=args.days)).isoformat()
+        print(format_stats(store, args.subject, since, period=days_label(args.days)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Хранилище записей в SQLite.
+
+Предмет и время сохранения вынесены в отдельные колонки с индексом
+(subject, saved_at), поэтому отчет «физика за неделю» — это выборка по
+диапазону индекса, а не перебор всей истории. Запись целиком лежит в payload.
+
+С дедупликацией (dedup) у записи есть ключ ссылки link_key с уникальным
+индексом: повторная ссылка обновляет существующую строку (count, first_seen,
+last_seen), а фильтр Блума в памяти избавляет новые ссылки от поиска по ключу.
+
+Сводные счетчики (rollups.py) лежат в таблицах rollup_daily и rollup_domains
+и обновляются в той же транзакции, что и записи.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from jsonl_store import DEFAULT_PATH as JSONL_PATH, LEGACY_PATH, JsonlStore, migrate_json_array
+from link_index import DEDUP_OFF, DEFAULT_CAPACITY, BloomFilter, dedup_key, first_submission, merge_submission
+from rollups import DEFAULT_TOP_DOMAINS, Rollups, changes, day_bounds
+
+DEFAULT_PATH = "requests.sqlite"
+READ_CHUNK = 1000  # записей за один запрос при последовательном чтении
+PAGE_SIZE = 10
+
+
+class SqliteStore:
+    """Записи истории с индексом по предмету и дате"""
+
+    def __init__(self, path: str = DEFAULT_PATH, dedup: str = DEDUP_OFF):
+        self.path = path
+        self.dedup = dedup
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "subject TEXT NOT NULL DEFAULT '', "
+            "saved_at TEXT NOT NULL DEFAULT '', "
+            "payload TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_records_subject_saved_at ON records (subject, saved_at)"
+        )
+        # link_key: NULL — ключ еще не вычислен, '' — в записи нет ссылки
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(records)")]
+        if "link_key" not in columns:
+            self.conn.execute("ALTER TABLE records ADD COLUMN link_key TEXT")
+        self.conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_records_link_key ON records (link_key) WHERE link_key <> ''"
+        )
+        tables = {name for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollup_daily ("
+            "subject TEXT NOT NULL, day TEXT NOT NULL, "
+            "links INTEGER NOT NULL DEFAULT 0, submissions INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (subject, day)) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollup_domains ("
+            "domain TEXT NOT NULL, subject TEXT NOT NULL, "
+            "links INTEGER NOT NULL DEFAULT 0, submissions INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (domain, subject)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self._count: Optional[int] = None
+        self.bloom: Optional[BloomFilter] = None
+        self.bloom_negatives = 0
+        self.bloom_false_positives = 0
+        rebuild = "rollup_daily" not in tables  # база создана до появления счетчиков
+        if self.dedup:
+            rebuild |= self._backfill_keys() > 0
+            self._load_bloom()
+        if rebuild:
+            self.rebuild_rollups()
+
+    def _backfill_keys(self) -> int:
+        # Старые записи и записи, сохраненные без дедупликации, схлопываются по ссылке
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT id, payload FROM records WHERE link_key IS NULL ORDER BY id"
+            ).fetchall()
+            for row_id, payload in rows:
+                record = json.loads(payload)
+                key = dedup_key(record, self.dedup)
+                if key is None:
+                    self.conn.execute("UPDATE records SET link_key = '' WHERE id = ?", (row_id,))
+                    continue
+                existing = self.conn.execute(
+                    "SELECT id, payload FROM records WHERE link_key = ?", (key,)
+                ).fetchone()
+                if existing:
+                    self._update(existing[0], merge_submission(json.loads(existing[1]), record))
+                    self.conn.execute("DELETE FROM records WHERE id = ?", (row_id,))
+                else:
+                    record = first_submission(record)
+                    self.conn.execute(
+                        "UPDATE records SET link_key = ?, payload = ? WHERE id = ?",
+                        (key, json.dumps(record, ensure_ascii=False), row_id)
+                    )
+            self._count = None
+        return len(rows)
+
+    def _load_bloom(self):
+        keys = [key for (key,) in self.conn.execute("SELECT link_key FROM records WHERE link_key <> ''")]
+        self.bloom = BloomFilter(max(DEFAULT_CAPACITY, 2 * len(keys)))
+        for key in keys:
+            self.bloom.add(key)
+
+    def _update(self, row_id: int, record: dict):
+        self.conn.execute(
+            "UPDATE records SET subject = ?, saved_at = ?, payload = ? WHERE id = ?",
+            (record.get("subject") or "", record.get("saved_at") or "",
+             json.dumps(record, ensure_ascii=False), row_id)
+        )
+
+    def _apply_rollups(self, previous: Optional[dict], record: dict):
+        """Переносит счетчики с прежней версии записи на новую; вызывается внутри транзакции записи"""
+        daily, domains = changes(previous, record)
+        self.conn.executemany(
+            "INSERT INTO rollup_daily (subject, day, links, submissions) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (subject, day) DO UPDATE SET links = links + excluded.links, "
+            "submissions = submissions + excluded.submissions",
+            [(subject, day, links, sent) for (subject, day), links, sent in daily]
+        )
+        self.conn.executemany(
+            "INSERT INTO rollup_domains (domain, subject, links, submissions) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (domain, subject) DO UPDATE SET links = links + excluded.links, "
+            "submissions = submissions + excluded.submissions",
+            [(domain, subject, links, sent) for (domain, subject), links, sent in domains]
+        )
+
+    def _upsert(self, record: dict):
+        """Обновляет запись с той же ссылкой или вставляет новую; возвращает (id, новая ли)"""
+        key = dedup_key(record, self.dedup)
+        if key is not None:
+            existing = None
+            if key in self.bloom:
+                existing = self.conn.execute(
+                    "SELECT id, payload FROM records WHERE link_key = ?", (key,)
+                ).fetchone()
+                if existing is None:
+                    self.bloom_false_positives += 1
+            else:
+                self.bloom_negatives += 1
+            if existing:
+                previous = json.loads(existing[1])
+                merged = merge_submission(previous, record)
+                self._update(existing[0], merged)
+                self._apply_rollups(previous, merged)
+                return existing[0], False
+            record = first_submission(record)
+            if self.bloom.count >= self.bloom.capacity:
+                self._load_bloom()
+            self.bloom.add(key)
+        cursor = self.conn.execute(
+            "INSERT INTO records (subject, saved_at, payload, link_key) VALUES (?, ?, ?, ?)",
+            (record.get("subject") or "", record.get("saved_at") or "",
+             json.dumps(record, ensure_ascii=False), key or "")
+        )
+        self._apply_rollups(None, record)
+        return cursor.lastrowid, True
+
+    def append_many(self, records: Iterable[dict]) -> List[int]:
+        """Сохраняет записи одной транзакцией, возвращает их id.
+
+        При дедупликации повторная ссылка обновляет уже сохраненную запись.
+        """
+        ids = []
+        added = 0
+        with self.lock:
+            with self.conn:
+                for record in records:
+                    if self.dedup:
+                        row_id, is_new = self._upsert(record)
+                    else:
+                        row_id = self.conn.execute(
+                            "INSERT INTO records (subject, saved_at, payload) VALUES (?, ?, ?)",
+                            (record.get("subject") or "", record.get("saved_at") or "",
+                             json.dumps(record, ensure_ascii=False))
+                        ).lastrowid
+                        self._apply_rollups(None, record)
+                        is_new = True
+                    ids.append(row_id)
+                    added += is_new
+            if self._count is not None:
+                self._count += added
+        return ids
+
+    def append(self, record: dict) -> int:
+        """Сохраняет одну запись, возвращает ее id"""
+        return self.append_many([record])[0]
+
+    def iter_records(self) -> Iterator[dict]:
+        """Лениво читает записи в порядке сохранения, порциями по READ_CHUNK"""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, payload FROM records WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, READ_CHUNK)
+                ).fetchall()
+            if not rows:
+                return
+            for last_id, payload in rows:
+                yield json.loads(payload)
+
+    def count(self) -> int:
+        """Количество записей; COUNT(*) выполняется один раз, дальше счетчик ведется при записи"""
+        with self.lock:
+            if self._count is None:
+                self._count = self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+            return self._count
+
+    def query(self, subject: str, since: str = "", until: str = "") -> List[dict]:
+        """Записи по предмету за период [since, until) по индексу.
+
+        Границы — строки ISO 8601, как в saved_at. Записи без saved_at
+        попадают в выборку, как и в filter_data.
+        """
+        range_sql = "SELECT payload FROM records WHERE subject = ? AND saved_at >= ?"
+        params = [subject, since]
+        if until:
+            range_sql += " AND saved_at < ?"
+            params.append(until)
+        if since:
+            # Отдельная ветка для записей без даты, чтобы обе части шли по индексу
+            sql = "SELECT payload FROM records WHERE subject = ? AND saved_at = '' UNION ALL " + range_sql
+            params = [subject] + params
+        else:
+            sql = range_sql + " ORDER BY saved_at"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def query_page(self, subject: str, since: str = "", until: str = "", after: Optional[list] = None,
+                   limit: int = PAGE_SIZE) -> Tuple[List[dict], Optional[list]]:
+        """Страница записей query по курсору: (записи, курсор следующей страницы или None).
+
+        Порядок — (saved_at, id), курсор — пара последней строки страницы, поэтому
+        каждая страница — одна выборка по индексу без OFFSET. Записи без даты идут первыми.
+        """
+        after_at, after_id = after or ("", 0)
+        rows = []
+        with self.lock:
+            if not after_at:
+                rows = self.conn.execute(
+                    "SELECT saved_at, id, payload FROM records WHERE subject = ? AND saved_at = '' AND id > ? "
+                    "ORDER BY id LIMIT ?", (subject, after_id, limit + 1)
+                ).fetchall()
+                after_at, after_id = since, 0
+            if len(rows) <= limit:
+                # Курсор не раньше начала периода, чтобы не просматривать старые строки индекса
+                if after_at < since:
+                    after_at, after_id = since, 0
+                sql = ("SELECT saved_at, id, payload FROM records WHERE subject = ? AND saved_at <> '' "
+                       "AND (saved_at, id) > (?, ?)")
+                params = [subject, after_at, after_id]
+                if until:
+                    sql += " AND saved_at < ?"
+                    params.append(until)
+                rows += self.conn.execute(sql + " ORDER BY saved_at, id LIMIT ?",
+                                          params + [limit + 1 - len(rows)]).fetchall()
+        cursor = [rows[limit - 1][0], rows[limit - 1][1]] if len(rows) > limit else None
+        return [json.loads(payload) for _, _, payload in rows[:limit]], cursor
+
+    def rebuild_rollups(self) -> int:
+        """Пересобирает таблицы счетчиков по всем записям, возвращает число строк счетчиков"""
+        with self.lock:
+            rollups = Rollups()
+            last_id = 0
+            while True:
+                rows = self.conn.execute(
+                    "SELECT id, payload FROM records WHERE id > ? ORDER BY id LIMIT ?", (last_id, READ_CHUNK)
+                ).fetchall()
+                if not rows:
+                    break
+                for last_id, payload in rows:
+                    rollups.apply(None, json.loads(payload))
+            with self.conn:
+                self.conn.execute("DELETE FROM rollup_daily")
+                self.conn.execute("DELETE FROM rollup_domains")
+                self.conn.executemany(
+                    "INSERT INTO rollup_daily (subject, day, links, submissions) VALUES (?, ?, ?, ?)",
+                    [(subject, day, links, sent) for (subject, day), (links, sent) in rollups.daily.items()]
+                )
+                self.conn.executemany(
+                    "INSERT INTO rollup_domains (domain, subject, links, submissions) VALUES (?, ?, ?, ?)",
+                    [(domain, subject, links, sent) for (domain, subject), (links, sent) in rollups.domains.items()]
+                )
+        return len(rollups.daily) + len(rollups.domains)
+
+    def days(self, subject: str, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        """(день, ссылок, отправок) по предмету из счетчиков; записи без даты входят в любой период"""
+        since_day, until_day = day_bounds(since, until)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT day, links, submissions FROM rollup_daily "
+                "WHERE subject = ? AND links > 0 AND (day = '' OR (day >= ? AND (? = '' OR day < ?))) "
+                "ORDER BY day",
+                (subject, since_day, until_day, until_day)
+            ).fetchall()
+
+    def summary(self, since: str = "", until: str = "") -> List[Tuple[str, int, int]]:
+        """(предмет, ссылок, отправок) за период из счетчиков, по убыванию числа ссылок"""
+        since_day, until_day = day_bounds(since, until)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT subject, SUM(links), SUM(submissions) FROM rollup_daily "
+                "WHERE day = '' OR (day >= ? AND (? = '' OR day < ?)) "
+                "GROUP BY subject HAVING SUM(links) > 0 ORDER BY 2 DESC, 1",
+                (since_day, until_day, until_day)
+            ).fetchall()
+
+    def top_domains(self, limit: int = DEFAULT_TOP_DOMAINS, subject: str = "") -> List[Tuple[str, int, int]]:
+        """(домен, ссылок, отправок) за все время, по убыванию числа ссылок"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT domain, SUM(links), SUM(submissions) FROM rollup_domains "
+                "WHERE ? = '' OR subject = ? "
+                "GROUP BY domain HAVING SUM(links) > 0 ORDER BY 2 DESC, 1 LIMIT ?",
+                (subject, subject, limit)
+            ).fetchall()
+
+
+def open_store(path: str = DEFAULT_PATH, jsonl_path: str = JSONL_PATH,
+               legacy_path: str = LEGACY_PATH, dedup: str = DEDUP_OFF) -> SqliteStore:
+    """Открывает базу; новая база заполняется из requests.jsonl или старого requests.json"""
+    is_new = not os.path.exists(path)
+    store = SqliteStore(path, dedup=dedup)
+    if not is_new:
+        return store
+
+    if os.path.exists(jsonl_path):
+        store.append_many(JsonlStore(jsonl_path).iter_records())
+        os.replace(jsonl_path, jsonl_path + ".bak")
+    elif os.path.exists(legacy_path):
+        # Переносим через журнал, чтобы переиспользовать разбор старого формата
+        migrate_json_array(legacy_path, JsonlStore(jsonl_path))
+        store.append_many(JsonlStore(jsonl_path).iter_records())
+        os.replace(jsonl_path, jsonl_path + ".bak")
+    return store
@@ -0,0 +1,65 @@
+"""Выбор хранилища истории запросов.
+
+Все хранилища дают одинаковый интерфейс: append, append_many, iter_records,
+count и query(subject, since, until), а также сводку из счетчиков (days,
+summary, top_domains, rebuild_rollups), поэтому инструменты агента не зависят
+от того, где лежат данные.
+
+Хранилище "partitioned" разбито по чатам и месяцам: chat_history(store, chat_id)
+дает историю чата (его каталог и общую историю common) с тем же интерфейсом.
+
+DEFAULT_BACKEND и DEFAULT_DEDUP — настройки бота project02_task02.py; консольные
+команды (обучение моделей, пересборка счетчиков) по умолчанию читают то же хранилище.
+"""
+import jsonl_store
+import sqlite_store
+from link_index import DEDUP_LINK, DEDUP_OFF
+from rollups import RollupStore
+
+
+def open_columnar_store(dedup: str = DEDUP_OFF):
+    # NumPy нужен только колоночному хранилищу, поэтому импорт отложенный.
+    # Колонки хранят каждую отправку для аналитики, дедупликации в них нет.
+    import columnar_store
+    return RollupStore(columnar_store.open_store())
+
+
+def open_partitioned_store(dedup: str = DEDUP_OFF):
+    # Сводку по периоду хранилище считает само по сегментам периода, счетчики в памяти не нужны
+    import partitioned_store
+    return partitioned_store.open_store(dedup=dedup)
+
+
+def open_jsonl_store(dedup: str = DEDUP_OFF):
+    # У журнала нет таблиц для счетчиков, сводка ведется в памяти
+    return RollupStore(jsonl_store.open_store(dedup=dedup), dedup)
+
+
+DEFAULT_BACKEND = "partitioned"
+DEFAULT_DEDUP = DEDUP_LINK
+
+BACKENDS = {
+    "jsonl": open_jsonl_store,
+    "sqlite": sqlite_store.open_store,
+    "columnar": open_columnar_store,
+    "partitioned": open_partitioned_store,
+}
+
+
+def open_store(backend: str = DEFAULT_BACKEND, dedup: str = DEFAULT_DEDUP):
+    """Открывает хранилище по имени: "jsonl", "sqlite", "columnar" или "partitioned".
+
+    dedup: "link" — одна запись на ссылку, "link_day" — на ссылку в день, "" — без дедупликации.
+    """
+    try:
+        opener = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Неизвестное хранилище: {backend}. Доступны: {', '.join(BACKENDS)}")
+    return opener(dedup=dedup)
+
+
+def chat_history(store, chat_id=None):
+    """История чата, если хранилище разбито по чатам, иначе все хранилище"""
+    if chat_id is None or not hasattr(store, "view"):
+        return store
+    return store.view(chat_id)
@@ -0,0 +1,97 @@
+"""Реестр предопределенных ссылок по предметам.
+
+Ссылки из промптов загружаются в словарь по каноническому URL (url_normalizer),
+поэтому известная ссылка классифицируется без обращения к GigaChat.
+"""
+import re
+from typing import Dict, List, Optional
+
+from url_normalizer import url_key
+
+SUBJECTS = ["Численные методы", "Компьютерные сети", "Программирование на python", "Физика"]
+OTHER_SUBJECT = "Другой предмет"
+
+# Тот же список, что и в промптах классификаторов
+PREDEFINED_LINKS: Dict[str, List[str]] = {
+    "Численные методы": [
+        "https://books.altspu.ru/document/65",
+        "https://openedu.ru/course/spbstu/NUMMETH/",
+        "http://wiki.cs.hse.ru/%D0%A7%D0%B8%D1%81%D0%BB%D0%B5%D0%BD%D0%BD%D1%8B%D0%B5_%D0%9C%D0%B5%D1%82%D0%BE%D0%B4%D1%8B_2021",
+        "https://www.hse.ru/edu/courses/339562855",
+        "https://teach-in.ru/course/numerical-methods-part-1",
+        "https://www.matburo.ru/st_subject.php?p=dr&rut=d992e77c9b77270bef82d706c585bfda4bdda23e35a9fb73a75809a9bc7c9608",
+    ],
+    "Компьютерные сети": [
+        "https://proglib.io/p/network-books",
+        "https://asozykin.ru/courses/networks_online",
+        "https://sites.google.com/view/malikov-m-v/%D1%81%D1%82%D1%83%D0%B4%D0%B5%D0%BD%D1%82%D0%B0%D0%BC/3-%D0%BA%D1%83%D1%80%D1%81/%D0%BA%D0%BE%D0%BC%D0%BF%D1%8C%D1%8E%D1%82%D0%B5%D1%80%D0%BD%D1%8B%D0%B5-%D1%81%D0%B5%D1%82%D0%B8",
+        "https://www.journal-altspu.ru/document/129",
+        "https://ru.hexlet.io/blog/posts/kompyuternaya-set-chto-eto-takoe-osnovnye-printsipy",
+        "https://gb.ru/courses/3731",
+    ],
+    "Программирование на python": [
+        "https://www.knorus.ru/catalog/informatika/698633-programmnaya-inzheneriya-bakalavriat-magistratura-uchebnik/",
+        "https://stepik.org/course/67/promo",
+        "https://ru.pythontutor.ru/problem/old/1",
+        "https://selectel.ru/blog/courses/course-python/",
+        "https://devpractice.ru/python/",
+    ],
+    "Физика": [
+        "https://madi.ru/438-kafedra-fizika-uchebnye-posobiya-po-lekcionnomu-kursu.html",
+        "https://znanierussia.ru/articles/%D0%9A%D0%BB%D0%B0%D1%81%D1%81%D0%B8%D1%87%D0%B5%D1%81%D0%BA%D0%B0%D1%8F_%D0%BC%D0%B5%D1%85%D0%B0%D0%BD%D0%B8%D0%BA%D0%B0",
+        "https://bigenc.ru/l/nachala-termodinamiki-7415b1",
+        "https://naked-science.ru/tags/elektrodinamika",
+        "https://nonfiction.ru/stream/kvantovaya-fizika-za-5-minut-glavnyie-voprosyi-i-idei",
+    ],
+}
+
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+SUBJECT_NAMES = {subject.casefold(): subject for subject in SUBJECTS + [OTHER_SUBJECT]}
+
+
+def extract_url(text: str) -> Optional[str]:
+    """Возвращает первую ссылку из текста или None"""
+    match = URL_PATTERN.search(text)
+    if not match:
+        return None
+    return match.group().rstrip('.,;:!?)"\'')
+
+
+def normalize_subject(text: str) -> Optional[str]:
+    """Предмет из ответа модели в точном написании или None, если это не предмет из списка.
+
+    Прощаются лишние пробелы, кавычки, точка в конце, номер из промпта («3. Физика») и регистр.
+    """
+    cleaned = re.sub(r"^\s*\d+[.)]\s*", "", text or "").strip().strip('"«»\'.').strip()
+    return SUBJECT_NAMES.get(" ".join(cleaned.split()).casefold())
+
+
+class SubjectRegistry:
+    """Хеш-индекс предопределенных ссылок со счетчиками попаданий"""
+
+    def __init__(self, links: Dict[str, List[str]] = PREDEFINED_LINKS):
+        self.index: Dict[str, str] = {}
+        for subject, urls in links.items():
+            for url in urls:
+                self.index[url_key(url)] = subject
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Возвращает предмет для ссылки из текста, если она есть в списке"""
+        url = extract_url(text) or text
+        subject = self.index.get(url_key(url)) if url else None
+        if subject:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return subject
+
+    def stats(self) -> dict:
+        """Счетчики попаданий: промахи — это запросы, ушедшие в LLM"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
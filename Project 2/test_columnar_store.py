@@ -0,0 +1,67 @@
+"""Проверки columnar_store: запись, чтение и восстановление после прерванной записи.
+
+Запуск:
+    python -m pytest -q test_columnar_store.py
+"""
+import os
+
+from columnar_store import ColumnarStore
+
+
+def record(link: str, subject: str = "Физика", saved_at: str = "2025-10-01T12:00:00") -> dict:
+    return {"date": saved_at[:10], "subject": subject, "original_link": link, "saved_at": saved_at}
+
+
+def links(store: ColumnarStore):
+    return [item["original_link"] for item in store.iter_records()]
+
+
+def crash_after(directory: str, names, saved_at_tail: bytes = b""):
+    """Имитирует сбой: строка дописана в колонки names, в saved_at — только часть значения"""
+    tails = {"links.bin": b"http://bbbb", "link_ends.i8": (10 ** 6).to_bytes(8, "little"), "subject.u1": b"\x00"}
+    for name in names:
+        with open(os.path.join(directory, name), "ab") as file:
+            file.write(tails[name])
+    if saved_at_tail:
+        with open(os.path.join(directory, "saved_at.i8"), "ab") as file:
+            file.write(saved_at_tail)
+
+
+def test_append_and_read(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    assert store.append_many([record("http://a"), record("http://bb", "Численные методы")]) == [0, 1]
+    assert store.count() == 2
+    assert links(store) == ["http://a", "http://bb"]
+    assert [item["original_link"] for item in store.query("Численные методы")] == ["http://bb"]
+
+
+def test_reopen_after_partial_row(tmp_path):
+    directory = str(tmp_path)
+    ColumnarStore(directory).append_many([record("http://a"), record("http://bb")])
+    crash_after(directory, ["links.bin", "link_ends.i8", "subject.u1"], saved_at_tail=b"\x01\x02\x03")
+
+    store = ColumnarStore(directory)  # неполный saved_at не мешает открыть хранилище
+    assert store.count() == 2
+    store.append(record("http://c"))
+    assert links(store) == ["http://a", "http://bb", "http://c"]
+    assert os.path.getsize(os.path.join(directory, "links.bin")) == len("http://ahttp://bbhttp://c")
+
+
+def test_append_after_partial_row_in_open_store(tmp_path):
+    directory = str(tmp_path)
+    store = ColumnarStore(directory)
+    store.append_many([record("http://a"), record("http://bb")])
+    crash_after(directory, ["links.bin", "link_ends.i8", "subject.u1"])  # сбой в другом процессе
+    store.append(record("http://c"))
+    assert links(store) == ["http://a", "http://bb", "http://c"]
+    assert links(ColumnarStore(directory)) == ["http://a", "http://bb", "http://c"]
+
+
+def test_partial_first_row(tmp_path):
+    directory = str(tmp_path)
+    ColumnarStore(directory)
+    crash_after(directory, ["links.bin", "link_ends.i8"])
+    store = ColumnarStore(directory)
+    assert store.count() == 0
+    store.append(record("http://c"))
+    assert links(store) == ["http://c"]
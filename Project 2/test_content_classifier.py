@@ -0,0 +1,87 @@
+"""Проверки content_classifier без сети и GigaChat: обучение на сохраненных страницах из fixtures/.
+
+Страницы *_train*.html размечены по префиксу имени и идут в обучение вместе с
+предопределенными ссылками, *_test.html проверяются. Ссылки страниц нейтральные
+(example.org/page/N), поэтому предмет определяется по содержимому, а не по словам ссылки.
+
+Запуск:
+    python -m pytest -q test_content_classifier.py
+"""
+import os
+
+import pytest
+
+import page_text
+from content_classifier import CLASSES, ContentClassifier, training_set
+from subject_registry import OTHER_SUBJECT
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_SUBJECTS = {
+    "numerical": "Численные методы",
+    "networks": "Компьютерные сети",
+    "python": "Программирование на python",
+    "physics": "Физика",
+    "other": OTHER_SUBJECT,
+}
+
+
+def fixture_pages():
+    """[(имя файла, ссылка, предмет)] в порядке имен"""
+    names = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith(".html"))
+    return [(name, f"https://example.org/page/{number}", FIXTURE_SUBJECTS[name.split("_")[0]])
+            for number, name in enumerate(names, 1)]
+
+
+@pytest.fixture(scope="module")
+def pages_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("pages"))
+    for name, url, _ in fixture_pages():
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+            page_text.save_page(url, file.read(), directory)
+    return directory
+
+
+@pytest.fixture(scope="module")
+def model(pages_dir):
+    records = [{"link": url, "subject": subject} for name, url, subject in fixture_pages() if "_train" in name]
+    documents, labels = training_set(records, pages_dir)
+    return ContentClassifier().fit(documents, labels)
+
+
+def test_fixture_text_extracted(pages_dir):
+    name, url, _ = fixture_pages()[0]
+    title, text = page_text.extract_page(page_text.load_page(url, pages_dir))
+    assert title and title in text  # meta description попадает в начало текста
+    assert "counter" not in text  # скрипты пропускаются
+
+
+@pytest.mark.parametrize("name, url, subject", [page for page in fixture_pages() if "_test" in page[0]])
+def test_predicts_subject_from_page(model, pages_dir, name, url, subject):
+    predicted, probability = model.classify_url(url, pages_dir)
+    assert predicted == subject
+    assert probability > 1 / len(CLASSES)
+
+
+def test_confident_fires_on_clear_page(model, pages_dir):
+    _, url, subject = next(page for page in fixture_pages() if page[0] == "python_test.html")
+    fired = model.fired
+    assert model.confident(f"Посмотри {url}", confidence=0.5, pages_dir=pages_dir) == subject
+    assert model.fired == fired + 1
+
+
+def test_confident_falls_back_below_threshold(model, pages_dir):
+    # Страницы нет, слов ссылки в обучении не было: модель не уверена, решает GigaChat
+    abstained = model.abstained
+    assert model.confident("https://unknown.test/qwerty", pages_dir=pages_dir) is None
+    assert model.abstained == abstained + 1
+    assert model.confident("сообщение без ссылки", pages_dir=pages_dir) is None
+
+
+def test_save_and_load(model, pages_dir, tmp_path):
+    path = str(tmp_path / "content_model.npz")
+    model.save(path)
+    loaded = ContentClassifier.load(path)
+    assert loaded.trained_on == model.trained_on
+    for _, url, _ in fixture_pages():
+        assert loaded.classify_url(url, pages_dir)[0] == model.classify_url(url, pages_dir)[0]
+    assert ContentClassifier.load(str(tmp_path / "missing.npz")) is None
@@ -0,0 +1,189 @@
+"""Проверки дедупликации ссылок: фильтр Блума, LinkIndex и режимы link/link_day
+в sqlite_store и jsonl_store на временных файлах.
+
+Запуск:
+    python -m pytest -q test_link_index.py
+"""
+import pytest
+
+from jsonl_store import JsonlStore
+from link_index import (DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF, BloomFilter, LinkIndex, dedup_key,
+                        first_submission, merge_submission, submissions)
+from sqlite_store import SqliteStore
+
+PHYSICS = "Физика"
+PYTHON = "Программирование на python"
+
+
+def record(link: str, saved_at: str, subject: str = PHYSICS) -> dict:
+    return {"original_link": f"Посмотри {link}", "link": link, "subject": subject,
+            "date": saved_at[:10], "saved_at": saved_at}
+
+
+def test_bloom_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"example.com/page/{number}" for number in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"example.org/other/{number}" in bloom for number in range(10000))
+    assert false_positives < 300  # при заданных 1% — с запасом
+
+
+def test_link_index_counts_bloom_answers():
+    index = LinkIndex(capacity=100)
+    index.put("a.ru/1", 10)
+    index.put("a.ru/1", 20)  # новая версия записи
+    assert index.get("a.ru/1") == 20
+    assert index.get("b.ru/2") is None
+    assert len(index) == 1
+    stats = index.stats()
+    assert stats["keys"] == 1
+    assert stats["bloom_negatives"] + stats["bloom_false_positives"] == 1
+
+
+def test_link_index_grows_past_capacity():
+    index = LinkIndex(capacity=8)
+    for number in range(100):
+        index.put(f"a.ru/{number}", number)
+    assert index.bloom.capacity >= 100
+    assert all(index.get(f"a.ru/{number}") == number for number in range(100))
+    assert index.stats()["bloom_negatives"] == 0
+
+
+def test_dedup_key():
+    first = record("https://www.stepik.org/course/67/?utm_source=tg", "2026-10-01T10:00:00")
+    second = record("http://stepik.org/course/67", "2026-10-02T09:00:00")
+    assert dedup_key(first, DEDUP_OFF) is None
+    assert dedup_key(first, DEDUP_LINK) == dedup_key(second, DEDUP_LINK) == "stepik.org/course/67"
+    assert dedup_key(first, DEDUP_LINK_DAY) == "stepik.org/course/67|2026-10-01"
+    assert dedup_key(first, DEDUP_LINK_DAY) != dedup_key(second, DEDUP_LINK_DAY)
+    assert dedup_key({"original_link": "без ссылки", "subject": PHYSICS}, DEDUP_LINK) is None
+
+
+def test_merge_submission():
+    first = first_submission(record("https://a.ru/1", "2026-10-02T10:00:00"))
+    assert (first["count"], first["first_seen"], first["last_seen"]) == (1, "2026-10-02T10:00:00", "2026-10-02T10:00:00")
+    # Повтор пришел с более ранним временем (например, из другой очереди)
+    merged = merge_submission(first, record("https://a.ru/1", "2026-10-01T08:00:00", PYTHON))
+    assert merged["count"] == 2
+    assert merged["subject"] == PYTHON  # предмет — из новой записи
+    assert merged["first_seen"] == "2026-10-01T08:00:00"
+    assert merged["last_seen"] == "2026-10-02T10:00:00"
+    assert merged["saved_at"] == "2026-10-02T10:00:00"
+    assert submissions([merged, first]) == 3
+
+
+def open_jsonl(tmp_path, dedup):
+    return JsonlStore(str(tmp_path / "requests.jsonl"), fsync=False, dedup=dedup)
+
+
+def open_sqlite(tmp_path, dedup):
+    return SqliteStore(str(tmp_path / "requests.sqlite"), dedup=dedup)
+
+
+STORES = {"jsonl": open_jsonl, "sqlite": open_sqlite}
+
+
+@pytest.fixture(params=list(STORES))
+def opener(request, tmp_path):
+    opened = []
+
+    def open_store(dedup):
+        store = STORES[request.param](tmp_path, dedup)
+        opened.append(store)
+        return store
+
+    yield open_store
+    for store in opened:
+        if hasattr(store, "conn"):
+            store.conn.close()
+
+
+def test_link_dedup(opener):
+    store = opener(DEDUP_LINK)
+    store.append_many([
+        record("https://www.a.ru/1/", "2026-10-01T10:00:00"),
+        record("https://b.ru/2", "2026-10-01T11:00:00", PYTHON),
+        record("http://a.ru/1?utm_source=tg", "2026-10-03T12:00:00"),  # та же ссылка в одной пачке
+    ])
+    store.append(record("https://a.ru/1#top", "2026-10-05T09:00:00"))
+    records = {dedup_key(item, DEDUP_LINK): item for item in store.iter_records()}
+    assert store.count() == len(records) == 2
+    again = records["a.ru/1"]
+    assert again["count"] == 3
+    assert again["first_seen"] == "2026-10-01T10:00:00"
+    assert again["last_seen"] == again["saved_at"] == "2026-10-05T09:00:00"
+    assert records["b.ru/2"]["count"] == 1
+    assert [item["count"] for item in store.query(PHYSICS)] == [3]
+
+
+def test_link_dedup_survives_reopen(opener):
+    opener(DEDUP_LINK).append(record("https://a.ru/1", "2026-10-01T10:00:00"))
+    store = opener(DEDUP_LINK)  # индекс строится заново из файла или базы
+    store.append(record("https://a.ru/1", "2026-10-02T10:00:00"))
+    assert store.count() == 1
+    assert [item["count"] for item in store.iter_records()] == [2]
+
+
+def test_link_day_dedup(opener):
+    store = opener(DEDUP_LINK_DAY)
+    store.append_many([
+        record("https://a.ru/1", "2026-10-01T10:00:00"),
+        record("https://a.ru/1", "2026-10-01T18:00:00"),
+        record("https://a.ru/1", "2026-10-02T09:00:00"),
+    ])
+    days = sorted((item["date"], item["count"]) for item in store.iter_records())
+    assert days == [("2026-10-01", 2), ("2026-10-02", 1)]
+    assert store.count() == 2
+
+
+def test_records_without_link_are_kept(opener):
+    store = opener(DEDUP_LINK)
+    for _ in range(2):
+        store.append({"original_link": "просто вопрос", "subject": PHYSICS, "saved_at": "2026-10-01T10:00:00"})
+    assert store.count() == 2
+    assert all("count" not in item for item in store.iter_records())
+
+
+def test_dedup_off_keeps_repeats(opener):
+    store = opener(DEDUP_OFF)
+    store.append_many([record("https://a.ru/1", "2026-10-01T10:00:00")] * 2)
+    assert store.count() == 2
+
+
+def test_jsonl_compact_drops_old_versions(tmp_path):
+    store = open_jsonl(tmp_path, DEDUP_LINK)
+    for day in range(1, 4):
+        store.append(record("https://a.ru/1", f"2026-10-0{day}T10:00:00"))
+    with open(store.path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 3  # версии дописываются
+    assert store.compact() == 1
+    with open(store.path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 1
+    store.append(record("https://a.ru/1", "2026-10-04T10:00:00"))
+    assert [item["count"] for item in store.iter_records()] == [4]
+
+
+def test_jsonl_new_links_skip_lookup(tmp_path):
+    store = open_jsonl(tmp_path, DEDUP_LINK)
+    store.append_many(record(f"https://a.ru/{number}", "2026-10-01T10:00:00") for number in range(50))
+    assert store.index.stats()["bloom_negatives"] + store.index.stats()["bloom_false_positives"] == 50
+    assert store.index.stats()["bloom_false_positives"] <= 2
+
+
+def test_sqlite_backfills_records_saved_without_dedup(tmp_path):
+    plain = open_sqlite(tmp_path, DEDUP_OFF)
+    plain.append_many([record("https://a.ru/1", "2026-10-01T10:00:00"),
+                       record("https://www.a.ru/1/", "2026-10-02T10:00:00"),
+                       record("https://b.ru/2", "2026-10-02T11:00:00")])
+    plain.conn.close()
+    store = open_sqlite(tmp_path, DEDUP_LINK)
+    try:
+        assert store.count() == 2
+        counts = sorted(item["count"] for item in store.iter_records())
+        assert counts == [1, 2]
+        store.append(record("https://b.ru/2", "2026-10-03T10:00:00"))
+        assert sorted(item["count"] for item in store.iter_records()) == [2, 2]
+    finally:
+        store.conn.close()
@@ -0,0 +1,162 @@
+"""Проверки page_fetcher на локальном http.server: пул соединений, 304, gzip, перенаправления и защита от SSRF.
+
+Сервер слушает 127.0.0.1, поэтому загрузчик в проверках создается с
+allow_private=True; без него тот же адрес должен блокироваться.
+
+Запуск:
+    python -m pytest -q test_page_fetcher.py
+"""
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import page_fetcher
+from page_fetcher import BlockedAddress, PageFetcher, check_address, public_addresses
+
+PAGE = "<html><head><title>Python</title></head><body><p>Списки и словари</p></body></html>".encode("utf-8")
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, иначе пулу нечего переиспользовать
+    seen = []  # (путь, заголовки) всех запросов
+
+    def do_GET(self):
+        Handler.seen.append((self.path, dict(self.headers)))
+        if self.path.startswith("/page"):
+            if self.headers.get("If-None-Match") == ETAG:
+                return self.reply(304, b"")
+            return self.reply(200, PAGE, ETag=ETAG)
+        if self.path == "/gzip":
+            if "gzip" not in self.headers.get("Accept-Encoding", ""):
+                return self.reply(200, PAGE)
+            return self.reply(200, gzip.compress(PAGE), **{"Content-Encoding": "gzip"})
+        if self.path == "/redirect":
+            return self.reply(302, b"", Location="/page/target")
+        if self.path == "/metadata":
+            return self.reply(302, b"", Location="http://169.254.169.254/latest/meta-data/")
+        if self.path == "/loop":
+            return self.reply(302, b"", Location="/loop")
+        self.reply(404, b"")
+
+    def reply(self, status: int, body: bytes, **headers):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    Handler.seen.clear()
+    fetcher = PageFetcher(str(tmp_path / "pages"), allow_private=True)
+    yield fetcher
+    fetcher.close()
+
+
+def test_connection_reused(server, fetcher):
+    for number in range(3):
+        assert fetcher.fetch(f"{server}/page/{number}") == PAGE
+    stats = fetcher.stats()
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 2
+
+
+def test_fresh_page_from_cache(server, fetcher):
+    fetcher.fetch(f"{server}/page/fresh")
+    assert fetcher.fetch(f"{server}/page/fresh") == PAGE
+    assert fetcher.stats()["cache_hits"] == 1
+    assert len(Handler.seen) == 1
+
+
+def test_stale_page_revalidated(server, fetcher):
+    fetcher.fresh_ttl = 0
+    fetcher.fetch(f"{server}/page/stale")
+    assert fetcher.fetch(f"{server}/page/stale") == PAGE
+    assert Handler.seen[-1][1].get("If-None-Match") == ETAG
+    assert fetcher.stats()["not_modified"] == 1
+    assert fetcher.stats()["downloads"] == 1
+
+
+def test_gzip_body_decompressed(server, fetcher):
+    assert fetcher.fetch(f"{server}/gzip") == PAGE
+    assert "gzip" in Handler.seen[-1][1].get("Accept-Encoding", "")
+    assert fetcher.cache.get(f"{server}/gzip")[0] == PAGE  # в кеше распакованная страница
+
+
+def test_redirect_followed(server, fetcher):
+    assert fetcher.fetch(f"{server}/redirect") == PAGE
+    assert [path for path, _ in Handler.seen] == ["/redirect", "/page/target"]
+    assert fetcher.cache.get(f"{server}/redirect")[0] == PAGE  # страница сохранена под исходной ссылкой
+
+
+def test_redirect_loop_stops(server, fetcher):
+    assert fetcher.fetch(f"{server}/loop") is None
+    assert len(Handler.seen) == 4  # MAX_REDIRECTS + 1
+    assert fetcher.stats()["errors"] == 1
+
+
+def test_private_address_blocked(server, tmp_path):
+    Handler.seen.clear()
+    fetcher = PageFetcher(str(tmp_path / "pages"))
+    assert fetcher.fetch(f"{server}/page/private") is None
+    assert fetcher.fetch("http://localhost/") is None
+    assert fetcher.stats()["blocked"] == 2
+    assert Handler.seen == []  # до сервера запрос не дошел
+
+
+def test_redirect_to_private_blocked(server, tmp_path, monkeypatch):
+    # Проверка адресов включена, но сам локальный сервер считается публичным
+    original = page_fetcher.check_address
+    monkeypatch.setattr(page_fetcher, "check_address", lambda address: address == "127.0.0.1" or original(address))
+    Handler.seen.clear()
+    fetcher = PageFetcher(str(tmp_path / "pages"))
+    assert fetcher.fetch(f"{server}/page/public") == PAGE  # подключение через проверенный адрес
+    assert fetcher.fetch(f"{server}/metadata") is None
+    assert fetcher.stats()["blocked"] == 1
+    assert [path for path, _ in Handler.seen] == ["/page/public", "/metadata"]
+
+
+@pytest.mark.parametrize("url", ["ftp://example.com/file", "file:///etc/passwd", "gopher://example.com/"])
+def test_other_schemes_blocked(tmp_path, url):
+    fetcher = PageFetcher(str(tmp_path / "pages"))
+    assert fetcher.fetch(url) is None
+    assert fetcher.stats()["blocked"] == 1
+
+
+@pytest.mark.parametrize("address", [
+    "127.0.0.1", "10.1.2.3", "172.16.0.1", "192.168.0.1", "169.254.169.254",
+    "0.0.0.0", "100.64.0.1", "::1", "fe80::1%eth0", "fc00::1", "::ffff:127.0.0.1", "224.0.0.1",
+])
+def test_check_address_blocks(address):
+    with pytest.raises(BlockedAddress):
+        check_address(address)
+
+
+@pytest.mark.parametrize("address", ["93.184.216.34", "2606:4700:4700::1111"])
+def test_check_address_allows_public(address):
+    check_address(address)
+
+
+def test_localhost_name_blocked():
+    with pytest.raises(BlockedAddress):
+        public_addresses("localhost", 80)
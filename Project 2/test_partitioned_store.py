@@ -0,0 +1,184 @@
+"""Проверки partitioned_store: разбиение по чатам и месяцам, манифесты, сжатие
+старых месяцев и история чата (view) на временном каталоге.
+
+Запуск:
+    python -m pytest -q test_partitioned_store.py
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import partitioned_store
+from jsonl_store import JsonlStore
+from link_index import DEDUP_LINK
+from partitioned_store import (COMMON_CHAT, MANIFEST, UNDATED, ChatHistory, Histories, PartitionedStore, Summaries,
+                               chat_key, month_of)
+
+PHYSICS = "Физика"
+PYTHON = "Программирование на python"
+NOW = datetime(2026, 10, 18)
+
+
+def record(link: str, saved_at: str = "", chat_id=None, subject: str = PHYSICS) -> dict:
+    item = {"original_link": link, "link": link, "subject": subject, "saved_at": saved_at, "date": saved_at[:10]}
+    if chat_id is not None:
+        item["chat_id"] = chat_id
+    return item
+
+
+HISTORY = [
+    record("https://a.ru/1", "2026-08-05T10:00:00", 1),
+    record("https://a.ru/2", "2026-09-10T10:00:00", 1, PYTHON),
+    record("https://a.ru/3", "2026-10-01T10:00:00", 1),
+    record("https://b.ru/1", "2026-10-02T10:00:00", 2),
+    record("https://c.ru/1", "2026-07-15T10:00:00"),  # без chat_id — общая история
+    record("https://c.ru/2", "2026-10-03T10:00:00"),
+    record("https://c.ru/3"),  # без даты
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PartitionedStore(str(tmp_path / "partitions"), DEDUP_LINK)
+    store.append_many(HISTORY)
+    return store
+
+
+def links(records) -> list:
+    return sorted(item["original_link"] for item in records)
+
+
+def files(store, chat) -> list:
+    return sorted(os.listdir(os.path.join(store.directory, chat)))
+
+
+@pytest.mark.parametrize("chat_id, key", [(None, COMMON_CHAT), ("", COMMON_CHAT), (-100123, "-100123"),
+                                          (42, "42"), ("../x y", "___x_y")])
+def test_chat_key(chat_id, key):
+    assert chat_key(chat_id) == key
+
+
+def test_month_of():
+    assert month_of({"saved_at": "2026-10-18T10:00:00"}) == "2026-10"
+    assert month_of({}) == month_of({"saved_at": "вчера"}) == UNDATED
+
+
+def test_partitions_by_chat_and_month(store):
+    assert sorted(os.listdir(store.directory)) == ["1", "2", COMMON_CHAT]
+    assert files(store, "1") == ["2026-08.jsonl", "2026-09.jsonl", "2026-10.jsonl", MANIFEST]
+    assert files(store, COMMON_CHAT) == ["2026-07.jsonl", "2026-10.jsonl", MANIFEST, f"{UNDATED}.jsonl"]
+    assert store.count() == len(HISTORY)
+    assert links(store.iter_records()) == links(HISTORY)
+
+
+def test_manifest(store):
+    with open(os.path.join(store.directory, "1", MANIFEST), encoding="utf-8") as file:
+        manifest = json.load(file)
+    entry = manifest["2026-09"]
+    assert entry["records"] == 1
+    assert entry["min_saved_at"] == entry["max_saved_at"] == "2026-09-10T10:00:00"
+    assert entry["subjects"] == [PYTHON]
+    assert entry["daily"] == {PYTHON: {"2026-09-10": [1, 1]}}
+    assert entry["domains"] == {"a.ru": {PYTHON: [1, 1]}}
+    assert not entry["archived"]
+
+
+def test_months_pruned_by_manifest(store):
+    history = store.chat(1)
+    assert history.months() == ["2026-08", "2026-09", "2026-10"]
+    assert history.months(PHYSICS) == ["2026-08", "2026-10"]  # в сентябре физики нет
+    assert history.months(PHYSICS, "2026-09-01") == ["2026-10"]
+    assert history.months(None, "", "2026-09-01") == ["2026-08"]
+    assert store.chat(COMMON_CHAT).months(PHYSICS, "2026-10-01")[0] == UNDATED  # без даты — в любом периоде
+
+
+def test_dedup_within_segment(store):
+    store.append(record("https://a.ru/3", "2026-10-09T10:00:00", 1))  # тот же месяц — повтор
+    store.append(record("https://a.ru/1", "2026-10-09T11:00:00", 1))  # новый месяц — новая запись
+    october = store.chat(1).query(PHYSICS, "2026-10-01")
+    assert sorted((item["original_link"], item["count"]) for item in october) == [
+        ("https://a.ru/1", 1), ("https://a.ru/3", 2)]
+    assert store.chat(1).manifest["2026-10"]["records"] == 2
+    assert store.days(PHYSICS, "2026-10-09") == [("", 1, 1), ("2026-10-09", 2, 3)]
+
+
+def test_reopen_reads_manifest(store):
+    reopened = PartitionedStore(store.directory, DEDUP_LINK)
+    assert reopened.count() == store.count()
+    assert reopened.summary() == store.summary()
+    reopened.append(record("https://a.ru/3", "2026-10-05T10:00:00", 1))
+    assert reopened.count() == store.count()  # повтор после переоткрытия не добавляет запись
+
+
+def test_archive_old_months(store):
+    assert store.archive(now=NOW) == 2  # июль в common и август в чате 1; сентябрь — прошлый месяц
+    assert files(store, "1")[:2] == ["2026-08.jsonl.gz", "2026-09.jsonl"]
+    assert "2026-07.jsonl.gz" in files(store, COMMON_CHAT)
+    assert store.chat(1).manifest["2026-08"]["archived"]
+    with gzip.open(os.path.join(store.directory, "1", "2026-08.jsonl.gz"), "rt", encoding="utf-8") as file:
+        assert [json.loads(line)["original_link"] for line in file] == ["https://a.ru/1"]
+    # Сжатые месяцы читаются и входят в сводку так же, как до сжатия
+    assert store.count() == len(HISTORY)
+    assert links(store.query(PHYSICS, "2026-07-01", "2026-09-01")) == ["https://a.ru/1", "https://c.ru/1", "https://c.ru/3"]
+    assert store.days(PHYSICS, "2026-08-01", "2026-09-01") == [("", 1, 1), ("2026-08-05", 1, 1)]
+    assert store.archive(now=NOW) == 0  # повторно не сжимается
+
+
+def test_append_to_archived_month_unpacks_it(store):
+    store.archive(now=NOW)
+    store.append(record("https://a.ru/4", "2026-08-20T10:00:00", 1))
+    assert "2026-08.jsonl" in files(store, "1") and "2026-08.jsonl.gz" not in files(store, "1")
+    assert not store.chat(1).manifest["2026-08"]["archived"]
+    assert links(store.chat(1).query(PHYSICS, "2026-08-01", "2026-09-01")) == ["https://a.ru/1", "https://a.ru/4"]
+
+
+def test_view_sees_own_chat_and_common(store):
+    view = store.view(1)
+    assert links(view.iter_records()) == ["https://a.ru/1", "https://a.ru/2", "https://a.ru/3",
+                                          "https://c.ru/1", "https://c.ru/2", "https://c.ru/3"]
+    assert view.count() == 6
+    assert "https://b.ru/1" not in links(view.query(PHYSICS))  # чужой чат не читается
+    assert [row[0] for row in view.top_domains()] == ["a.ru", "c.ru"]
+    assert links(store.view(2).query(PHYSICS, "2026-10-01")) == ["https://b.ru/1", "https://c.ru/2", "https://c.ru/3"]
+    assert links(store.view(None).iter_records()) == ["https://c.ru/1", "https://c.ru/2", "https://c.ru/3"]
+
+
+def test_view_of_new_chat_has_only_common(store):
+    view = store.view(777)
+    assert links(view.iter_records()) == ["https://c.ru/1", "https://c.ru/2", "https://c.ru/3"]
+    assert os.path.isdir(os.path.join(store.directory, "777"))
+
+
+def test_rebuild_manifest(store):
+    store.archive(now=NOW)
+    path = os.path.join(store.directory, "1", MANIFEST)
+    with open(path, encoding="utf-8") as file:
+        expected = json.load(file)
+    os.remove(path)
+    assert ChatHistory(os.path.dirname(path), DEDUP_LINK).manifest == expected  # манифест собирается по файлам
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{испорчен")
+    assert ChatHistory(os.path.dirname(path), DEDUP_LINK).manifest == expected
+    assert store.rebuild_rollups() == 7
+
+
+def test_open_store_migrates_into_common(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    current = datetime.now().isoformat()
+    JsonlStore(fsync=False).append_many([record("https://old.ru/1", "2020-01-10T10:00:00"),
+                                         record("https://old.ru/2", current)])
+    store = partitioned_store.open_store(str(tmp_path / "partitions"))
+    assert sorted(os.listdir(store.directory)) == [COMMON_CHAT]
+    assert store.count() == 2
+    assert store.chat(COMMON_CHAT).manifest["2020-01"]["archived"]  # старый месяц сразу сжат
+    assert not store.chat(COMMON_CHAT).manifest[current[:7]]["archived"]
+
+
+def test_abstract_bases():
+    with pytest.raises(TypeError):
+        Summaries()
+    with pytest.raises(TypeError):
+        Histories()
@@ -0,0 +1,184 @@
+"""Проверки постраничного чтения: query_page всех хранилищ и ReportPager.
+
+Страницы, прочитанные по курсору, должны дать те же записи, что и query,
+без повторов и пропусков, а курсор после последней страницы — None, даже
+когда записей ровно на целое число страниц.
+
+Запуск:
+    python -m pytest -q test_report_pages.py
+"""
+from datetime import datetime
+
+import pytest
+
+from columnar_store import ColumnarStore
+from jsonl_store import JsonlStore
+from link_index import DEDUP_LINK, DEDUP_OFF
+from partitioned_store import PartitionedStore
+from report_pages import ReportPager, compact_line
+from rollups import RollupStore
+from sqlite_store import SqliteStore
+
+PHYSICS = "Физика"
+PYTHON = "Программирование на python"
+PERIODS = [("", ""), ("2026-08-01", ""), ("2026-08-15", "2026-10-05")]
+
+
+def history() -> list:
+    """Физика за четыре месяца в трех чатах вперемешку с python, записи без даты и повторы ссылок"""
+    records = []
+    for number in range(24):
+        month, day = 7 + number % 4, 1 + number
+        records.append({"original_link": f"https://phys.ru/{number}", "link": f"https://phys.ru/{number}",
+                        "subject": PHYSICS, "chat_id": [None, 1, 2][number % 3],
+                        "saved_at": f"2026-{month:02d}-{day:02d}T10:00:00", "date": f"2026-{month:02d}-{day:02d}"})
+        if number % 4 == 0:
+            records.append({"original_link": f"https://py.ru/{number}", "link": f"https://py.ru/{number}",
+                            "subject": PYTHON, "chat_id": 1, "saved_at": f"2026-{month:02d}-{day:02d}T11:00:00"})
+    records += [{"original_link": f"https://phys.ru/undated/{number}", "subject": PHYSICS} for number in range(2)]
+    # Повторы: тот же чат и месяц, более позднее время
+    by_link = {record["original_link"]: record for record in records}
+    records += [dict(by_link["https://phys.ru/0"], saved_at="2026-07-28T10:00:00"),
+                dict(by_link["https://phys.ru/5"], saved_at="2026-08-28T10:00:00")]
+    return records
+
+
+def jsonl(tmp_path, dedup):
+    return JsonlStore(str(tmp_path / "requests.jsonl"), fsync=False, dedup=dedup)
+
+
+def sqlite(tmp_path, dedup):
+    return SqliteStore(str(tmp_path / "requests.sqlite"), dedup=dedup)
+
+
+def columnar(tmp_path, dedup):
+    return ColumnarStore(str(tmp_path / "columns"))
+
+
+def partitioned(tmp_path, dedup):
+    store = PartitionedStore(str(tmp_path / "partitions"), dedup)
+    store.append_many(history())
+    store.archive(now=datetime(2026, 10, 18))  # июль и август сжимаются
+    return store
+
+
+def chat_view(tmp_path, dedup):
+    return partitioned(tmp_path, dedup).view(1)
+
+
+STORES = [(jsonl, DEDUP_OFF), (jsonl, DEDUP_LINK), (sqlite, DEDUP_OFF), (sqlite, DEDUP_LINK),
+          (columnar, DEDUP_OFF), (partitioned, DEDUP_OFF), (partitioned, DEDUP_LINK), (chat_view, DEDUP_LINK)]
+
+
+@pytest.fixture(params=STORES, ids=[f"{opener.__name__}-{dedup or 'off'}" for opener, dedup in STORES])
+def store(request, tmp_path):
+    opener, dedup = request.param
+    store = opener(tmp_path, dedup)
+    if opener not in (partitioned, chat_view):
+        store.append_many(history())
+    yield store
+    if isinstance(store, SqliteStore):
+        store.conn.close()
+
+
+def read_pages(store, subject: str, since: str, until: str, limit: int) -> list:
+    """Все страницы по курсору; проверяет размер каждой страницы"""
+    pages, cursor = [], None
+    while True:
+        page, cursor = store.query_page(subject, since, until, cursor, limit)
+        pages.append(page)
+        if cursor is None:
+            break
+        assert len(page) == limit  # курсор есть только после полной страницы
+        assert len(pages) < 100
+    return pages
+
+
+def links(records: list) -> list:
+    return [record["original_link"] for record in records]
+
+
+@pytest.mark.parametrize("since, until", PERIODS)
+@pytest.mark.parametrize("limit", [1, 3, 7, 10, 100])
+def test_pages_cover_query(store, since, until, limit):
+    expected = links(store.query(PHYSICS, since, until))
+    pages = read_pages(store, PHYSICS, since, until, limit)
+    found = [link for page in pages for link in links(page)]
+    assert sorted(found) == sorted(expected)  # без повторов и пропусков
+    assert len(pages) == max(1, -(-len(expected) // limit))
+
+
+def test_exact_page_boundary(store):
+    # Ровно целое число страниц: после последней полной страницы курсора нет
+    total = len(store.query(PHYSICS))
+    for limit in {size for size in range(1, total + 1) if total % size == 0}:
+        pages = read_pages(store, PHYSICS, "", "", limit)
+        assert len(pages) == total // limit
+        assert all(len(page) == limit for page in pages)
+
+
+def test_cursor_resumes_same_page(store):
+    first, cursor = store.query_page(PHYSICS, "", "", None, 4)
+    second, next_cursor = store.query_page(PHYSICS, "", "", cursor, 4)
+    again, again_cursor = store.query_page(PHYSICS, "", "", cursor, 4)  # курсор можно использовать повторно
+    assert links(again) == links(second) and again_cursor == next_cursor
+    assert not set(links(first)) & set(links(second))
+
+
+def test_empty_result(store):
+    assert store.query_page("Численные методы", "", "", None, 5) == ([], None)
+
+
+def pager_store(tmp_path, name):
+    if name == "sqlite":
+        return sqlite(tmp_path, DEDUP_LINK)
+    if name == "partitioned":
+        return partitioned(tmp_path, DEDUP_LINK)
+    return RollupStore(jsonl(tmp_path, DEDUP_LINK), DEDUP_LINK)
+
+
+@pytest.mark.parametrize("name", ["sqlite", "jsonl", "partitioned"])
+def test_pager_walks_forward_and_back(tmp_path, name):
+    store = pager_store(tmp_path, name)
+    if name != "partitioned":
+        store.append_many(history())
+    pager = ReportPager(store, PHYSICS, "2026-08-01", "", page_size=4)
+    expected = links(store.query(PHYSICS, "2026-08-01"))
+    assert pager.links == len(expected)  # заголовок из счетчиков совпадает с записями
+    seen, number, has_next = [], 0, True
+    while has_next:
+        number, records, has_next = pager.page(len(seen))
+        seen.append(links(records))
+    assert len(seen) == pager.pages
+    assert sorted(link for page in seen for link in page) == sorted(expected)
+    # Назад — по запомненным курсорам, те же страницы
+    for index in reversed(range(len(seen))):
+        assert links(pager.page(index)[1]) == seen[index]
+    # Номер за пределами известных страниц ограничивается
+    assert pager.page(len(seen) + 5)[0] == len(seen) - 1
+    assert pager.page(-1)[0] == 0
+    if isinstance(store, SqliteStore):
+        store.conn.close()
+
+
+def test_render(tmp_path):
+    store = sqlite(tmp_path, DEDUP_LINK)
+    try:
+        store.append_many(history())
+        pager = ReportPager(store, PHYSICS, page_size=5, period="за все время")
+        pager.page(0)  # курсор второй страницы известен после первой
+        number, records, _ = pager.page(1)
+        lines = pager.render(number, records).splitlines()
+        assert lines[0] == f"Отчет: {PHYSICS} за все время - {pager.links} ссылок, {pager.submissions} отправок"
+        assert lines[1] == f"Страница 2 из {pager.pages}"
+        assert lines[2].startswith("6. ")
+        assert ReportPager(store, "Численные методы").render(0, []).endswith("0 ссылок, 0 отправок")
+    finally:
+        store.conn.close()
+
+
+def test_compact_line():
+    record = {"link": "https://stepik.org/course/67", "saved_at": "2026-10-18T10:00:00", "count": 2}
+    assert compact_line(3, record) == "3. 18.10 https://stepik.org/course/67 ×2"
+    assert compact_line(1, {"original_link": "x" * 300}).endswith("…")
+    assert compact_line(1, {"original_link": "без даты"}) == "1. --.-- без даты"
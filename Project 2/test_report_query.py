@@ -0,0 +1,89 @@
+"""Проверки разбора предмета и периода отчета (report_query) без LLM.
+
+Текущий момент зафиксирован: воскресенье, 18 октября 2026 года, 15:30.
+
+Запуск:
+    python -m pytest -q test_report_query.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from report_query import days_label, is_summary, parse_period, parse_report_query, parse_subject
+
+NOW = datetime(2026, 10, 18, 15, 30)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("отчет по физике", "Физика"),
+    ("материалы по python за месяц", "Программирование на python"),
+    ("материалы по питону", "Программирование на python"),
+    ("список по компьютерным сетям", "Компьютерные сети"),
+    ("отчет по сетям за неделю", "Компьютерные сети"),
+    ("что было по численным методам", "Численные методы"),
+    ("отчет по вычмату", "Численные методы"),
+    ("Программирование на python", "Программирование на python"),
+    ("отчет по механике", "Физика"),
+    ("отчет по сетям и физике", None),  # ничья
+    ("отчет", None),
+])
+def test_parse_subject(text, expected):
+    assert parse_subject(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("отчет по физике", (NOW - timedelta(days=30), None)),
+    ("за неделю", (NOW - timedelta(days=7), None)),
+    ("за квартал", (NOW - timedelta(days=90), None)),
+    ("за год", (NOW - timedelta(days=365), None)),
+    ("за последние 10 дней", (NOW - timedelta(days=10), None)),
+    ("за 2 недели", (NOW - timedelta(days=14), None)),
+    ("за последний месяц", (NOW - timedelta(days=30), None)),
+    ("за последнюю неделю", (NOW - timedelta(days=7), None)),
+    ("за прошлую неделю", (datetime(2026, 10, 5), datetime(2026, 10, 12))),
+    ("сегодня", (datetime(2026, 10, 18), None)),
+    ("вчера", (datetime(2026, 10, 17), datetime(2026, 10, 18))),
+    ("на этой неделе", (datetime(2026, 10, 12), None)),
+    ("на прошлой неделе", (datetime(2026, 10, 5), datetime(2026, 10, 12))),
+    ("в прошлом месяце", (datetime(2026, 9, 1), datetime(2026, 10, 1))),
+    ("в этом году", (datetime(2026, 1, 1), None)),
+    ("в сентябре", (datetime(2026, 9, 1), datetime(2026, 10, 1))),
+    ("за декабрь", (datetime(2025, 12, 1), datetime(2026, 1, 1))),
+    ("в мае 2025", (datetime(2025, 5, 1), datetime(2025, 6, 1))),
+    ("с 1 по 15 октября", (datetime(2026, 10, 1), datetime(2026, 10, 16))),
+    ("с 28 сентября по 3 октября", (datetime(2026, 9, 28), datetime(2026, 10, 4))),
+    ("с 25 декабря по 5 января", (datetime(2025, 12, 25), datetime(2026, 1, 6))),
+    ("с 01.10 по 15.10", (datetime(2026, 10, 1), datetime(2026, 10, 16))),
+    ("с 01.09.2025 по 30.09.2025", (datetime(2025, 9, 1), datetime(2025, 10, 1))),
+    ("в 2025 году", (datetime(2025, 1, 1), datetime(2026, 1, 1))),
+    ("с 30 по 31 февраля", (NOW - timedelta(days=30), None)),  # несуществующая дата
+    ("отчет по физике, неделя", (NOW - timedelta(days=7), None)),
+])
+def test_parse_period(text, expected):
+    assert parse_period(text, NOW)[:2] == expected
+
+
+@pytest.mark.parametrize("text, label", [
+    ("за неделю", "за 7 дней"),
+    ("вчера", "за вчера"),
+    ("в сентябре", "за сентябрь 2026"),
+    ("с 1 по 15 октября", "с 01.10.2026 по 15.10.2026"),
+])
+def test_period_label(text, label):
+    assert parse_period(text, NOW)[2] == label
+
+
+@pytest.mark.parametrize("days, label", [(1, "за 1 день"), (3, "за 3 дня"), (11, "за 11 дней"), (21, "за 21 день")])
+def test_days_label(days, label):
+    assert days_label(days) == label
+
+
+def test_is_summary():
+    assert is_summary("сводка по физике за неделю")
+    assert is_summary("Статистика за месяц")
+    assert not is_summary("отчет по физике за неделю")
+
+
+def test_parse_report_query():
+    assert parse_report_query("отчет по сетям за неделю", NOW) == (
+        "Компьютерные сети", NOW - timedelta(days=7), None, "за 7 дней")
@@ -0,0 +1,155 @@
+"""Проверки сводных счетчиков: после записи, повторных отправок и пересборки
+они совпадают с полным пересчетом по записям хранилища.
+
+Запуск:
+    python -m pytest -q test_rollups.py
+"""
+import pytest
+
+from columnar_store import ColumnarStore
+from jsonl_store import JsonlStore
+from link_index import DEDUP_LINK, DEDUP_LINK_DAY, DEDUP_OFF
+from partitioned_store import PartitionedStore
+from rollups import RollupStore, Rollups, changes, day_bounds, format_stats
+from sqlite_store import SqliteStore
+
+PHYSICS = "Физика"
+PYTHON = "Программирование на python"
+NETWORKS = "Компьютерные сети"
+SUBJECTS = [PHYSICS, PYTHON, NETWORKS]
+PERIODS = [("", ""), ("2026-10-02", ""), ("2026-10-01", "2026-10-03"), ("2026-10-02T12:00:00", "2026-10-03T08:00:00")]
+
+
+def record(link: str, saved_at: str, subject: str = PHYSICS) -> dict:
+    return {"original_link": link, "link": link, "subject": subject, "date": saved_at[:10], "saved_at": saved_at}
+
+
+FIRST = [
+    record("https://a.ru/1", "2026-10-01T10:00:00"),
+    record("https://a.ru/2", "2026-10-01T11:00:00", PYTHON),
+    record("https://b.ru/1", "2026-10-02T09:00:00", NETWORKS),
+    record("https://www.a.ru/1/", "2026-10-01T18:00:00"),  # повтор в той же пачке и в тот же день
+]
+REPEATS = [
+    record("https://a.ru/1", "2026-10-03T10:00:00"),  # повтор в другой день
+    record("https://a.ru/2?utm_source=tg", "2026-10-02T10:00:00", NETWORKS),  # повтор с другим предметом
+    record("https://c.ru/1", "2026-10-03T11:00:00", PYTHON),
+    {"original_link": "без ссылки", "subject": PHYSICS},  # без даты и домена
+]
+
+
+def jsonl(tmp_path, dedup):
+    return RollupStore(JsonlStore(str(tmp_path / "requests.jsonl"), fsync=False, dedup=dedup), dedup)
+
+
+def sqlite(tmp_path, dedup):
+    return SqliteStore(str(tmp_path / "requests.sqlite"), dedup=dedup)
+
+
+def columnar(tmp_path, dedup):
+    return RollupStore(ColumnarStore(str(tmp_path / "columns")))
+
+
+def partitioned(tmp_path, dedup):
+    return PartitionedStore(str(tmp_path / "partitions"), dedup)
+
+
+STORES = [(jsonl, DEDUP_OFF), (jsonl, DEDUP_LINK), (jsonl, DEDUP_LINK_DAY),
+          (sqlite, DEDUP_OFF), (sqlite, DEDUP_LINK), (sqlite, DEDUP_LINK_DAY),
+          (columnar, DEDUP_OFF), (partitioned, DEDUP_OFF), (partitioned, DEDUP_LINK)]
+
+
+@pytest.fixture(params=STORES, ids=[f"{opener.__name__}-{dedup or 'off'}" for opener, dedup in STORES])
+def store(request, tmp_path):
+    opener, dedup = request.param
+    store = opener(tmp_path, dedup)
+    yield store
+    if isinstance(store, SqliteStore):
+        store.conn.close()
+
+
+def assert_matches_recount(store):
+    """Счетчики хранилища равны счетчикам, собранным заново по его записям"""
+    recount = Rollups().build(store.iter_records())
+    for since, until in PERIODS:
+        assert [tuple(row) for row in store.summary(since, until)] == recount.summary(since, until)
+        for subject in SUBJECTS:
+            assert [tuple(row) for row in store.days(subject, since, until)] == recount.days(subject, since, until)
+    for subject in [""] + SUBJECTS:
+        assert [tuple(row) for row in store.top_domains(10, subject)] == recount.top_domains(10, subject)
+
+
+def test_after_appends(store):
+    store.append_many(FIRST)
+    assert_matches_recount(store)
+
+
+def test_after_dedup_hits(store):
+    store.append_many(FIRST)
+    store.summary()  # счетчики в памяти собраны, дальше они ведутся при записи
+    store.append_many(REPEATS)
+    for item in REPEATS[:2]:
+        store.append(item)
+    assert_matches_recount(store)
+
+
+def test_after_rebuild(store):
+    store.append_many(FIRST)
+    store.summary()
+    store.append_many(REPEATS)
+    before = [tuple(row) for row in store.summary()]
+    assert store.rebuild_rollups() > 0
+    assert [tuple(row) for row in store.summary()] == before
+    assert_matches_recount(store)
+
+
+def test_link_dedup_moves_counters(tmp_path):
+    store = sqlite(tmp_path, DEDUP_LINK)
+    try:
+        store.append_many(FIRST + REPEATS)
+        # a.ru/1 отправлена трижды и учитывается в дне последней отправки
+        assert store.days(PHYSICS) == [("", 1, 1), ("2026-10-03", 1, 3)]
+        # a.ru/2 перешла из python в сети вместе со своими отправками
+        assert store.days(PYTHON) == [("2026-10-03", 1, 1)]
+        assert store.days(NETWORKS) == [("2026-10-02", 2, 3)]
+        assert store.top_domains(1) == [("a.ru", 2, 5)]
+    finally:
+        store.conn.close()
+
+
+def test_sqlite_rebuild_repairs_tables(tmp_path):
+    store = sqlite(tmp_path, DEDUP_LINK)
+    try:
+        store.append_many(FIRST + REPEATS)
+        expected = store.summary()
+        with store.conn:
+            store.conn.execute("UPDATE rollup_daily SET links = links + 5")
+            store.conn.execute("DELETE FROM rollup_domains")
+        assert store.summary() != expected
+        store.rebuild_rollups()
+        assert store.summary() == expected
+        assert_matches_recount(store)
+    finally:
+        store.conn.close()
+
+
+def test_changes_cancel_for_same_version():
+    version = record("https://a.ru/1", "2026-10-01T10:00:00")
+    assert changes(version, version) == ([], [])
+
+
+@pytest.mark.parametrize("since, until, expected", [
+    ("", "", ("", "")),
+    ("2026-10-01T10:00:00", "2026-10-03T00:00:00", ("2026-10-01", "2026-10-03")),
+    ("2026-10-01", "2026-10-03T08:00:00", ("2026-10-01", "2026-10-04")),  # неполный день входит целиком
+])
+def test_day_bounds(since, until, expected):
+    assert day_bounds(since, until) == expected
+
+
+def test_format_stats(tmp_path):
+    store = jsonl(tmp_path, DEDUP_LINK)
+    store.append_many(FIRST)
+    text = format_stats(store, PHYSICS, period="за все время")
+    assert text.splitlines()[0] == "Сводка: Физика за все время - 1 ссылок, 2 отправок"
+    assert "• a.ru: 1 ссылок, 2 отправок" in text
@@ -0,0 +1,24 @@
+"""Общие модули Project 1 и Project 2 должны совпадать байт в байт.
+
+Основная версия — здесь, в Project 2; после правки модуль копируется в Project 1.
+
+Запуск:
+    python -m pytest -q test_shared_modules.py
+"""
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT1_DIR = os.path.join(os.path.dirname(HERE), "Project 1")
+SHARED_MODULES = [
+    "subject_registry.py", "classification_cache.py", "jsonl_store.py", "url_normalizer.py", "link_index.py",
+    "hashing_vectorizer.py", "knn_classifier.py", "page_fetcher.py", "page_text.py", "test_url_normalizer.py",
+]
+
+
+@pytest.mark.skipif(not os.path.isdir(PROJECT1_DIR), reason="Project 1 рядом нет")
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_copy_matches(name):
+    with open(os.path.join(HERE, name), "rb") as original, open(os.path.join(PROJECT1_DIR, name), "rb") as copy:
+        assert copy.read() == original.read(), f"скопируйте Project 2/{name} в Project 1"
@@ -0,0 +1,99 @@
+"""Единственный писатель истории с групповой фиксацией.
+
+Обработчики не пишут в хранилище сами, а кладут записи в очередь. Поток-писатель
+забирает все, что накопилось, пока шла предыдущая фиксация (и при max_delay > 0
+дополнительно ждет попутчиков не дольше max_delay), и сохраняет пачку до
+max_batch записей одной операцией append_many — один fsync на пачку вместо
+одного на запись. Каждый вызов submit получает Future, который завершается
+после фиксации пачки; в async-коде его можно дождаться через save().
+"""
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY = 0.0  # секунды, сколько первая запись пачки может ждать попутчиков
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Поток-писатель поверх любого хранилища с методами append_many и count"""
+
+    def __init__(self, store, max_batch: int = DEFAULT_MAX_BATCH, max_delay: float = DEFAULT_MAX_DELAY):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue: "queue.Queue" = queue.Queue()
+        self.batches = 0
+        self.records = 0
+        self.thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: dict) -> Future:
+        """Ставит запись в очередь; Future вернет число записей после фиксации"""
+        future = Future()
+        self.queue.put((record, future))
+        return future
+
+    async def save(self, record: dict) -> int:
+        """Асинхронное подтверждение записи для обработчиков бота"""
+        return await asyncio.wrap_future(self.submit(record))
+
+    def _collect(self, first):
+        # Сначала забираем все, что накопилось, пока шла предыдущая фиксация,
+        # затем при max_delay > 0 ждем попутчиков, но не дольше max_delay
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                self.queue.put(_STOP)  # остановимся после фиксации этой пачки
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            batch = self._collect(item)
+            try:
+                self.store.append_many([record for record, _ in batch])
+                total = self.store.count()
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.records += len(batch)
+            for _, future in batch:
+                future.set_result(total)
+
+    def close(self):
+        """Дожидается фиксации всех записей из очереди и останавливает поток"""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "records": self.records,
+            "avg_batch": round(self.records / self.batches, 2) if self.batches else 0.0,
+            "queued": self.queue.qsize(),
+        }
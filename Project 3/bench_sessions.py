@@ -0,0 +1,110 @@
+"""Память бота под нагрузкой: словарь состояний против SessionStore.
+
+Запуск:
+    python bench_sessions.py                          # 10k пользователей
+    python bench_sessions.py --users 20000 --hot 256
+
+Каждый синтетический пользователь проходит диалог до готовых документов
+(профиль, стажировка, резюме и письмо), после чего к нему возвращается
+случайная доля пользователей. Прежний способ держит все состояния в словаре,
+как context.user_data; новый — SessionStore с ограниченным числом горячих
+сессий. Через каждые 10% пользователей печатается память, занятая Python
+(tracemalloc): у словаря она растет линейно, у SessionStore остается ровной.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from session_store import SessionStore, dump_state
+
+
+def make_state(user_id: int) -> dict:
+    """Состояние диалога после генерации документов, примерно как у настоящего пользователя"""
+    resume = f"Резюме пользователя {user_id}. " + "Опыт работы на Python, SQL и Django. " * 40
+    cover = f"Мотивационное письмо пользователя {user_id}. " + "Хочу развиваться в команде. " * 40
+    return {
+        "messages": [
+            AIMessage(content="👋 Привет! Расскажите о себе: ФИО, вуз, специальность, ключевые навыки."),
+            HumanMessage(content=f"Студент {user_id}, МГУ, ВМК, 3 курс. Python, SQL, Django."),
+            AIMessage(content="Отлично! Теперь расскажите о стажировке."),
+            HumanMessage(content="Стажировка в Яндекс, веб-разработка на Python. " * 5),
+            AIMessage(content="Спасибо! Теперь выберите стиль оформления документов."),
+            HumanMessage(content="1"),
+            AIMessage(content="🎉 Ваши документы готовы!\n\n[[resume_text]]\n\n[[cover_letter_text]]"),
+        ],
+        "stage": "editing",
+        "user_profile": {"name": f"Студент {user_id}", "education": "МГУ, ВМК", "skills": "Python, SQL, Django"},
+        "internship_description": "Стажировка в Яндекс, веб-разработка на Python. " * 5,
+        "style": "официальный",
+        "language": "ru",
+        "resume_text": resume,
+        "cover_letter_text": cover,
+        "edit_count": 0,
+        "summary": "",
+    }
+
+
+def simulate(put, get, users: int, returning: float, checkpoints: int):
+    """Проходит пользователей по очереди; возвращает [(пользователей, МБ в памяти)]"""
+    rng = random.Random(21)
+    points = []
+    step = max(1, users // checkpoints)
+    for user_id in range(1, users + 1):
+        put(user_id, make_state(user_id))
+        if rng.random() < returning:
+            other = rng.randint(1, user_id)
+            state = get(other)
+            put(other, {**state, "messages": state["messages"] + [HumanMessage(content="Сделай резюме короче")]})
+        if user_id % step == 0:
+            points.append((user_id, tracemalloc.get_traced_memory()[0] / 2 ** 20))
+    return points
+
+
+def run(name: str, put, get, users: int, returning: float, checkpoints: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    points = simulate(put, get, users, returning, checkpoints)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    print(f"{name}: {elapsed:.2f} с")
+    for count, megabytes in points:
+        print(f"  {count:>8} пользователей  {megabytes:8.1f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--hot", type=int, default=256, help="горячих сессий в памяти SessionStore")
+    parser.add_argument("--returning", type=float, default=0.3, help="доля сообщений от вернувшихся пользователей")
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+
+    sample = make_state(1)
+    print(f"Одна сессия: {len(dump_state(sample))} байт на диске")
+
+    user_data = {}
+    run("user_data (словарь)", user_data.__setitem__, user_data.__getitem__,
+        args.users, args.returning, args.checkpoints)
+    del user_data
+
+    directory = tempfile.mkdtemp(prefix="sessions_")
+    try:
+        store = SessionStore(os.path.join(directory, "sessions.sqlite"), max_hot=args.hot)
+        run(f"SessionStore (горячих {args.hot})", store.put, store.get,
+            args.users, args.returning, args.checkpoints)
+        stats = store.stats()
+        print(f"  на диске {stats['sessions']} сессий, {stats['bytes_on_disk'] / 2 ** 20:.1f} МБ, "
+              f"чтений с диска {stats['loads']}")
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
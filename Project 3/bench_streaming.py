@@ -0,0 +1,123 @@
+"""Время до первого видимого текста: ответ целиком против потоковой генерации.
+
+Запуск:
+    python bench_streaming.py
+    python bench_streaming.py --first-token 2 --tokens-per-second 30 --chars 4000
+
+GigaChat заменяется моделью с задержкой до первого токена и постоянной
+скоростью генерации, Telegram — заглушкой, которая запоминает время каждой
+отправки и правки. Бот проходит диалог до выбора стиля, после чего
+замеряется ход с генерацией документов: при STREAM_DOCUMENTS = False
+(прежний путь через llm.ainvoke) и True (llm.astream и черновик).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import project03_task01 as bot_module
+
+PROFILE = '{"name": "Иван Петров", "education": "МГУ, ВМК", "skills": "Python, SQL", "experience": "нет", "projects": "бот"}'
+
+
+class SimulatedLLM:
+    """Модель с задержкой до первого токена и заданной скоростью; токен — 4 символа.
+
+    Каждый запрос возвращает один документ длиной chars / 2: резюме и письмо
+    бот запрашивает отдельно и одновременно.
+    """
+
+    def __init__(self, first_token: float, tokens_per_second: float, chars: int):
+        self.first_token = first_token
+        self.token_delay = 1 / tokens_per_second
+        self.document = ("Опыт разработки на Python и работы с базами данных. " * (chars // 104 + 1))[:chars // 2]
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        if "Извлеки" in messages[-1].content:
+            return AIMessage(content=PROFILE)
+        await asyncio.sleep(self.first_token + self.token_delay * len(self.document) / 4)
+        return AIMessage(content=self.document)
+
+    async def astream(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.first_token)
+        for start in range(0, len(self.document), 4):
+            yield AIMessageChunk(content=self.document[start:start + 4])
+            await asyncio.sleep(self.token_delay)
+
+
+class Sent:
+    def __init__(self, chat):
+        self.chat = chat
+
+    async def edit_text(self, text, **kwargs):
+        self.chat.events.append(("edit", time.monotonic()))
+
+
+class Chat:
+    """Заглушка сообщения пользователя: бот отвечает через reply_text"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.events = []
+
+    async def reply_text(self, text, **kwargs):
+        self.events.append(("send", time.monotonic()))
+        return Sent(self)
+
+
+class User:
+    id = 1
+
+
+class Update:
+    def __init__(self, text: str):
+        self.message = Chat(text)
+        self.effective_user = User()
+
+
+async def measure(bot, streaming: bool) -> str:
+    bot_module.STREAM_DOCUMENTS = streaming
+    await bot.start_command(Update("/start"), None)
+    for text in ("Иван Петров, МГУ, Python, SQL", "Стажировка в Яндекс, Python-разработка"):
+        await bot.handle_message(Update(text), None)
+    update = Update("1")
+    started = time.monotonic()
+    await bot.handle_message(update, None)
+    events = update.message.events
+    first = events[0][1] - started
+    total = events[-1][1] - started
+    edits = sum(1 for kind, _ in events if kind == "edit")
+    name = "потоково" if streaming else "целиком"
+    return f"{name:<9} первый текст {first:6.2f} с, ответ целиком {total:6.2f} с, правок черновика {edits}"
+
+
+async def run(args):
+    directory = tempfile.mkdtemp(prefix="streaming_")
+    try:
+        bot_module.SESSIONS_PATH = os.path.join(directory, "sessions.sqlite")
+        bot_module.llm = SimulatedLLM(args.first_token, args.tokens_per_second, args.chars)
+        bot = bot_module.ResumeBot()
+        for streaming in (False, True):
+            print(await measure(bot, streaming))
+        bot.sessions.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token", type=float, default=1.0, help="задержка до первого токена, с")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--chars", type=int, default=2400, help="длина резюме и письма вместе")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)  # логи бота с текстом документов не нужны
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
+import asyncio
 import json
 import logging
 import re
+import time
+import weakref
 from datetime import datetime
 from typing import TypedDict, Optional, Annotated, List, Dict, Any
 from typing_extensions import Literal
 
 from langchain_gigachat import GigaChat
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, RemoveMessage
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
+from session_store import SessionStore
+
 # === Настройки ===
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -22,6 +28,16 @@ logging.basicConfig(
 # Конфигурация
 API_KEY = "YOUR API KEY"
 TELEGRAM_TOKEN = "YOUR TG TOKEN"
+AGENT_CONCURRENCY = 8  # сколько генераций идет одновременно; остальные ждут своей очереди
+SESSIONS_PATH = "sessions.sqlite"  # диалоги переживают перезапуск бота
+HOT_SESSIONS = 256  # сколько диалогов держать в памяти; остальные читаются с диска
+HISTORY_TURNS = 3  # сколько последних ходов (вопрос + ответ) хранится дословно
+SUMMARY_LINE = 120  # длина строки краткой истории на одно старое сообщение
+SUMMARY_CHARS = 2000  # предел краткой истории; самые старые строки отбрасываются
+STREAM_DOCUMENTS = True  # показывать документы по мере генерации, а не после полного ответа
+STREAM_EDIT_INTERVAL = 1.5  # секунды между правками черновика: лимиты Telegram на редактирование
+PREVIEW_CHARS = 3500  # в черновике показывается конец текста, чтобы уложиться в 4096 символов
+TELEGRAM_LIMIT = 4096
 
 # === Инициализация LLM ===
 try:
@@ -51,6 +67,7 @@ class ResumeState(TypedDict):
     resume_text: Optional[str]
     cover_letter_text: Optional[str]
     edit_count: int  # Счетчик правок
+    summary: str  # краткая история ходов, вытесненных из messages
 
 
 # === Системные промпты ===
@@ -113,6 +130,86 @@ def extract_json_from_text(text: str) -> Dict[str, Any]:
     return extracted
 
 
+def document_ref(field: str) -> str:
+    """Ссылка на текст документа в сообщении: сам текст хранится в состоянии один раз"""
+    return f"[[{field}]]"
+
+
+def render_message(state: Dict[str, Any], message) -> str:
+    """Текст сообщения для пользователя: ссылки на документы заменяются их текущим текстом"""
+    text = message.content
+    for field in ("resume_text", "cover_letter_text"):
+        text = text.replace(document_ref(field), state.get(field) or "")
+    return text
+
+
+# Документы генерируются отдельными запросами, по одному на документ
+DOCUMENTS = {
+    "resume_text": {
+        "heading": "РЕЗЮМЕ",
+        "title": "резюме (CV/Resume)",
+        "label": "📄 ОБНОВЛЕННОЕ РЕЗЮМЕ",
+        "keywords": re.compile(r"резюме|\bresume|\bcv\b", re.IGNORECASE),
+        "requirements": """- Используй ТОЛЬКО данные выше
+        - Структура: Контакты, Образование, Навыки, Опыт, Проекты, Достижения
+        - Адаптируй под требования стажировки
+        - Используй ключевые слова из описания стажировки
+        - НЕ добавляй вымышленные данные""",
+    },
+    "cover_letter_text": {
+        "heading": "МОТИВАЦИОННОЕ ПИСЬМО",
+        "title": "мотивационное письмо (Cover Letter)",
+        "label": "📝 ОБНОВЛЕННОЕ МОТИВАЦИОННОЕ ПИСЬМО",
+        "keywords": re.compile(r"письм|сопроводител|мотивацион|cover|letter", re.IGNORECASE),
+        "requirements": """- 3-4 абзаца
+        - Используй ТОЛЬКО данные кандидата выше
+        - Почему кандидат подходит для этой стажировки
+        - Почему интересуется компанией/программой
+        - Что может привнести в команду
+        - Связь между опытом и требованиями""",
+    },
+}
+
+
+def edit_targets(feedback: str) -> List[str]:
+    """Документы, которые упомянуты в запросе на правку; если ни один или оба — все"""
+    fields = [field for field, document in DOCUMENTS.items() if document["keywords"].search(feedback)]
+    return fields or list(DOCUMENTS)
+
+
+def strip_heading(text: str, heading: str) -> str:
+    """Убирает заголовок «РЕЗЮМЕ:», если модель все-таки его добавила"""
+    text = text.strip()
+    if text.upper().startswith(heading):
+        text = text[len(heading):].lstrip(" :\n")
+    return text
+
+
+async def request_document(field: str, prompt: str) -> str:
+    """Текст одного документа от LLM; при STREAM_DOCUMENTS фрагменты (поле, текст) уходят в поток custom"""
+    messages = [HumanMessage(content=prompt)]
+    if not STREAM_DOCUMENTS:
+        response = await llm.ainvoke(messages)
+        text = response.content
+    else:
+        write = get_stream_writer()  # без stream_mode="custom" ничего не делает
+        parts = []
+        async for chunk in llm.astream(messages):
+            parts.append(chunk.content)
+            write((field, chunk.content))
+        text = "".join(parts)
+    return strip_heading(text, DOCUMENTS[field]["heading"])
+
+
+def summary_line(message) -> str:
+    """Одна строка краткой истории: кто написал и начало сообщения"""
+    author = "Пользователь" if message.type == "human" else "Бот"
+    text = " ".join(message.content.split())
+    if len(text) > SUMMARY_LINE:
+        text = text[:SUMMARY_LINE - 1] + "…"
+    return f"{author}: {text}"
+
+
 def has_basic_info(profile: Dict[str, Any]) -> bool:
     """Проверяет, есть ли базовая информация в профиле"""
     required_fields = ["name", "education", "skills"]
@@ -160,7 +257,8 @@ def router(state: ResumeState) -> ResumeState:
         else:
             return {"stage": "selecting_style"}
     elif stage == "generating":
-        return {"stage": "editing"}
+        # Генерация идет сразу после выбора стиля; сюда попадаем после ошибки — повторяем ее
+        return {"stage": "editing" if state.get("resume_text") else "generating"}
     elif stage == "editing":
         # Проверяем, есть ли финальное сообщение
         if state.get("edit_count", 0) >= 3:
@@ -171,7 +269,7 @@ def router(state: ResumeState) -> ResumeState:
         return {"stage": stage}
 
 
-def collect_profile_node(state: ResumeState) -> ResumeState:
+async def collect_profile_node(state: ResumeState) -> ResumeState:
     """Собирает информацию о пользователе"""
     if not state["messages"]:
         return {
@@ -181,7 +279,8 @@ def collect_profile_node(state: ResumeState) -> ResumeState:
         }
 
     last_msg = state["messages"][-1].content
-    profile = state.get("user_profile", {})
+    # Копия: словарь из состояния общий с горячей сессией SessionStore и меняться до сохранения хода не должен
+    profile = dict(state.get("user_profile") or {})
 
     # Извлекаем информацию из ответа пользователя
     try:
@@ -201,7 +300,7 @@ def collect_profile_node(state: ResumeState) -> ResumeState:
         Верни только JSON без дополнительного текста.
         """
 
-        response = llm.invoke([HumanMessage(content=extraction_prompt)])
+        response = await llm.ainvoke([HumanMessage(content=extraction_prompt)])
         new_data = extract_json_from_text(response.content)
 
         logging.info(f"Извлеченные данные: {new_data}")
@@ -284,8 +383,8 @@ def select_style_node(state: ResumeState) -> ResumeState:
     }
 
 
-def generate_documents_node(state: ResumeState) -> ResumeState:
-    """Генерирует резюме и мотивационное письмо"""
+async def generate_documents_node(state: ResumeState) -> ResumeState:
+    """Генерирует резюме и мотивационное письмо двумя одновременными запросами"""
     profile = state["user_profile"]
     internship = state["internship_description"]
     style = state["style"]
@@ -310,12 +409,9 @@ def generate_documents_node(state: ResumeState) -> ResumeState:
     style_desc = style_descriptions.get(style, "профессиональный")
     lang_desc = lang_descriptions.get(language, "на русском языке")
 
-    try:
-        prompt = f"""
-        Создай два документа {lang_desc} в {style_desc}:
-
-        1. РЕЗЮМЕ (CV/Resume)
-        2. МОТИВАЦИОННОЕ ПИСЬМО (Cover Letter)
+    def document_prompt(document: Dict[str, str]) -> str:
+        return f"""
+        Создай {document['title']} {lang_desc} в {style_desc}.
 
         ВАЖНО: Используй ТОЛЬКО информацию, предоставленную пользователем ниже. НЕ добавляй вымышленные данные!
 
@@ -330,52 +426,17 @@ def generate_documents_node(state: ResumeState) -> ResumeState:
         Описание стажировки:
         {internship}
 
-        Требования к резюме:
-        - Используй ТОЛЬКО данные выше
-        - Структура: Контакты, Образование, Навыки, Опыт, Проекты, Достижения
-        - Адаптируй под требования стажировки
-        - Используй ключевые слова из описания стажировки
-        - НЕ добавляй вымышленные данные
-
-        Требования к мотивационному письму:
-        - 3-4 абзаца
-        - Используй ТОЛЬКО данные кандидата выше
-        - Почему кандидат подходит для этой стажировки
-        - Почему интересуется компанией/программой
-        - Что может привнести в команду
-        - Связь между опытом и требованиями
-
-        Формат вывода:
-        РЕЗЮМЕ:
-        [содержимое резюме]
-
-        МОТИВАЦИОННОЕ ПИСЬМО:
-        [содержимое письма]
+        Требования:
+        {document['requirements']}
 
-        Не используй markdown разметку.
+        Верни только текст документа, без заголовка и пояснений. Не используй markdown разметку.
         """
 
-        response = llm.invoke([HumanMessage(content=prompt)])
-        full_text = response.content
-
-        logging.info(f"Получен ответ от LLM: {full_text[:200]}...")
-
-        # Разделяем на резюме и письмо
-        resume_text = ""
-        cover_letter_text = ""
-
-        if "МОТИВАЦИОННОЕ ПИСЬМО" in full_text:
-            parts = full_text.split("МОТИВАЦИОННОЕ ПИСЬМО", 1)
-            resume_text = parts[0].replace("РЕЗЮМЕ:", "").strip()
-            cover_letter_text = "МОТИВАЦИОННОЕ ПИСЬМО:" + (parts[1] if len(parts) > 1 else "")
-        else:
-            # Если разделитель не найден, пытаемся разделить по-другому
-            if "РЕЗЮМЕ:" in full_text:
-                parts = full_text.split("РЕЗЮМЕ:", 1)
-                if len(parts) > 1:
-                    resume_text = parts[1]
-            else:
-                resume_text = full_text
+    try:
+        # Оба документа пишутся параллельно: ход длится столько, сколько самый долгий запрос
+        resume_text, cover_letter_text = await asyncio.gather(
+            *(request_document(field, document_prompt(document)) for field, document in DOCUMENTS.items())
+        )
 
         logging.info(f"Сгенерировано резюме: {resume_text[:100]}...")
         logging.info(f"Сгенерировано письмо: {cover_letter_text[:100]}...")
@@ -385,7 +446,7 @@ def generate_documents_node(state: ResumeState) -> ResumeState:
             "cover_letter_text": cover_letter_text,
             "edit_count": 0,
             "messages": [AIMessage(
-                content=f"🎉 Ваши документы готовы!\n\n📄 РЕЗЮМЕ:\n\n{resume_text}\n\n📝 МОТИВАЦИОННОЕ ПИСЬМО:\n\n{cover_letter_text}\n\n💡 Хотите что-то изменить? Напишите, что нужно поправить (например: «Сделай резюме короче» или «Перепиши письмо в более официальном тоне»).")],
+                content=f"🎉 Ваши документы готовы!\n\n📄 РЕЗЮМЕ:\n\n{document_ref('resume_text')}\n\n📝 МОТИВАЦИОННОЕ ПИСЬМО:\n\n{document_ref('cover_letter_text')}\n\n💡 Хотите что-то изменить? Напишите, что нужно поправить (например: «Сделай резюме короче» или «Перепиши письмо в более официальном тоне»).")],
             "stage": "editing"
         }
 
@@ -397,16 +458,15 @@ def generate_documents_node(state: ResumeState) -> ResumeState:
         }
 
 
-def edit_documents_node(state: ResumeState) -> ResumeState:
-    """Обрабатывает правки документов"""
+async def edit_documents_node(state: ResumeState) -> ResumeState:
+    """Обрабатывает правки документов: упомянутый в запросе документ правится одним запросом,
+    а при неясном запросе каждый документ правится своим запросом, параллельно"""
     feedback = state["messages"][-1].content
-    current_resume = state.get("resume_text", "")
-    current_cover = state.get("cover_letter_text", "")
-    profile = state["user_profile"]
     internship = state["internship_description"]
     style = state["style"]
     language = state["language"]
     edit_count = state.get("edit_count", 0)
+    summary = state.get("summary", "")
 
     # Ограничиваем количество правок
     if edit_count >= 3:
@@ -416,51 +476,39 @@ def edit_documents_node(state: ResumeState) -> ResumeState:
             "stage": "final"
         }
 
-    try:
-        edit_prompt = f"""
-        Пользователь просит внести правки в документы. Внеси изменения согласно запросу.
+    def edit_prompt(field: str) -> str:
+        return f"""
+        Пользователь просит внести правки в документы. Перед тобой один из них — {DOCUMENTS[field]['title']}.
 
-        Текущее резюме:
-        {current_resume}
+        Текущий текст документа:
+        {state.get(field) or ""}
 
-        Текущее мотивационное письмо:
-        {current_cover}
+        Ранее в диалоге (кратко):
+        {summary or "нет"}
 
         Запрос на правку:
         {feedback}
 
         Требования:
-        - Обнови только ту часть, которую просят изменить
+        - Если запрос касается только другого документа, верни текущий текст без изменений
         - Сохрани общий стиль ({style}) и язык ({language})
         - Адаптируй под требования стажировки: {internship}
-        - Верни оба документа в том же формате
-
-        Формат вывода:
-        РЕЗЮМЕ:
-        [обновленное резюме]
 
-        МОТИВАЦИОННОЕ ПИСЬМО:
-        [обновленное письмо]
+        Верни только текст документа, без заголовка и пояснений.
         """
 
-        response = llm.invoke([HumanMessage(content=edit_prompt)])
-        full_text = response.content
-
-        # Разделяем обновленные документы
-        resume_text = current_resume
-        cover_letter_text = current_cover
-
-        if "МОТИВАЦИОННОЕ ПИСЬМО" in full_text:
-            parts = full_text.split("МОТИВАЦИОННОЕ ПИСЬМО", 1)
-            resume_text = parts[0].replace("РЕЗЮМЕ:", "").strip()
-            cover_letter_text = "МОТИВАЦИОННОЕ ПИСЬМО:" + (parts[1] if len(parts) > 1 else "")
+    # «Сделай резюме короче» правит только резюме: второй запрос к модели не нужен
+    fields = edit_targets(feedback)
+    try:
+        texts = await asyncio.gather(*(request_document(field, edit_prompt(field)) for field in fields))
 
+        updated = {field: text or state.get(field, "") for field, text in zip(fields, texts)}
+        sections = "\n\n".join(f"{DOCUMENTS[field]['label']}:\n\n{document_ref(field)}" for field in fields)
         return {
-            "resume_text": resume_text,
-            "cover_letter_text": cover_letter_text,
+            **updated,
             "edit_count": edit_count + 1,
             "messages": [AIMessage(
-                content=f"✅ Документы обновлены!\n\n📄 ОБНОВЛЕННОЕ РЕЗЮМЕ:\n\n{resume_text}\n\n📝 ОБНОВЛЕННОЕ МОТИВАЦИОННОЕ ПИСЬМО:\n\n{cover_letter_text}\n\n💡 Можно внести еще правки или завершить работу.")],
+                content=f"✅ Документы обновлены!\n\n{sections}\n\n💡 Можно внести еще правки или завершить работу.")],
             "stage": "editing"
         }
 
@@ -481,6 +529,26 @@ def final_node(state: ResumeState) -> ResumeState:
     }
 
 
+def compact_history_node(state: ResumeState) -> ResumeState:
+    """Оставляет дословно последние HISTORY_TURNS ходов, более старые сворачивает в summary.
+
+    Ход начинается с сообщения пользователя: ответов бота в ходе может быть несколько
+    (выбор стиля и сгенерированные документы).
+    """
+    messages = state["messages"]
+    starts = [index for index, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if len(starts) <= HISTORY_TURNS:
+        return {}
+    old = messages[:starts[-HISTORY_TURNS]]
+    summary = "\n".join(filter(None, [state.get("summary", "")] + [summary_line(m) for m in old]))
+    if len(summary) > SUMMARY_CHARS:
+        summary = summary[-SUMMARY_CHARS:].split("\n", 1)[-1]  # обрезаем по границе строки
+    return {
+        "summary": summary,
+        "messages": [RemoveMessage(id=message.id) for message in old]
+    }
+
+
 # === Создание графа ===
 def create_resume_agent():
     """Создает и компилирует граф агента"""
@@ -494,6 +562,7 @@ def create_resume_agent():
     workflow.add_node("generate", generate_documents_node)
     workflow.add_node("edit", edit_documents_node)
     workflow.add_node("final", final_node)
+    workflow.add_node("compact_history", compact_history_node)
 
     # Устанавливаем точку входа
     workflow.set_entry_point("router")
@@ -512,22 +581,93 @@ def create_resume_agent():
         }
     )
 
-    # Добавляем переходы - каждый узел завершает выполнение
-    workflow.add_edge("collect_profile", END)
-    workflow.add_edge("collect_internship", END)
-    workflow.add_edge("select_style", END)
-    workflow.add_edge("generate", END)
-    workflow.add_edge("edit", END)
-    workflow.add_edge("final", END)
+    # Добавляем переходы - после каждого узла история сокращается, и выполнение завершается
+    workflow.add_edge("collect_profile", "compact_history")
+    workflow.add_edge("collect_internship", "compact_history")
+    workflow.add_edge("select_style", "generate")  # документы генерируются в том же ходе, что и выбор стиля
+    workflow.add_edge("generate", "compact_history")
+    workflow.add_edge("edit", "compact_history")
+    workflow.add_edge("final", "compact_history")
+    workflow.add_edge("compact_history", END)
 
     return workflow.compile()
 
 
 # === Telegram Bot ===
+class StreamPreview:
+    """Черновик ответа в Telegram, который дописывается по мере генерации документов"""
+
+    def __init__(self, message, started: float):
+        self.message = message  # сообщение пользователя, на которое отвечает бот
+        self.started = started
+        self.texts: Dict[str, str] = {}  # поле документа -> полученный текст; документы пишутся параллельно
+        self.shown = ""
+        self.sent = None  # сообщение бота с черновиком
+        self.edited_at = 0.0
+        self.first_visible: Optional[float] = None  # секунд от сообщения пользователя до первого текста
+
+    async def add(self, fragment: tuple):
+        field, text = fragment
+        self.texts[field] = self.texts.get(field, "") + text
+        # Первый фрагмент показывается сразу, дальше не чаще STREAM_EDIT_INTERVAL
+        if time.monotonic() - self.edited_at >= STREAM_EDIT_INTERVAL:
+            await self.show()
+
+    def draft(self) -> str:
+        """Текст черновика: конец каждого документа, чтобы уложиться в одно сообщение"""
+        sections = []
+        for field, document in DOCUMENTS.items():
+            text = self.texts.get(field, "").strip()
+            if len(text) > PREVIEW_CHARS // len(DOCUMENTS):
+                text = "…" + text[-(PREVIEW_CHARS // len(DOCUMENTS)):]
+            if text:
+                sections.append(f"{document['heading']}:\n{text}")
+        return "\n\n".join(sections)
+
+    async def show(self):
+        draft = self.draft()
+        if not draft or draft == self.shown:
+            return
+        text = "⏳ Генерирую документы...\n\n" + draft
+        try:
+            if self.sent is None:
+                self.sent = await self.message.reply_text(text)
+            else:
+                await self.sent.edit_text(text)
+        except Exception as e:
+            logging.warning(f"Не удалось обновить черновик: {e}")
+        self.shown = draft
+        self.edited_at = time.monotonic()
+        if self.first_visible is None:
+            self.first_visible = self.edited_at - self.started
+
+    async def finish(self, response: str):
+        """Заменяет черновик окончательным ответом, длинный ответ делится на сообщения"""
+        chunks = [response[i:i + TELEGRAM_LIMIT] for i in range(0, len(response), TELEGRAM_LIMIT)]
+        if self.sent is not None:
+            try:
+                await self.sent.edit_text(chunks[0])
+                chunks = chunks[1:]
+            except Exception as e:
+                logging.warning(f"Не удалось заменить черновик: {e}")
+        for chunk in chunks:
+            await self.message.reply_text(chunk)
+        if self.first_visible is None:
+            self.first_visible = time.monotonic() - self.started
+
+
 class ResumeBot:
     def __init__(self):
         self.agent = create_resume_agent()
-        self.app = Application.builder().token(TELEGRAM_TOKEN).build()
+        # Ограничение одновременных запусков агента и блокировки по пользователям:
+        # разные пользователи обслуживаются параллельно, сообщения одного — по очереди
+        self.agent_slots = asyncio.Semaphore(AGENT_CONCURRENCY)
+        self.user_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Состояние диалогов — в SessionStore, а не в context.user_data: память ограничена
+        # горячими сессиями, а после перезапуска диалог продолжается
+        self.sessions = SessionStore(SESSIONS_PATH, max_hot=HOT_SESSIONS)
+        # concurrent_updates: обновления не ждут, пока закончится обработка предыдущих
+        self.app = Application.builder().token(TELEGRAM_TOKEN).concurrent_updates(True).build()
         self.setup_handlers()
 
     def setup_handlers(self):
@@ -539,6 +679,12 @@ class ResumeBot:
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
+        # Под блокировкой пользователя: иначе идущий ход агента сохранит свое состояние поверх нового диалога
+        async with self.user_lock(update.effective_user.id):
+            await self.start_session(update)
+
+    async def start_session(self, update: Update):
+        """Начинает новый диалог; вызывается под блокировкой пользователя"""
         initial_state = {
             "messages": [AIMessage(
                 content="👋 Привет! Я помогу вам создать идеальное резюме и мотивационное письмо для стажировки.\n\n📝 Для начала расскажите о себе: ФИО, вуз, специальность, ключевые навыки.")],
@@ -549,9 +695,10 @@ class ResumeBot:
             "language": "ru",
             "resume_text": None,
             "cover_letter_text": None,
-            "edit_count": 0
+            "edit_count": 0,
+            "summary": ""
         }
-        context.user_data["state"] = initial_state
+        await self.sessions.save(update.effective_user.id, initial_state)
         await update.message.reply_text(initial_state["messages"][0].content)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -582,51 +729,70 @@ class ResumeBot:
 
     async def stop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /stop"""
-        context.user_data["state"] = {
-            "messages": [AIMessage(content="Диалог завершен. Используйте /start для создания новых документов.")],
-            "stage": "final"
-        }
+        async with self.user_lock(update.effective_user.id):
+            await self.sessions.save(update.effective_user.id, {
+                "messages": [AIMessage(content="Диалог завершен. Используйте /start для создания новых документов.")],
+                "stage": "final"
+            })
         await update.message.reply_text("🛑 Диалог завершен. Используйте /start для создания новых документов.")
 
+    def user_lock(self, user_id: int) -> asyncio.Lock:
+        """Блокировка состояния диалога одного пользователя"""
+        lock = self.user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.user_locks[user_id] = lock
+        return lock
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик текстовых сообщений"""
+        async with self.user_lock(update.effective_user.id):
+            await self.process_message(update, context)
+
+    async def process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Прогоняет сообщение через агента и отправляет ответ"""
         user_input = update.message.text
-        current_state = context.user_data.get("state")
+        user_id = update.effective_user.id
+        preview = StreamPreview(update.message, time.monotonic())
+        current_state = await self.sessions.load(user_id)
 
         logging.info(f"Получено сообщение: {user_input}")
         logging.info(f"Текущая стадия: {current_state.get('stage') if current_state else 'None'}")
 
         if current_state is None:
-            await self.start_command(update, context)
-            current_state = context.user_data["state"]
+            await self.start_session(update)  # блокировка пользователя уже взята в handle_message
+            current_state = await self.sessions.load(user_id)
 
         # Проверяем, не завершен ли диалог
         if current_state.get("stage") == "final":
             await update.message.reply_text("Диалог завершен. Используйте /start для создания новых документов.")
             return
 
-        # Добавляем сообщение пользователя
-        current_state["messages"].append(HumanMessage(content=user_input))
+        # Добавляем сообщение пользователя в копию: сохраненная сессия меняется только после ответа агента
+        current_state = {**current_state, "messages": current_state["messages"] + [HumanMessage(content=user_input)]}
 
         try:
-            # Запускаем агента
-            result = self.agent.invoke(current_state)
-            context.user_data["state"] = result
+            # Запускаем агента: фрагменты документов (custom) сразу попадают в черновик,
+            # последнее полное состояние (values) — результат хода
+            result = current_state
+            async with self.agent_slots:
+                async for mode, chunk in self.agent.astream(current_state, stream_mode=["custom", "values"]):
+                    if mode == "custom":
+                        await preview.add(chunk)
+                    else:
+                        result = chunk
+            await self.sessions.save(user_id, result)
 
             logging.info(f"Новая стадия: {result.get('stage')}")
             logging.info(f"Количество сообщений: {len(result.get('messages', []))}")
 
             # Отправляем ответ
             if result["messages"]:
-                response = result["messages"][-1].content
-
-                # Разбиваем длинные сообщения
-                if len(response) > 4096:
-                    chunks = [response[i:i + 4096] for i in range(0, len(response), 4096)]
-                    for chunk in chunks:
-                        await update.message.reply_text(chunk)
-                else:
-                    await update.message.reply_text(response)
+                await preview.finish(render_message(result, result["messages"][-1]))
+                if preview.texts:
+                    logging.info(f"Первый текст документов через {preview.first_visible:.2f} с "
+                                 f"(потоково: {STREAM_DOCUMENTS}), ответ целиком через "
+                                 f"{time.monotonic() - preview.started:.2f} с")
             else:
                 await update.message.reply_text("Произошла ошибка при обработке сообщения. Попробуйте еще раз.")
 
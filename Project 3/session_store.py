@@ -0,0 +1,172 @@
+"""Постоянное хранилище диалогов ResumeBot.
+
+Состояние диалога (ResumeState) хранится в SQLite в компактном виде: сообщения —
+пары [тип, текст] вместо объектов LangChain, весь документ — JSON, сжатый zlib.
+В памяти остается ограниченный LRU «горячих» сессий; сессии, к которым давно
+не обращались, вытесняются и при следующем сообщении читаются с диска.
+Запись сквозная: каждое сохранение сразу попадает в базу, поэтому после
+перезапуска бота диалоги продолжаются с того же места.
+
+Бот работает в цикле событий asyncio, поэтому пользуется асинхронными load и
+save: сжатие и запись в SQLite идут в потоке (asyncio.to_thread), и медленный
+диск не задерживает ответы другим пользователям. Доступ к LRU и соединению
+из разных потоков защищен блокировкой.
+
+Запуск из консоли:
+    python session_store.py stats                 # число сессий и размер на диске
+    python session_store.py purge --days 30       # удалить сессии старше 30 дней
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+DEFAULT_SESSIONS_PATH = "sessions.sqlite"
+DEFAULT_HOT_SESSIONS = 256
+DEFAULT_IDLE_SECONDS = 15 * 60
+
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+
+def dump_state(state: Dict[str, Any]) -> bytes:
+    """Сериализует состояние диалога: сообщения как [тип, текст], затем JSON + zlib"""
+    data = dict(state)
+    data["messages"] = [[message.type, message.content] for message in state.get("messages", [])]
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(text.encode("utf-8"))
+
+
+def load_state(blob: bytes) -> Dict[str, Any]:
+    """Обратное преобразование dump_state"""
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    data["messages"] = [MESSAGE_TYPES.get(kind, HumanMessage)(content=content)
+                        for kind, content in data.get("messages", [])]
+    return data
+
+
+class SessionStore:
+    """Сессии пользователей: LRU в памяти перед таблицей SQLite"""
+
+    def __init__(self, path: str = DEFAULT_SESSIONS_PATH, max_hot: int = DEFAULT_HOT_SESSIONS,
+                 idle_seconds: float = DEFAULT_IDLE_SECONDS):
+        self.max_hot = max_hot
+        self.idle_seconds = idle_seconds
+        self.hot: "OrderedDict[int, tuple]" = OrderedDict()  # user id -> (состояние, время обращения)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.loads = 0  # сколько раз сессия читалась с диска
+
+    def _touch(self, user_id: int, state: Dict[str, Any], now: float):
+        self.hot[user_id] = (state, now)
+        self.hot.move_to_end(user_id)
+        self.evict_idle(now)
+        while len(self.hot) > self.max_hot:
+            self.hot.popitem(last=False)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Выгружает из памяти сессии без обращений дольше idle_seconds.
+
+        На диске они уже есть (запись сквозная), поэтому вытеснение — просто удаление
+        из LRU. Порядок OrderedDict совпадает с порядком обращений, так что
+        проверяются только самые старые сессии.
+        """
+        now = time.time() if now is None else now
+        evicted = 0
+        while self.hot:
+            _, used_at = next(iter(self.hot.values()))
+            if now - used_at < self.idle_seconds:
+                break
+            self.hot.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Состояние диалога пользователя или None, если диалога еще не было"""
+        now = time.time()
+        with self.lock:
+            entry = self.hot.get(user_id)
+            if entry is not None:
+                self._touch(user_id, entry[0], now)
+                return entry[0]
+            row = self.conn.execute("SELECT state FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return None
+            self.loads += 1
+            state = load_state(row[0])
+            self._touch(user_id, state, now)
+            return state
+
+    def put(self, user_id: int, state: Dict[str, Any]):
+        """Сохраняет состояние на диск и оставляет его горячим"""
+        blob = dump_state(state)  # сжатие вне блокировки
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, state, updated_at) VALUES (?, ?, ?)",
+                (user_id, blob, now)
+            )
+            self.conn.commit()
+            self._touch(user_id, state, now)
+
+    async def load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """get для цикла событий: чтение с диска выполняется в потоке"""
+        return await asyncio.to_thread(self.get, user_id)
+
+    async def save(self, user_id: int, state: Dict[str, Any]):
+        """put для цикла событий: сжатие и запись выполняются в потоке"""
+        await asyncio.to_thread(self.put, user_id, state)
+
+    def purge(self, older_than: float) -> int:
+        """Удаляет с диска сессии, не обновлявшиеся дольше older_than секунд"""
+        cutoff = time.time() - older_than
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self.conn.commit()
+            for user_id in [user_id for user_id, (_, used_at) in self.hot.items() if used_at < cutoff]:
+                del self.hot[user_id]
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self.lock:
+            count, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM sessions"
+            ).fetchone()
+        return {"sessions": count, "bytes_on_disk": size, "hot": len(self.hot), "loads": self.loads}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Хранилище сессий ResumeBot")
+    parser.add_argument("--path", default=DEFAULT_SESSIONS_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="число сессий и их размер на диске")
+    purge = subparsers.add_parser("purge", help="удалить давно не обновлявшиеся сессии")
+    purge.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    store = SessionStore(args.path)
+    if args.command == "stats":
+        print(store.stats())
+    else:
+        print(f"Удалено сессий: {store.purge(args.days * 24 * 3600)}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Проверки агента резюме без обращения к GigaChat: сжатие истории, ссылки на документы
+и порядок команд одного пользователя в боте.
+
+Запуск:
+    python -m pytest -q test_resume_agent.py
+"""
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+import project03_task01
+from project03_task01 import (HISTORY_TURNS, SUMMARY_CHARS, ResumeBot, collect_profile_node, compact_history_node,
+                              document_ref, edit_targets, render_message)
+from session_store import SessionStore
+
+
+def dialog(*turns) -> list:
+    """Сообщения с id, как в состоянии графа: каждый ход — вопрос и один или несколько ответов"""
+    messages = []
+    for question, *answers in turns:
+        messages += [HumanMessage(content=question)] + [AIMessage(content=answer) for answer in answers]
+    return add_messages([], messages)
+
+
+def compact(state: dict) -> tuple:
+    """(оставшиеся сообщения, summary) после узла compact_history"""
+    update = compact_history_node(state)
+    messages = add_messages(state["messages"], update.get("messages", []))
+    return messages, update.get("summary", state.get("summary", ""))
+
+
+def test_short_history_kept():
+    state = {"messages": dialog(*[(f"вопрос {n}", f"ответ {n}") for n in range(HISTORY_TURNS)]), "summary": ""}
+    assert compact_history_node(state) == {}
+
+
+def test_turn_with_several_answers_kept_whole():
+    # Выбор стиля отвечает дважды: подтверждение и документы из generate
+    state = {"messages": dialog(
+        ("Иван Петров", "Где вы учитесь?"),
+        ("МГУ, Python", "Расскажите о стажировке"),
+        ("Стажировка в Яндексе", "Выберите стиль"),
+        ("официальный", "Генерирую документы...", f"Готово: {document_ref('resume_text')}"),
+        ("сделай резюме короче", "Документы обновлены"),
+    ), "summary": ""}
+    messages, summary = compact(state)
+    assert isinstance(messages[0], HumanMessage)  # ход не разрезан посередине
+    assert sum(isinstance(message, HumanMessage) for message in messages) == HISTORY_TURNS
+    assert [message.content for message in messages[:4]] == [
+        "Стажировка в Яндексе", "Выберите стиль", "официальный", "Генерирую документы..."]
+    assert summary.splitlines() == ["Пользователь: Иван Петров", "Бот: Где вы учитесь?",
+                                    "Пользователь: МГУ, Python", "Бот: Расскажите о стажировке"]
+
+
+def test_summary_appended_and_limited():
+    state = {"messages": dialog(*[(f"вопрос {n} " + "x" * 200, f"ответ {n}") for n in range(40)]),
+             "summary": "Пользователь: самый первый вопрос"}
+    messages, summary = compact(state)
+    assert len(messages) == 2 * HISTORY_TURNS
+    assert len(summary) <= SUMMARY_CHARS
+    assert summary.splitlines()[-1] == f"Бот: ответ {40 - HISTORY_TURNS - 1}"
+    assert "самый первый" not in summary  # старые строки вытесняются целиком
+    assert all(line.startswith(("Пользователь: ", "Бот: ")) for line in summary.splitlines())
+    assert all(len(line) <= len("Пользователь: ") + 120 for line in summary.splitlines())
+
+
+def test_render_message_uses_current_documents():
+    message = AIMessage(content=f"Резюме:\n{document_ref('resume_text')}\nПисьмо:\n{document_ref('cover_letter_text')}")
+    state = {"resume_text": "CV v1", "cover_letter_text": "Letter v1"}
+    assert render_message(state, message) == "Резюме:\nCV v1\nПисьмо:\nLetter v1"
+    # После правки то же сообщение показывает новый текст, копия документа в истории не хранится
+    state["resume_text"] = "CV v2"
+    assert render_message(state, message) == "Резюме:\nCV v2\nПисьмо:\nLetter v1"
+    assert render_message({}, message) == "Резюме:\n\nПисьмо:\n"
+    assert render_message(state, AIMessage(content="без ссылок")) == "без ссылок"
+
+
+def test_edit_targets():
+    assert edit_targets("сделай резюме короче") == ["resume_text"]
+    assert edit_targets("перепиши письмо") == ["cover_letter_text"]
+    assert edit_targets("добавь больше деталей") == ["resume_text", "cover_letter_text"]
+
+
+class FakeLlm:
+    def __init__(self, content: str):
+        self.content = content
+
+    async def ainvoke(self, messages):
+        return AIMessage(content=self.content)
+
+
+def test_collect_profile_does_not_touch_saved_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(project03_task01, "llm", FakeLlm('{"name": "Иван Петров", "skills": "Python"}'))
+    sessions = SessionStore(str(tmp_path / "sessions.sqlite"))
+    sessions.put(1, {"messages": [AIMessage(content="Расскажите о себе")], "stage": "collecting_profile",
+                     "user_profile": {"education": "МГУ"}})
+    saved = sessions.get(1)  # тот же объект, что лежит в горячем LRU
+    state = {**saved, "messages": saved["messages"] + [HumanMessage(content="Иван Петров, Python")]}
+    update = asyncio.run(collect_profile_node(state))
+    assert update["user_profile"] == {"education": "МГУ", "name": "Иван Петров", "skills": "Python"}
+    assert sessions.get(1)["user_profile"] == {"education": "МГУ"}  # профиль сессии меняет только save
+
+
+class SlowAgent:
+    """Агент, который отвечает только после release: ход «в процессе генерации»"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def astream(self, state, stream_mode):
+        self.started.set()
+        await self.release.wait()
+        yield "values", {**state, "stage": "editing", "messages": state["messages"] + [AIMessage(content="Готово")]}
+
+
+class FakeMessage:
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text: str):
+        self.replies.append(text)
+
+
+def update(text: str = "") -> SimpleNamespace:
+    return SimpleNamespace(effective_user=SimpleNamespace(id=1), message=FakeMessage(text))
+
+
+def test_start_waits_for_running_turn(tmp_path, monkeypatch):
+    monkeypatch.setattr(project03_task01, "SESSIONS_PATH", str(tmp_path / "sessions.sqlite"))
+
+    async def scenario():
+        bot = ResumeBot()
+        bot.agent = SlowAgent()
+        await bot.sessions.save(1, {"messages": [AIMessage(content="Расскажите о себе")], "stage": "collecting_profile"})
+        turn = asyncio.create_task(bot.handle_message(update("Иван Петров"), None))
+        await bot.agent.started.wait()
+        start = asyncio.create_task(bot.start_command(update(), None))
+        await asyncio.sleep(0.05)
+        assert not start.done()  # /start ждет, пока ход агента сохранит свое состояние
+        bot.agent.release.set()
+        await asyncio.gather(turn, start)
+        return await bot.sessions.load(1)
+
+    state = asyncio.run(scenario())
+    assert state["stage"] == "start"  # новый диалог не перезаписан завершившимся ходом
+    assert len(state["messages"]) == 1
+
+
+def test_first_message_starts_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(project03_task01, "SESSIONS_PATH", str(tmp_path / "sessions.sqlite"))
+
+    async def scenario():
+        bot = ResumeBot()
+        bot.agent = SlowAgent()
+        bot.agent.release.set()
+        message = update("Иван Петров")
+        await asyncio.wait_for(bot.handle_message(message, None), 5)  # без повторного захвата блокировки
+        return message.message.replies, await bot.sessions.load(1)
+
+    replies, state = asyncio.run(scenario())
+    assert replies[0].startswith("👋 Привет!")
+    assert replies[-1] == "Готово"
+    assert state["stage"] == "editing"